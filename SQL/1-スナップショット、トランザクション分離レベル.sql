@@ -0,0 +1,13 @@
+-- スナップショット分離を許可（SQLClient の isolation_level="snapshot" で使用）
+ALTER DATABASE TEM
+SET ALLOW_SNAPSHOT_ISOLATION ON;
+
+-- READ COMMITTED を行のバージョンで読むようにする（BCP の取り込み中も読み込みがロックを待たない）
+-- 実行中の接続があると完了しないため、バッチ停止中に実行する
+ALTER DATABASE TEM
+SET READ_COMMITTED_SNAPSHOT ON WITH ROLLBACK IMMEDIATE;
+
+-- 確認
+SELECT name, snapshot_isolation_state_desc, is_read_committed_snapshot_on
+FROM sys.databases
+WHERE name = N'TEM';
@@ -1,7 +1,471 @@
+import copy
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import pyodbc
 
+from common.settings import CONNECTION_POOL_SETTINGS
+from common.SQLServer.instrumentation import NULL_PROBE, QueryProbe
+from common.SQLServer.procedure import ProcedureCall, build_procedure_batch
+
+
+# SQLClient が指定できるトランザクション分離レベル
+# READ_COMMITTED_SNAPSHOT はデータベースのオプションのため、有効にしたデータベースでは read_committed が行のバージョンを読みます
+ISOLATION_LEVELS = {
+    "read_uncommitted": "READ UNCOMMITTED",
+    "read_committed": "READ COMMITTED",
+    "repeatable_read": "REPEATABLE READ",
+    "snapshot": "SNAPSHOT",
+    "serializable": "SERIALIZABLE",
+}
+
+# プールに返却する際、セッションの設定を変更した接続に対して実行するクエリ
+SESSION_RESET_QUERY = "SET TRANSACTION ISOLATION LEVEL READ COMMITTED; SET NOCOUNT OFF;"
+
+# 現在のセッションのロック待ち時間の累計（ミリ秒）
+LOCK_WAIT_QUERY = (
+    "SELECT ISNULL(SUM(wait_time_ms), 0) FROM sys.dm_exec_session_wait_stats "
+    "WHERE session_id = @@SPID AND wait_type LIKE 'LCK%'"
+)
+
+
+def isolation_statement(isolation_level: str) -> str:
+    """
+    :param isolation_level: str, ISOLATION_LEVELS のキー
+    :return: str, SET TRANSACTION ISOLATION LEVEL 文
+    """
+    if isolation_level not in ISOLATION_LEVELS:
+        raise ValueError(f"Unknown isolation level: {isolation_level}")
+    return f"SET TRANSACTION ISOLATION LEVEL {ISOLATION_LEVELS[isolation_level]}"
+
+
+# fork で親プロセスから引き継いだ接続（解放しないよう参照を保持する）
+_INHERITED_CONNECTIONS = []
+
+
+class _PoolEntry:
+    __slots__ = ("connection", "created_at", "last_used", "session_changed")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.session_changed = False
+
+
+class PooledConnection:
+    """
+    プールから借りた接続のプロキシ。pyodbc の接続と同じように使えます。
+
+    with ブロックを抜けると pyodbc と同様に commit（例外時は rollback）してから接続をプールに返します。
+    例外で抜けた接続は、一時テーブルなどのセッションの状態が残らないよう破棄します。
+    close() もプールへの返却になります。
+    """
+
+    def __init__(self, pool: "ConnectionPool", entry: _PoolEntry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise pyodbc.ProgrammingError("Attempt to use a connection that has been returned to the pool")
+        return getattr(self._entry.connection, name)
+
+    def __setattr__(self, name, value):
+        # autocommit / timeout などの設定は元の接続に反映する
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._entry.connection, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._entry is None:
+            return False
+        discard = exc_type is not None
+        try:
+            if discard:
+                self._entry.connection.rollback()
+            else:
+                self._entry.connection.commit()
+        except Exception:
+            discard = True
+            raise
+        finally:
+            self._release(discard)
+        return False
+
+    def close(self):
+        self._release(False)
+
+    def mark_session_changed(self):
+        """分離レベルなどセッションの設定を変更したことを記録します（返却時に SESSION_RESET_QUERY で元に戻します）。"""
+        if self._entry is not None:
+            self._entry.session_changed = True
+
+    def _release(self, discard: bool):
+        entry, self._entry = self._entry, None
+        if entry is not None:
+            self._pool.release(entry, discard=discard)
+
+
+class ConnectionPool:
+    """
+    スレッドセーフな接続プール。
+
+    - 借りる際、health_check_after_seconds 以上使われていない接続は health_check_query で確認し、失敗したら作り直す
+    - idle_timeout 以上使われていない接続、作成から max_lifetime 以上経過した接続は破棄する
+    - max_size まで使用中の場合は checkout_timeout 秒まで返却を待つ（超えた場合は TimeoutError）
+    - warm_up で min_size まで事前に接続する
+    fork 後の子プロセスでは親プロセスの接続を使わず、新しく接続します。
+    """
+
+    def __init__(self, connect, min_size: int = 1, max_size: int = 10, checkout_timeout: float = 30.0,
+                 idle_timeout: float = 300.0, max_lifetime: float = 1800.0, health_check_after_seconds: float = 30.0,
+                 health_check_query: str = "SELECT 1", reset_query: str = SESSION_RESET_QUERY):
+        """
+        :param connect: Callable, 新しい接続を作成する関数
+        :param min_size: int, warm_up で作成し、idle_timeout でも破棄しない接続数
+        :param max_size: int, 最大接続数（使用中 + 待機中）
+        :param checkout_timeout: float, 空きを待つ最大秒数
+        :param idle_timeout: float, 待機中の接続を破棄するまでの秒数
+        :param max_lifetime: float, 接続を作成してから破棄するまでの秒数
+        :param health_check_after_seconds: float, 借りる際に死活確認を行う未使用秒数（0: 毎回確認）
+        :param health_check_query: str, 死活確認のクエリ
+        :param reset_query: str, セッションの設定を変更した接続を返却する際に実行するクエリ
+        """
+        if not 0 <= min_size <= max_size or max_size <= 0:
+            raise ValueError("Pool size must satisfy 0 <= min_size <= max_size and max_size > 0")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after_seconds = health_check_after_seconds
+        self.health_check_query = health_check_query
+        self.reset_query = reset_query
+        self._idle = deque()
+        self._condition = threading.Condition()
+        self._pid = os.getpid()
+        self.in_use = 0
+        self.created = 0
+        self.discarded = 0
+        self.health_check_failures = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _check_fork(self):
+        # fork した子プロセスでは親の接続（ソケット）を使わないよう手放す。
+        # 解放すると SQLDisconnect が親と共有しているソケットに送られるため、参照を残して解放させない
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            _INHERITED_CONNECTIONS.extend(entry.connection for entry in self._idle)
+            self._idle.clear()
+            self.in_use = 0
+
+    def _expired(self, entry: _PoolEntry, now: float, idle_count: int) -> bool:
+        if now - entry.created_at >= self.max_lifetime:
+            return True
+        return now - entry.last_used >= self.idle_timeout and idle_count > self.min_size
+
+    def _healthy(self, entry: _PoolEntry, now: float) -> bool:
+        if now - entry.last_used < self.health_check_after_seconds:
+            return True
+        try:
+            cursor = entry.connection.cursor()
+            try:
+                cursor.execute(self.health_check_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close(self, entry: _PoolEntry):
+        self.discarded += 1
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+
+    def acquire(self) -> PooledConnection:
+        """
+        接続を借ります。with ブロックを抜けるか close() で返却されます。
+
+        :return: PooledConnection
+        """
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        waited = False
+        while True:
+            entry = None
+            with self._condition:
+                self._check_fork()
+                now = time.monotonic()
+                while self._idle:
+                    candidate = self._idle.pop()  # 直近に返却された接続から使う
+                    if self._expired(candidate, now, len(self._idle) + 1):
+                        self._close(candidate)
+                        continue
+                    entry = candidate
+                    break
+                if entry is None and self.in_use + len(self._idle) >= self.max_size:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise TimeoutError(f"Timed out waiting for a database connection ({self.max_size} in use)")
+                    waited = True
+                    self._condition.wait(remaining)
+                    continue
+                self.in_use += 1
+
+            try:
+                if entry is None:
+                    entry = _PoolEntry(self._connect())
+                    with self._condition:
+                        self.created += 1
+                elif not self._healthy(entry, time.monotonic()):
+                    with self._condition:
+                        self.health_check_failures += 1
+                        self._close(entry)
+                        self.in_use -= 1
+                    continue
+            except Exception:
+                with self._condition:
+                    self.in_use -= 1
+                    self._condition.notify()
+                raise
+
+            with self._condition:
+                wait_seconds = time.monotonic() - started
+                self.checkouts += 1
+                if waited:
+                    self.waits += 1
+                self.wait_seconds += wait_seconds
+                self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+            return PooledConnection(self, entry)
+
+    def release(self, entry: _PoolEntry, discard: bool = False):
+        """接続をプールに返却します（discard=True の場合は破棄します）。"""
+        if not discard and entry.session_changed:
+            # 次に借りる処理に分離レベルなどを持ち越さない（元に戻せない接続は破棄する）
+            discard = not self._reset(entry)
+        with self._condition:
+            if os.getpid() != self._pid:
+                return
+            self.in_use -= 1
+            now = time.monotonic()
+            if discard or now - entry.created_at >= self.max_lifetime:
+                self._close(entry)
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+            self._condition.notify()
+
+    def _reset(self, entry: _PoolEntry) -> bool:
+        try:
+            cursor = entry.connection.cursor()
+            try:
+                cursor.execute(self.reset_query)
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        entry.session_changed = False
+        return True
+
+    def warm_up(self) -> int:
+        """
+        待機中の接続が min_size になるまで接続を作成します。
+
+        :return: int, 作成した接続数
+        """
+        created = 0
+        with self._condition:
+            self._check_fork()
+            missing = min(self.min_size, self.max_size - self.in_use) - len(self._idle)
+        for _ in range(max(missing, 0)):
+            entry = _PoolEntry(self._connect())
+            with self._condition:
+                self.created += 1
+                self._idle.append(entry)
+            created += 1
+        return created
+
+    def close(self):
+        """待機中の接続を全て閉じます（使用中の接続は返却時に待機状態に戻ります）。"""
+        with self._condition:
+            while self._idle:
+                self._close(self._idle.pop())
+
+    def stats(self) -> dict:
+        """
+        監視用のカウンタを返します。
+
+        :return: dict, {"in_use", "idle", "created", "discarded", "health_check_failures", "checkouts",
+                        "waits", "wait_seconds", "max_wait_seconds", "avg_wait_seconds"}
+        """
+        with self._condition:
+            return {
+                "in_use": self.in_use,
+                "idle": len(self._idle),
+                "created": self.created,
+                "discarded": self.discarded,
+                "health_check_failures": self.health_check_failures,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_seconds": self.wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+                "avg_wait_seconds": self.wait_seconds / self.checkouts if self.checkouts else 0.0,
+            }
+
+
+# 暗黙のトランザクションを開始する文（SELECT はテーブルを参照する場合のみトランザクションを開始する）
+OPEN_IMPLICIT_TRANSACTION = "IF @@TRANCOUNT = 0 SELECT TOP (0) 1 FROM sys.objects"
+
+
+class UnitOfWork:
+    """
+    複数のリポジトリ操作で 1 つの接続・1 つのトランザクションを共有する作業単位。
+
+    ConnectionFactory.unit_of_work() の with ブロック内では、同じスレッドの create_connection() が
+    この作業単位の接続を返します（_UnitOfWorkConnection）。各リポジトリの commit() は何もせず、
+    ブロックを抜ける際に 1 回だけ commit（例外時は rollback）します。
+    savepoint() で一部の処理だけを取り消せます（演算式毎の分離など）。
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rollback_only = False
+        self._savepoints = []
+        self._names = itertools.count(1)
+
+    def execute(self, statement: str):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def savepoint(self, name: str = None):
+        """
+        セーブポイントを作成し、with ブロック内で例外が発生した場合はセーブポイントまで取り消します（例外は再送出）。
+
+        :param name: str, セーブポイント名（省略時は自動採番、SQL Server の制限により 32 文字まで）
+        """
+        name = name or f"uow_sp{next(self._names)}"
+        # SAVE TRANSACTION はトランザクション内でのみ有効なため、未開始の場合はテーブルを参照する SELECT で開始する。
+        # autocommit を無効にした接続は IMPLICIT_TRANSACTIONS ON のため、BEGIN TRANSACTION で開始すると
+        # @@TRANCOUNT が 2 になり、終了時の 1 回の commit ではコミットされない
+        self.execute(f"{OPEN_IMPLICIT_TRANSACTION}; SAVE TRANSACTION [{name}]")
+        self._savepoints.append(name)
+        try:
+            yield name
+        except BaseException:
+            self._rollback_to(name)
+            raise
+        finally:
+            self._savepoints.pop()
+
+    def _rollback_to(self, name: str):
+        try:
+            self.execute(f"ROLLBACK TRANSACTION [{name}]")
+        except Exception:
+            # トランザクションがコミット不能になった場合などは全体を取り消す
+            self.rollback_only = True
+
+    def rollback(self):
+        """
+        リポジトリからの rollback()。セーブポイント内ではセーブポイントまで取り消し、
+        それ以外の場合は作業単位全体を取り消し対象にします。
+        """
+        if self._savepoints and not self.rollback_only:
+            self._rollback_to(self._savepoints[-1])
+        else:
+            self.rollback_only = True
+
+
+class _UnitOfWorkCursor:
+    """
+    作業単位の接続のカーソルのプロキシ。
+
+    pyodbc の Cursor は with ブロックを抜けると commit するため、作業単位の途中で確定しないよう
+    with ブロックを抜けた際はカーソルを閉じるだけにします。
+    """
+    __slots__ = ("_cursor",)
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # fast_executemany などの設定はカーソル本体に反映する
+        setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._cursor.close()
+        return False
+
+
+class _UnitOfWorkConnection:
+    """作業単位の接続を、リポジトリからは通常の接続と同じように使えるようにするプロキシ"""
+
+    def __init__(self, unit_of_work: UnitOfWork):
+        self._unit_of_work = unit_of_work
+
+    def __getattr__(self, name):
+        return getattr(self._unit_of_work.connection, name)
+
+    def cursor(self):
+        return _UnitOfWorkCursor(self._unit_of_work.connection.cursor())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # commit / rollback は作業単位の終了時に行う
+        return False
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self._unit_of_work.rollback()
+
+    def close(self):
+        pass
+
+
+def _mark_session_changed(connection):
+    # プールの接続の場合のみ、返却時にセッションの設定を元に戻す
+    mark = getattr(connection, "mark_session_changed", None)
+    if mark is not None:
+        mark()
+
+
 class ConnectionFactory:
-    def __init__(self, server, database, username, password):
+    def __init__(self, server, database, username, password, pool_settings=None):
+        """
+        :param pool_settings: 接続プールの設定（省略時は CONNECTION_POOL_SETTINGS、enabled が False の場合は毎回接続）
+        """
         # 接続文字列を初期化する
         self.connection_string = (
             f"DRIVER={{SQL Server}};"
@@ -10,42 +474,261 @@ class ConnectionFactory:
             f"UID={username};"
             f"PWD={password};"
         )
+        pool_settings = dict(CONNECTION_POOL_SETTINGS if pool_settings is None else pool_settings)
+        self.pool = ConnectionPool(self._connect, **pool_settings) if pool_settings.pop("enabled", True) else None
+        # スレッド毎の作業単位（unit_of_work）
+        self._local = threading.local()
 
-    def create_connection(self):
-        # データベースへの接続を作成して返す
+    def _connect(self):
         return pyodbc.connect(self.connection_string)
 
+    def create_connection(self):
+        # データベースへの接続を返す（作業単位の中ではその接続、プールが有効な場合はプールから借りる）
+        unit_of_work = getattr(self._local, "unit_of_work", None)
+        if unit_of_work is not None:
+            return _UnitOfWorkConnection(unit_of_work)
+        if self.pool is None:
+            return self._connect()
+        return self.pool.acquire()
+
+    def in_unit_of_work(self) -> bool:
+        """現在のスレッドで作業単位が実行中かを返します。"""
+        return getattr(self._local, "unit_of_work", None) is not None
+
+    @contextmanager
+    def unit_of_work(self, isolation_level: str = None):
+        """
+        with ブロック内の同じスレッドの操作で 1 つの接続・トランザクションを共有します。
+        入れ子の場合は外側の作業単位に参加します（isolation_level は外側の設定のままです）。
+
+        :param isolation_level: str, トランザクションの分離レベル（ISOLATION_LEVELS のキー、省略時はセッションの既定）
+        :return: UnitOfWork
+        """
+        current = getattr(self._local, "unit_of_work", None)
+        if current is not None:
+            yield current
+            return
+
+        with self.create_connection() as connection:
+            unit_of_work = UnitOfWork(connection)
+            if isolation_level:
+                unit_of_work.execute(isolation_statement(isolation_level))
+                _mark_session_changed(connection)
+            self._local.unit_of_work = unit_of_work
+            try:
+                yield unit_of_work
+                if unit_of_work.rollback_only:
+                    raise pyodbc.Error("Unit of work was rolled back because an operation failed")
+            finally:
+                self._local.unit_of_work = None
+            # with ブロックを正常に抜けると pyodbc と同様に commit される
+
+    def warm_up(self) -> int:
+        """
+        接続プールに min_size の接続を事前に作成します。
+
+        :return: int, 作成した接続数
+        """
+        return self.pool.warm_up() if self.pool is not None else 0
+
+    def stats(self) -> dict:
+        """接続プールの監視用カウンタを返します（プールが無効な場合は空の辞書）。"""
+        return self.pool.stats() if self.pool is not None else {}
+
 
 class SQLClient:
-    def __init__(self, connection_factory):
+    def __init__(self, connection_factory, hooks=None, isolation_level=None, track_lock_waits=False):
         # ConnectionFactoryのインスタンスを受け取る
         self.connection_factory = connection_factory
+        # 計測フック（QueryEvent を受け取る callable のリスト）。空の場合は計測しない
+        self.hooks = list(hooks or [])
+        # 読み込み（execute_query / iter_query / call_procedure）の分離レベル。None の場合はセッションの既定
+        if isolation_level is not None:
+            isolation_statement(isolation_level)
+        self.isolation_level = isolation_level
+        # フックがある場合、実行前後のロック待ち時間を計測するか（1 回の実行につき 2 回の問い合わせが増える）
+        self.track_lock_waits = track_lock_waits
+
+    def with_isolation(self, isolation_level):
+        """
+        分離レベルだけが異なる SQLClient を返します（接続・フックは共有します）。
+        リポジトリ毎に分離レベルを変える場合に使います。
+
+        :param isolation_level: str, ISOLATION_LEVELS のキー（None の場合はセッションの既定）
+        :return: SQLClient
+        """
+        client = copy.copy(self)
+        if isolation_level is not None:
+            isolation_statement(isolation_level)
+        client.isolation_level = isolation_level
+        return client
+
+    def add_hook(self, hook):
+        """
+        クエリ・ストアドプロシージャの実行毎に呼び出すフックを追加します。
+
+        :param hook: Callable[[QueryEvent], None], QueryProfiler / SlowQueryLog など
+        """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def unit_of_work(self, isolation_level=None):
+        """
+        複数の操作を 1 つの接続・トランザクションで実行します。
+        with ブロック内の同じスレッドの操作（リポジトリ経由の保存・削除・読み込みを含む）は同じ接続を使い、
+        ブロックを抜ける際に 1 回だけ commit します（例外時、または操作が失敗して rollback した場合は全体を取り消します）。
+
+        例:
+            with sql_client.unit_of_work() as uow:
+                repository.delete_sensor_data(...)
+                for formula_id in formula_ids:
+                    with uow.savepoint():
+                        repository.save_sensor_data(...)
 
-    def execute_query(self, query, params=None):
-        with self.connection_factory.create_connection() as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(query, params or [])
-                return cursor.fetchall()
+        :param isolation_level: 作業単位の分離レベル（ISOLATION_LEVELS のキー、省略時はセッションの既定）
+        :return: UnitOfWork を返すコンテキストマネージャ
+        """
+        return self.connection_factory.unit_of_work(isolation_level)
+
+    def _probe(self, kind, statement, params=None):
+        # フックが無い場合は計測用のオブジェクトを作らない
+        if not self.hooks:
+            return NULL_PROBE
+        return QueryProbe(tuple(self.hooks), kind, statement, params)
+
+    def apply_isolation(self, connection, cursor, isolation_level=None):
+        """
+        接続に分離レベルを設定します（connection_factory から直接借りた接続で読み込む場合に使います）。
+        プールの接続は返却時に元の分離レベルに戻されます。
+
+        :param connection: create_connection() の接続
+        :param cursor: その接続のカーソル
+        :param isolation_level: 分離レベル（省略時は SQLClient の設定、どちらも None の場合は何もしない）
+        """
+        isolation_level = isolation_level or self.isolation_level
+        if isolation_level and not self.connection_factory.in_unit_of_work():
+            cursor.execute(isolation_statement(isolation_level))
+            _mark_session_changed(connection)
+
+    def _prepare(self, connection, cursor, isolation_level, probe):
+        """
+        分離レベルを設定し、ロック待ち時間の計測を開始します。
+        作業単位の中ではトランザクションの途中で分離レベルを変えられないため、作業単位の設定に従います。
+
+        :return: 実行前のロック待ち時間（ミリ秒、計測しない場合は None）
+        """
+        self.apply_isolation(connection, cursor, isolation_level)
+        if self.track_lock_waits and probe is not NULL_PROBE:
+            return self._lock_wait_ms(cursor)
+        return None
+
+    def _record_lock_waits(self, cursor, probe, baseline):
+        if baseline is not None:
+            current = self._lock_wait_ms(cursor)
+            if current is not None:
+                probe.lock_waited((current - baseline) / 1000.0)
+
+    @staticmethod
+    def _lock_wait_ms(cursor):
+        try:
+            cursor.execute(LOCK_WAIT_QUERY)
+            return cursor.fetchone()[0]
+        except Exception:
+            # 権限が無い場合などは計測しない
+            return None
+
+    def execute_query(self, query, params=None, isolation_level=None):
+        """
+        :param query: 実行するクエリ
+        :param params: クエリのパラメータ（省略可能）
+        :param isolation_level: この実行の分離レベル（省略時は SQLClient の設定）
+        :return: 行のリスト
+        """
+        with self._probe("query", query, params) as probe:
+            with self.connection_factory.create_connection() as connection:
+                with connection.cursor() as cursor:
+                    baseline = self._prepare(connection, cursor, isolation_level, probe)
+                    cursor.execute(query, params or [])
+                    probe.first_row()
+                    rows = cursor.fetchall()
+                    probe.fetched(rows)
+                    self._record_lock_waits(cursor, probe, baseline)
+                    return rows
+
+    def iter_query(self, query, params=None, batch_size=1000, isolation_level=None, setup=None, teardown=None):
+        """
+        クエリを実行し、結果を fetchmany で batch_size 行ずつ返すジェネレータ。
+        全件をメモリに載せずに処理できます（接続は最後のバッチを返し終えるまで保持されます）。
+
+        :param query: 実行するクエリ
+        :param params: クエリのパラメータ（省略可能）
+        :param batch_size: 1 回の fetchmany で取得する行数
+        :param isolation_level: この実行の分離レベル（省略時は SQLClient の設定）
+        :param setup: クエリの前に同じカーソルで呼ぶ関数（一時テーブルの作成など、省略可能）
+        :param teardown: 最後のバッチの後に同じカーソルで呼ぶ関数（一時テーブルの削除など、省略可能）
+        :return: 行のリストを返すジェネレータ
+        """
+        with self._probe("query", query, params) as probe:
+            with self.connection_factory.create_connection() as connection:
+                with connection.cursor() as cursor:
+                    baseline = self._prepare(connection, cursor, isolation_level, probe)
+                    if setup is not None:
+                        setup(cursor)
+                    cursor.execute(query, params or [])
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        probe.fetched(rows)
+                        yield rows
+                    self._record_lock_waits(cursor, probe, baseline)
+                    if teardown is not None:
+                        teardown(cursor)
+
+    @contextmanager
+    def call_procedure(self, procedure_name, params=None, batch_size=1000, isolation_level=None):
+        """
+        ストアドプロシージャを実行し、with ブロックの間は接続を保持したまま結果セットを順に読み込めるようにします。
+        ブロックを抜ける際に読み残した結果セットを破棄し、戻り値コードと OUTPUT パラメータを取得します。
+
+        例:
+            with sql_client.call_procedure("master.export_sensors", [factory, OutputParam("INT")]) as call:
+                for result_set in call.result_sets():
+                    for rows in result_set:
+                        ...
+            call.return_code, call.output_values
+
+        :param procedure_name: 実行するストアドプロシージャの名前
+        :param params: ストアドプロシージャのパラメータ（OUTPUT パラメータは OutputParam で指定、省略可能）
+        :param batch_size: 1 回の fetchmany で取得する行数
+        :param isolation_level: この実行の分離レベル（省略時は SQLClient の設定）
+        :return: ProcedureCall を返すコンテキストマネージャ
+        """
+        batch, values = build_procedure_batch(procedure_name, params)
+        with self._probe("procedure", f"EXEC {procedure_name}", params) as probe:
+            with self.connection_factory.create_connection() as connection:
+                with connection.cursor() as cursor:
+                    baseline = self._prepare(connection, cursor, isolation_level, probe)
+                    cursor.execute(batch, values)
+                    probe.first_row()
+                    call = ProcedureCall(cursor, params, batch_size, probe)
+                    yield call
+                    call.drain()
+                    self._record_lock_waits(cursor, probe, baseline)
 
     def _execute_procedure(self, procedure_name, params=None):
         """
-        ストアドプロシージャを実行する共通部分。
+        ストアドプロシージャを実行する共通部分（結果セットは破棄します）。
 
         :param procedure_name: 実行するストアドプロシージャの名前
         :param params: ストアドプロシージャのパラメータ（省略可能）
-        :return: カーソルオブジェクト
-        """
-        with self.connection_factory.create_connection() as connection:
-            with connection.cursor() as cursor:
-                if params:
-                    # パラメータ付きでストアドプロシージャを実行
-                    query = f"EXEC {procedure_name} " + ", ".join(["?" for _ in params])
-                    cursor.execute(query, params)
-                else:
-                    # パラメータなしでストアドプロシージャを実行
-                    query = f"EXEC {procedure_name}"
-                    cursor.execute(query)
-                return cursor
+        :return: 実行済みの ProcedureCall（return_code / output_values を参照できます）
+        """
+        with self.call_procedure(procedure_name, params) as call:
+            pass
+        return call
 
     def execute_with_result_set(self, procedure_name, params=None):
         """
@@ -53,21 +736,36 @@ class SQLClient:
 
         :param procedure_name: 実行するストアドプロシージャの名前
         :param params: ストアドプロシージャのパラメータ（省略可能）
-        :return: クエリ結果のリスト
+        :return: クエリ結果のリスト（最初の結果セット）
+        """
+        with self.call_procedure(procedure_name, params) as call:
+            for result_set in call.result_sets():
+                return result_set.fetchall()
+        return []
+
+    def iter_procedure(self, procedure_name, params=None, batch_size=1000):
+        """
+        ストアドプロシージャの全ての結果セットを、接続を保持したまま batch_size 行ずつ返すジェネレータ。
+
+        :param procedure_name: 実行するストアドプロシージャの名前
+        :param params: ストアドプロシージャのパラメータ（省略可能）
+        :param batch_size: 1 回の fetchmany で取得する行数
+        :return: (結果セットの番号, 行のリスト) を返すジェネレータ
         """
-        cursor = self._execute_procedure(procedure_name, params)
-        return cursor.fetchall()
+        with self.call_procedure(procedure_name, params, batch_size) as call:
+            for result_set in call.result_sets():
+                for rows in result_set:
+                    yield result_set.index, rows
 
     def execute_with_output_param(self, procedure_name, params):
         """
         出力パラメータを返すストアドプロシージャを実行する
 
         :param procedure_name: 実行するストアドプロシージャの名前
-        :param params: ストアドプロシージャの入力・出力パラメータ（リスト）
+        :param params: ストアドプロシージャの入力・出力パラメータ（リスト、出力パラメータは OutputParam で指定）
         :return: 出力パラメータのリスト
         """
-        cursor = self._execute_procedure(procedure_name, params)
-        return [param.value for param in params]  # 出力パラメータの値を取得
+        return self._execute_procedure(procedure_name, params).output_values
 
     def execute_with_return_code(self, procedure_name, params=None):
         """
@@ -77,5 +775,4 @@ class SQLClient:
         :param params: ストアドプロシージャのパラメータ（省略可能）
         :return: 戻り値コード
         """
-        cursor = self._execute_procedure(procedure_name, params)
-        return cursor.return_value  # 戻り値コードを取得
+        return self._execute_procedure(procedure_name, params).return_code
@@ -1,6 +1,7 @@
+import pandas as pd
 import pytest
 import pyodbc
-from common.SQLServer.client import ConnectionFactory
+from common.SQLServer.client import ConnectionFactory, ConnectionPool
 
 @pytest.fixture
 def connection_factory():
@@ -19,4 +20,295 @@ def test_connection_string_initialization(connection_factory):
 def test_create_connection(mocker, connection_factory):
     mock_connect = mocker.patch("pyodbc.connect")
     connection_factory.create_connection()
-    mock_connect.assert_called_once_with(connection_factory.connection_string)
\ No newline at end of file
+    mock_connect.assert_called_once_with(connection_factory.connection_string)
+
+
+def test_iter_query_yields_batches(mocker, connection_factory):
+    from common.SQLServer.client import SQLClient
+    mock_connect = mocker.patch("pyodbc.connect")
+    mock_cursor = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchmany.side_effect = [[(1,), (2,)], [(3,)], []]
+
+    batches = list(SQLClient(connection_factory).iter_query("SELECT 1", ["a"], batch_size=2))
+
+    assert batches == [[(1,), (2,)], [(3,)]]
+    mock_cursor.execute.assert_called_once_with("SELECT 1", ["a"])
+    mock_cursor.fetchmany.assert_called_with(2)
+
+
+def _pool(mocker, **settings):
+    connect = mocker.Mock(side_effect=lambda: mocker.MagicMock())
+    return ConnectionPool(connect, **settings), connect
+
+
+def test_pool_reuses_returned_connection(mocker):
+    """返却した接続が次の借用で再利用され、with ブロックの終了時に commit されるかを検証"""
+    pool, connect = _pool(mocker, min_size=0, max_size=2)
+
+    with pool.acquire() as connection:
+        first = connection._entry.connection
+    with pool.acquire() as connection:
+        second = connection._entry.connection
+
+    assert first is second
+    assert connect.call_count == 1
+    first.commit.assert_called()
+    first.close.assert_not_called()
+    assert pool.stats()["checkouts"] == 2
+    assert pool.stats()["idle"] == 1
+
+
+def test_pool_discards_connection_on_error(mocker):
+    """例外で抜けた接続は rollback して破棄されるかを検証"""
+    pool, connect = _pool(mocker, min_size=0, max_size=2)
+
+    with pytest.raises(RuntimeError):
+        with pool.acquire() as connection:
+            raw = connection._entry.connection
+            raise RuntimeError("boom")
+
+    raw.rollback.assert_called_once()
+    raw.close.assert_called_once()
+    assert pool.stats()["discarded"] == 1
+    assert pool.stats()["in_use"] == 0
+
+
+def test_pool_times_out_when_exhausted(mocker):
+    """max_size まで使用中の場合、checkout_timeout 後に TimeoutError になるかを検証"""
+    pool, _ = _pool(mocker, min_size=0, max_size=1, checkout_timeout=0.01)
+    held = pool.acquire()
+
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+
+    held.close()
+    with pool.acquire():
+        pass
+    assert pool.stats()["created"] == 1
+
+
+def test_pool_replaces_expired_and_unhealthy_connections(mocker):
+    """max_lifetime を超えた接続や死活確認に失敗した接続が作り直されるかを検証"""
+    pool, connect = _pool(mocker, min_size=0, max_size=2, max_lifetime=0.0)
+    with pool.acquire():
+        pass
+    assert pool.stats()["discarded"] == 1
+
+    pool, connect = _pool(mocker, min_size=0, max_size=2, health_check_after_seconds=0.0)
+    with pool.acquire() as connection:
+        connection._entry.connection.cursor.return_value.execute.side_effect = pyodbc.Error("gone")
+    with pool.acquire():
+        pass
+
+    stats = pool.stats()
+    assert connect.call_count == 2
+    assert stats["health_check_failures"] == 1
+    assert stats["discarded"] == 1
+
+
+def test_pool_warm_up(mocker):
+    """warm_up で min_size の接続が作成されるかを検証"""
+    pool, connect = _pool(mocker, min_size=2, max_size=4)
+
+    assert pool.warm_up() == 2
+    assert pool.warm_up() == 0
+    assert connect.call_count == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_pool_detaches_connections_inherited_by_fork(mocker):
+    """fork 後の子プロセスでは親の接続を閉じずに手放し、新しく接続するかを検証"""
+    from common.SQLServer import client
+    pool, connect = _pool(mocker, min_size=1, max_size=2)
+    pool.warm_up()
+    inherited = pool._idle[0].connection
+    mocker.patch.object(client.os, "getpid", return_value=pool._pid + 1)
+    mocker.patch.object(client, "_INHERITED_CONNECTIONS", [])
+
+    with pool.acquire() as connection:
+        assert connection._entry.connection is not inherited
+
+    assert connect.call_count == 2
+    inherited.close.assert_not_called()
+    assert client._INHERITED_CONNECTIONS == [inherited]
+
+
+def test_create_connection_without_pool(mocker):
+    """プールが無効な場合は毎回接続するかを検証"""
+    mock_connect = mocker.patch("pyodbc.connect")
+    factory = ConnectionFactory("s", "d", "u", "p", pool_settings={"enabled": False})
+
+    factory.create_connection()
+    factory.create_connection()
+
+    assert mock_connect.call_count == 2
+    assert factory.stats() == {}
+
+
+def _unit_of_work_client(mocker):
+    from common.SQLServer.client import SQLClient
+    mock_connect = mocker.patch("pyodbc.connect")
+    return SQLClient(ConnectionFactory("s", "d", "u", "p")), mock_connect
+
+
+def test_unit_of_work_shares_one_connection_and_commit(mocker):
+    """作業単位の中の操作が 1 つの接続を共有し、終了時に 1 回だけ commit されるかを検証"""
+    client, mock_connect = _unit_of_work_client(mocker)
+    raw = mock_connect.return_value
+
+    with client.unit_of_work():
+        client.execute_query("SELECT 1")
+        with client.connection_factory.create_connection() as connection:
+            connection.cursor().execute("DELETE FROM t")
+            connection.commit()
+        with client.unit_of_work():
+            client.execute_query("SELECT 2")
+        raw.commit.assert_not_called()
+
+    assert mock_connect.call_count == 1
+    raw.commit.assert_called_once()
+    raw.rollback.assert_not_called()
+
+
+def test_unit_of_work_rolls_back_on_error(mocker):
+    """例外、またはリポジトリの rollback で作業単位全体が取り消されるかを検証"""
+    client, mock_connect = _unit_of_work_client(mocker)
+    raw = mock_connect.return_value
+
+    with pytest.raises(RuntimeError):
+        with client.unit_of_work():
+            raise RuntimeError("boom")
+    raw.rollback.assert_called_once()
+
+    raw.reset_mock()
+    with pytest.raises(pyodbc.Error):
+        with client.unit_of_work():
+            with client.connection_factory.create_connection() as connection:
+                connection.rollback()
+    raw.commit.assert_not_called()
+    raw.rollback.assert_called_once()
+
+
+def test_unit_of_work_savepoint(mocker):
+    """セーブポイント内の失敗はセーブポイントまで取り消され、作業単位は commit されるかを検証"""
+    from common.SQLServer.client import OPEN_IMPLICIT_TRANSACTION
+    client, mock_connect = _unit_of_work_client(mocker)
+    raw = mock_connect.return_value
+    statements = raw.cursor.return_value.execute
+
+    with client.unit_of_work() as uow:
+        with pytest.raises(ValueError):
+            with uow.savepoint() as name:
+                raise ValueError("formula failed")
+        with uow.savepoint():
+            with client.connection_factory.create_connection() as connection:
+                connection.rollback()
+
+    executed = [call.args[0] for call in statements.call_args_list]
+    assert executed == [
+        f"{OPEN_IMPLICIT_TRANSACTION}; SAVE TRANSACTION [{name}]",
+        f"ROLLBACK TRANSACTION [{name}]",
+        f"{OPEN_IMPLICIT_TRANSACTION}; SAVE TRANSACTION [uow_sp2]",
+        "ROLLBACK TRANSACTION [uow_sp2]",
+    ]
+    raw.commit.assert_called_once()
+    raw.rollback.assert_not_called()
+
+
+def test_unit_of_work_savepoint_does_not_nest_transaction(mocker):
+    """最初の操作がセーブポイントでも BEGIN TRANSACTION で入れ子にせず、1 回の commit で確定するかを検証"""
+    from common.SQLServer.client import OPEN_IMPLICIT_TRANSACTION
+    client, mock_connect = _unit_of_work_client(mocker)
+    raw = mock_connect.return_value
+    statements = raw.cursor.return_value.execute
+
+    with client.unit_of_work() as uow:
+        with uow.savepoint() as name:
+            client.execute_query("DELETE FROM t")
+
+    executed = [call.args[0] for call in statements.call_args_list]
+    assert executed == [f"{OPEN_IMPLICIT_TRANSACTION}; SAVE TRANSACTION [{name}]", "DELETE FROM t"]
+    assert not any("BEGIN TRANSACTION" in statement for statement in executed)
+    assert OPEN_IMPLICIT_TRANSACTION.startswith("IF @@TRANCOUNT = 0 SELECT") and "FROM" in OPEN_IMPLICIT_TRANSACTION
+    raw.commit.assert_called_once()
+    raw.rollback.assert_not_called()
+
+
+def test_unit_of_work_cursor_blocks_do_not_commit(mocker):
+    """pyodbc のカーソルの with ブロック終了時の commit が作業単位の途中で実行されず、失敗した作業単位は確定しないかを検証"""
+    from common.repository.sensor_data_repository import ProductionSensorDataRepository
+    client, mock_connect = _unit_of_work_client(mocker)
+    raw = mock_connect.return_value
+    cursor = raw.cursor.return_value
+    # pyodbc の Cursor.__exit__ は autocommit が無効な場合に commit する
+    cursor.__enter__.return_value = cursor
+    cursor.__exit__.side_effect = lambda *args: raw.commit()
+    cursor.fetchall.return_value = [(1,)]
+    cursor.fetchmany.side_effect = [[(2,)], []]
+    repository = ProductionSensorDataRepository(client, mocker.Mock(), save_mode="bulk")
+    frame = pd.DataFrame({"factory": ["H"], "tag": ["A"], "date": ["2024-12-01"], "d0_0": [1.0]})
+
+    with pytest.raises(RuntimeError):
+        with client.unit_of_work() as uow:
+            client.execute_query("SELECT 1")
+            assert repository.save_sensor_data(frame, "sensor_data_table")
+            with pytest.raises(ValueError):
+                with uow.savepoint():
+                    list(client.iter_query("SELECT 2"))
+                    raise ValueError("formula failed")
+            raise RuntimeError("boom")
+
+    raw.commit.assert_not_called()
+    raw.rollback.assert_called_once()
+    assert cursor.close.call_count >= 3
+    assert cursor.fast_executemany is True
+    executed = [call.args[0] for call in cursor.execute.call_args_list]
+    assert "ROLLBACK TRANSACTION [uow_sp1]" in executed
+
+
+def test_isolation_level_is_applied_and_reset(mocker):
+    """読み込み前に分離レベルが設定され、接続をプールに返却する際に元に戻されるかを検証"""
+    from common.SQLServer.client import SESSION_RESET_QUERY, SQLClient
+    mock_connect = mocker.patch("pyodbc.connect")
+    raw = mock_connect.return_value
+    client = SQLClient(ConnectionFactory("s", "d", "u", "p")).with_isolation("snapshot")
+
+    client.execute_query("SELECT 1")
+
+    cursor = raw.cursor.return_value.__enter__.return_value
+    assert [call.args[0] for call in cursor.execute.call_args_list] == [
+        "SET TRANSACTION ISOLATION LEVEL SNAPSHOT", "SELECT 1"
+    ]
+    raw.cursor.return_value.execute.assert_called_once_with(SESSION_RESET_QUERY)
+
+
+def test_isolation_level_inside_unit_of_work(mocker):
+    """作業単位の中では作業単位の分離レベルに従い、操作毎には設定しないかを検証"""
+    from common.SQLServer.client import SQLClient
+    mocker.patch("pyodbc.connect")
+    client = SQLClient(ConnectionFactory("s", "d", "u", "p"), isolation_level="read_committed")
+    with pytest.raises(ValueError):
+        client.with_isolation("chaos")
+
+    with client.unit_of_work(isolation_level="serializable") as uow:
+        client.execute_query("SELECT 1")
+        cursor = uow.connection.cursor.return_value
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        statements += [call.args[0] for call in cursor.__enter__.return_value.execute.call_args_list]
+
+    assert statements == ["SET TRANSACTION ISOLATION LEVEL SERIALIZABLE", "SELECT 1"]
+
+
+def test_lock_waits_are_reported(mocker):
+    """track_lock_waits が有効な場合、実行前後のロック待ち時間の差がイベントに記録されるかを検証"""
+    from common.SQLServer.client import SQLClient
+    mock_connect = mocker.patch("pyodbc.connect")
+    cursor = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    cursor.fetchone.side_effect = [(100,), (350,)]
+    cursor.fetchall.return_value = [(1,)]
+    events = []
+    client = SQLClient(ConnectionFactory("s", "d", "u", "p"), hooks=[events.append], track_lock_waits=True)
+
+    client.execute_query("SELECT 1")
+
+    assert events[0].lock_wait_seconds == pytest.approx(0.25)
@@ -0,0 +1,262 @@
+import bisect
+import hashlib
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+# ヒストグラムのバケット上限（秒）。最後のバケットは上限なし
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+_STRING_LITERAL = re.compile(r"N?'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w\]#@])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROW_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """
+    クエリの形（リテラルとパラメータ数を除いたもの）を返します。
+
+    文字列・数値のリテラルは ? に置き換え、"?, ?, ?" や "(?, ?), (?, ?)" のような
+    パラメータの並びは件数に関係なく 1 つにまとめます。空白は 1 つにまとめ、大文字にします。
+    """
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("?", shape)
+    shape = _ROW_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip().upper()
+
+
+@lru_cache(maxsize=1024)
+def shape_hash(statement: str) -> str:
+    """statement_shape の 16 桁のハッシュ値を返します。"""
+    return hashlib.blake2b(statement_shape(statement).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def estimate_bytes(rows: Sequence) -> int:
+    """先頭行の大きさから、取得した行のおおよそのバイト数を見積もります。"""
+    if not rows:
+        return 0
+    return sum(sys.getsizeof(value) for value in rows[0]) * len(rows)
+
+
+class QueryEvent:
+    """1 回のクエリ・ストアドプロシージャ実行の計測結果"""
+    __slots__ = ("kind", "statement", "param_count", "first_row_seconds", "duration", "rows", "bytes", "error",
+                 "lock_wait_seconds")
+
+    def __init__(self, kind: str, statement: str, param_count: int, first_row_seconds: float, duration: float,
+                 rows: int, nbytes: int, error: Optional[BaseException] = None, lock_wait_seconds: float = 0.0):
+        self.kind = kind
+        self.statement = statement
+        self.param_count = param_count
+        self.first_row_seconds = first_row_seconds
+        self.duration = duration
+        self.rows = rows
+        self.bytes = nbytes
+        self.error = error
+        # SQLClient の track_lock_waits が有効な場合のみ計測（それ以外は 0）
+        self.lock_wait_seconds = lock_wait_seconds
+
+    @property
+    def shape(self) -> str:
+        return statement_shape(self.statement)
+
+    @property
+    def shape_hash(self) -> str:
+        return shape_hash(self.statement)
+
+
+class QueryProbe:
+    """
+    SQLClient の 1 回の実行を計測するコンテキストマネージャ。終了時に QueryEvent を各フックに渡します。
+
+    フックの例外はクエリの結果に影響させません。
+    """
+    __slots__ = ("hooks", "kind", "statement", "param_count", "started", "first_row_at", "rows", "bytes", "lock_wait")
+
+    def __init__(self, hooks: Sequence, kind: str, statement: str, params=None):
+        self.hooks = hooks
+        self.kind = kind
+        self.statement = statement
+        self.param_count = len(params) if params else 0
+        self.started = 0.0
+        self.first_row_at = None
+        self.rows = 0
+        self.bytes = 0
+        self.lock_wait = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def first_row(self):
+        """最初の結果が返された時点を記録します（2 回目以降は無視）。"""
+        if self.first_row_at is None:
+            self.first_row_at = time.perf_counter()
+
+    def fetched(self, rows: Sequence):
+        """取得した行を加算します。"""
+        self.first_row()
+        self.rows += len(rows)
+        self.bytes += estimate_bytes(rows)
+
+    def lock_waited(self, seconds: float):
+        """実行中のロック待ち時間を加算します。"""
+        self.lock_wait += seconds
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        finished = time.perf_counter()
+        # ジェネレータを途中で閉じた場合（GeneratorExit）は失敗として扱わない
+        error = exc_value if exc_type is not None and not issubclass(exc_type, GeneratorExit) else None
+        first_row_at = self.first_row_at if self.first_row_at is not None else finished
+        event = QueryEvent(self.kind, self.statement, self.param_count, first_row_at - self.started,
+                           finished - self.started, self.rows, self.bytes, error, self.lock_wait)
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception:
+                pass
+        return False
+
+
+class _NullProbe:
+    """フックが無い場合の何もしない QueryProbe"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def first_row(self):
+        pass
+
+    def fetched(self, rows: Sequence):
+        pass
+
+    def lock_waited(self, seconds: float):
+        pass
+
+
+NULL_PROBE = _NullProbe()
+
+
+class _ShapeStats:
+    __slots__ = ("shape", "count", "errors", "total", "max", "first_row_total", "lock_wait_total", "rows", "bytes",
+                 "buckets")
+
+    def __init__(self, shape: str):
+        self.shape = shape
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.first_row_total = 0.0
+        self.lock_wait_total = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+
+    def add(self, event: QueryEvent):
+        self.count += 1
+        self.errors += event.error is not None
+        self.total += event.duration
+        self.max = max(self.max, event.duration)
+        self.first_row_total += event.first_row_seconds
+        self.lock_wait_total += event.lock_wait_seconds
+        self.rows += event.rows
+        self.bytes += event.bytes
+        self.buckets[bisect.bisect_left(DURATION_BUCKETS, event.duration)] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "shape": self.shape,
+            "count": self.count,
+            "errors": self.errors,
+            "total_seconds": self.total,
+            "avg_seconds": self.total / self.count,
+            "max_seconds": self.max,
+            "avg_first_row_seconds": self.first_row_total / self.count,
+            "lock_wait_seconds": self.lock_wait_total,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "histogram": dict(zip([*DURATION_BUCKETS, float("inf")], self.buckets)),
+        }
+
+
+class QueryProfiler:
+    """
+    クエリの形毎に実行回数・処理時間のヒストグラム・行数を集計するフック。
+
+    集計する形の数は max_shapes までとし、超えた場合は最も長く実行されていない形を破棄します。
+    """
+
+    def __init__(self, max_shapes: int = 500):
+        """
+        :param max_shapes: int, 集計するクエリの形の上限
+        """
+        self.max_shapes = max_shapes
+        self._shapes: "OrderedDict[str, _ShapeStats]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, event: QueryEvent):
+        key = event.shape_hash
+        with self._lock:
+            stats = self._shapes.get(key)
+            if stats is None:
+                stats = self._shapes[key] = _ShapeStats(event.shape)
+                if len(self._shapes) > self.max_shapes:
+                    self._shapes.popitem(last=False)
+            else:
+                self._shapes.move_to_end(key)
+            stats.add(event)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        :return: Dict[str, dict], 形のハッシュ値 → {"shape", "count", "errors", "total_seconds", "avg_seconds",
+                 "max_seconds", "avg_first_row_seconds", "lock_wait_seconds", "rows", "bytes",
+                 "histogram": {バケット上限秒: 件数}}
+        """
+        with self._lock:
+            return {key: stats.to_dict() for key, stats in self._shapes.items()}
+
+    def top(self, n: int = 10) -> List[dict]:
+        """合計処理時間の長い順に n 件の形の集計を返します。"""
+        ranked = sorted(self.snapshot().items(), key=lambda item: item[1]["total_seconds"], reverse=True)
+        return [dict(stats, shape_hash=key) for key, stats in ranked[:n]]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+class SlowQueryLog:
+    """処理時間が threshold_seconds 以上のクエリをロガーに出力するフック。"""
+
+    def __init__(self, logger, threshold_seconds: float = 5.0, max_statement_length: int = 500):
+        """
+        :param logger: ロガー
+        :param threshold_seconds: float, 出力する処理時間の閾値（秒）
+        :param max_statement_length: int, 出力するクエリの最大文字数
+        """
+        self.logger = logger
+        self.threshold_seconds = threshold_seconds
+        self.max_statement_length = max_statement_length
+
+    def __call__(self, event: QueryEvent):
+        if event.duration < self.threshold_seconds:
+            return
+        statement = _WHITESPACE.sub(" ", event.statement).strip()[:self.max_statement_length]
+        self.logger.warning(
+            f"Slow {event.kind} [{event.shape_hash}] took {event.duration:.3f}s "
+            f"(first row {event.first_row_seconds:.3f}s, lock wait {event.lock_wait_seconds:.3f}s, "
+            f"{event.param_count} params, {event.rows} rows, ~{event.bytes} bytes{', failed' if event.error is not None else ''}): {statement}"
+        )
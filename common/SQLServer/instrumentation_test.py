@@ -0,0 +1,97 @@
+import pytest
+
+from common.SQLServer.client import ConnectionFactory, SQLClient
+from common.SQLServer.instrumentation import QueryEvent, QueryProfiler, SlowQueryLog, shape_hash, statement_shape
+
+
+@pytest.fixture
+def sql_client(mocker):
+    mock_connect = mocker.patch("pyodbc.connect")
+    cursor = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    factory = ConnectionFactory("s", "d", "u", "p")
+    return SQLClient(factory), cursor
+
+
+def test_statement_shape_ignores_literals_and_parameter_count():
+    """リテラルの値やパラメータ数が違っても同じ形になるかを検証"""
+    a = "SELECT * FROM t WHERE tag IN (?, ?, ?) AND date >= '2024-12-01' AND n = 1"
+    b = "select *\n  from t where tag in (?) and date >= '2025-01-01' and n = 25"
+    c = "SELECT * FROM (VALUES (?, ?), (?, ?)) AS k(tag, factory)"
+    d = "SELECT * FROM (VALUES (?, ?)) AS k(tag, factory)"
+
+    assert statement_shape(a) == statement_shape(b)
+    assert shape_hash(a) == shape_hash(b)
+    assert shape_hash(c) == shape_hash(d)
+    assert shape_hash(a) != shape_hash(c)
+    assert statement_shape("SELECT d0_1 FROM #fetch_keys") == "SELECT D0_1 FROM #FETCH_KEYS"
+
+
+def test_execute_query_reports_event(sql_client):
+    """execute_query の実行毎にフックへ行数・パラメータ数・処理時間が渡されるかを検証"""
+    client, cursor = sql_client
+    cursor.fetchall.return_value = [(1, "a"), (2, "b")]
+    events = []
+    client.add_hook(events.append)
+
+    assert client.execute_query("SELECT ?, ?", [1, 2]) == [(1, "a"), (2, "b")]
+
+    event = events[0]
+    assert (event.kind, event.param_count, event.rows, event.error) == ("query", 2, 2, None)
+    assert event.bytes > 0
+    assert 0 <= event.first_row_seconds <= event.duration
+
+
+def test_iter_query_reports_event_when_closed_early(sql_client):
+    """iter_query を途中で閉じても 1 回分のイベントが失敗扱いにならずに渡されるかを検証"""
+    client, cursor = sql_client
+    cursor.fetchmany.side_effect = [[(1,)], [(2,)], []]
+    events = []
+    client.add_hook(events.append)
+
+    batches = client.iter_query("SELECT 1", batch_size=1)
+    next(batches)
+    batches.close()
+
+    assert len(events) == 1
+    assert events[0].rows == 1
+    assert events[0].error is None
+
+
+def test_hook_errors_do_not_fail_query(sql_client, mocker):
+    """フックの例外がクエリの結果に影響しないかを検証"""
+    client, cursor = sql_client
+    cursor.fetchall.return_value = [(1,)]
+    client.add_hook(mocker.Mock(side_effect=RuntimeError("broken hook")))
+
+    assert client.execute_query("SELECT 1") == [(1,)]
+
+
+def test_profiler_histogram_and_bound():
+    """形毎の集計とヒストグラム、max_shapes を超えた形の破棄を検証"""
+    profiler = QueryProfiler(max_shapes=2)
+    profiler(QueryEvent("query", "SELECT a FROM t WHERE x = 1", 0, 0.001, 0.002, 10, 100))
+    profiler(QueryEvent("query", "SELECT a FROM t WHERE x = 2", 0, 0.1, 2.0, 5, 50))
+
+    stats = profiler.snapshot()[shape_hash("SELECT a FROM t WHERE x = 1")]
+    assert stats["count"] == 2
+    assert stats["rows"] == 15
+    assert stats["max_seconds"] == 2.0
+    assert stats["histogram"][0.005] == 1
+    assert stats["histogram"][5.0] == 1
+
+    profiler(QueryEvent("query", "SELECT b FROM t", 0, 0.0, 0.0, 0, 0))
+    profiler(QueryEvent("query", "SELECT c FROM t", 0, 0.0, 0.5, 0, 0))
+    assert len(profiler.snapshot()) == 2
+    assert profiler.top(1)[0]["shape"] == "SELECT C FROM T"
+
+
+def test_slow_query_log_threshold(mocker):
+    """閾値以上のクエリのみ出力されるかを検証"""
+    logger = mocker.Mock()
+    slow_log = SlowQueryLog(logger, threshold_seconds=1.0)
+
+    slow_log(QueryEvent("query", "SELECT 1", 0, 0.1, 0.5, 1, 10))
+    slow_log(QueryEvent("procedure", "EXEC batch.merge_temp_to_main", 2, 0.1, 3.0, 0, 0))
+
+    logger.warning.assert_called_once()
+    assert "EXEC batch.merge_temp_to_main" in logger.warning.call_args[0][0]
@@ -0,0 +1,152 @@
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+RETURN_CODE_COLUMN = "__return_code"
+_OUTPUT_VARIABLE = "@__out_{}"
+
+
+class OutputParam:
+    """
+    ストアドプロシージャの OUTPUT パラメータ。
+
+    パラメータのリストに入力値と混ぜて指定し、実行後に value に出力値が設定されます。
+    pyodbc は OUTPUT パラメータに対応していないため、変数で受け取って最後の結果セットとして返します。
+    """
+
+    def __init__(self, sql_type: str, value=None):
+        """
+        :param sql_type: str, パラメータの型（例: "INT", "NVARCHAR(100)", "DATETIME2"）
+        :param value: 入出力パラメータの場合の入力値（省略可能）
+        """
+        self.sql_type = sql_type
+        self.value = value
+
+
+def build_procedure_batch(procedure_name: str, params: Optional[Sequence] = None) -> Tuple[str, list]:
+    """
+    戻り値コードと OUTPUT パラメータを最後の結果セットとして返すバッチを作成します。
+
+        SET NOCOUNT ON;
+        DECLARE @__return_code INT; DECLARE @__out_1 INT = ?;
+        EXEC @__return_code = procedure ?, @__out_1 OUTPUT;
+        SELECT @__return_code AS [__return_code], @__out_1;
+        SET NOCOUNT OFF;
+
+    NOCOUNT は行数のメッセージが空の結果セットとして返らないようにするためで、実行後に元に戻します。
+
+    :param procedure_name: str, ストアドプロシージャの名前
+    :param params: Optional[Sequence], 入力値と OutputParam のリスト
+    :return: Tuple[str, list], (バッチ, パラメータ)
+    """
+    declarations = [f"DECLARE @{RETURN_CODE_COLUMN} INT;"]
+    arguments, outputs, values = [], [], []
+    for param in params or []:
+        if isinstance(param, OutputParam):
+            variable = _OUTPUT_VARIABLE.format(len(outputs) + 1)
+            if param.value is None:
+                declarations.append(f"DECLARE {variable} {param.sql_type};")
+            else:
+                declarations.append(f"DECLARE {variable} {param.sql_type} = ?;")
+                values.append(param.value)
+            arguments.append(f"{variable} OUTPUT")
+            outputs.append(variable)
+        else:
+            arguments.append("?")
+    # 宣言の初期値のパラメータが EXEC の入力値より先に来るように並べる
+    values.extend(param for param in params or [] if not isinstance(param, OutputParam))
+
+    exec_statement = f"EXEC @{RETURN_CODE_COLUMN} = {procedure_name}"
+    if arguments:
+        exec_statement += " " + ", ".join(arguments)
+    selected = ", ".join([f"@{RETURN_CODE_COLUMN} AS [{RETURN_CODE_COLUMN}]", *outputs])
+    batch = "\n".join([
+        "SET NOCOUNT ON;",
+        *declarations,
+        f"{exec_statement};",
+        f"SELECT {selected};",
+        "SET NOCOUNT OFF;",
+    ])
+    return batch, values
+
+
+class ResultSet:
+    """ストアドプロシージャの 1 つの結果セット。行は fetchmany で batch_size 行ずつ読み込みます。"""
+
+    def __init__(self, call: "ProcedureCall", index: int):
+        self._call = call
+        self.index = index
+        self.columns = [column[0] for column in call.cursor.description]
+
+    def __iter__(self) -> Iterator[list]:
+        """行のバッチ（リスト）を返します。次の結果セットに進んだ後は何も返しません。"""
+        while self._call.current is self:
+            rows = self._call.cursor.fetchmany(self._call.batch_size)
+            if not rows:
+                break
+            self._call.probe.fetched(rows)
+            yield rows
+
+    def fetchall(self) -> list:
+        """残りの行を全て返します。"""
+        return [row for rows in self for row in rows]
+
+
+class ProcedureCall:
+    """
+    SQLClient.call_procedure で実行中のストアドプロシージャ。
+
+    result_sets() で結果セットを順に読み込み、全ての結果セットを読み終えた後（drain 後）に
+    return_code / output_values が参照できます。
+    """
+
+    def __init__(self, cursor, params: Optional[Sequence], batch_size: int, probe):
+        self.cursor = cursor
+        self.batch_size = batch_size
+        self.probe = probe
+        self.current: Optional[ResultSet] = None
+        self._outputs = [param for param in params or [] if isinstance(param, OutputParam)]
+        self._index = 0
+        self._started = False
+        self._drained = False
+        self._return_code = None
+
+    def result_sets(self) -> Iterator[ResultSet]:
+        """
+        結果セットを順に返します（戻り値コード・OUTPUT パラメータの結果セットは含みません）。
+        次の結果セットに進むと、前の結果セットの読み残した行は破棄されます。
+        """
+        while not self._drained:
+            if self._started and not self.cursor.nextset():
+                self._finish(None)
+                return
+            self._started = True
+            if self.cursor.description is None:
+                continue
+            if self.cursor.description[0][0] == RETURN_CODE_COLUMN:
+                self._finish(self.cursor.fetchone())
+                return
+            self.current = ResultSet(self, self._index)
+            self._index += 1
+            yield self.current
+
+    def _finish(self, trailer):
+        self.current = None
+        self._drained = True
+        if trailer is not None:
+            self._return_code = trailer[0]
+            for param, value in zip(self._outputs, trailer[1:]):
+                param.value = value
+
+    def drain(self) -> "ProcedureCall":
+        """読み残した結果セットを全て破棄し、戻り値コードと OUTPUT パラメータを取得します。"""
+        for _ in self.result_sets():
+            pass
+        return self
+
+    @property
+    def return_code(self) -> Optional[int]:
+        return self.drain()._return_code
+
+    @property
+    def output_values(self) -> List:
+        self.drain()
+        return [param.value for param in self._outputs]
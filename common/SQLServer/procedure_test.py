@@ -0,0 +1,110 @@
+import pytest
+
+from common.SQLServer.client import ConnectionFactory, SQLClient
+from common.SQLServer.procedure import RETURN_CODE_COLUMN, OutputParam, build_procedure_batch
+
+
+class FakeCursor:
+    """複数の結果セットを返すカーソル（結果セットは (カラム名のリスト, 行のリスト)、None は行数のみの結果）"""
+
+    def __init__(self, result_sets):
+        self.result_sets = result_sets
+        self.position = 0
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, params):
+        self.executed.append((query, params))
+        self.position = 0
+
+    @property
+    def description(self):
+        result_set = self.result_sets[self.position]
+        return None if result_set is None else [(column,) for column in result_set[0]]
+
+    def fetchmany(self, size):
+        rows = self.result_sets[self.position][1]
+        batch, self.result_sets[self.position] = rows[:size], (self.result_sets[self.position][0], rows[size:])
+        return batch
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def nextset(self):
+        self.position += 1
+        return self.position < len(self.result_sets)
+
+
+@pytest.fixture
+def client_with_cursor(mocker):
+    def build(result_sets):
+        cursor = FakeCursor(result_sets)
+        mock_connect = mocker.patch("pyodbc.connect")
+        mock_connect.return_value.cursor.return_value = cursor
+        return SQLClient(ConnectionFactory("s", "d", "u", "p")), cursor
+    return build
+
+
+def test_build_procedure_batch_with_output_params():
+    """OUTPUT パラメータを変数で受け取り、戻り値コードと一緒に SELECT するバッチが作成されるかを検証"""
+    batch, values = build_procedure_batch("batch.export", ["H", OutputParam("INT"), OutputParam("NVARCHAR(10)", "x")])
+
+    assert "DECLARE @__out_1 INT;" in batch
+    assert "DECLARE @__out_2 NVARCHAR(10) = ?;" in batch
+    assert f"EXEC @{RETURN_CODE_COLUMN} = batch.export ?, @__out_1 OUTPUT, @__out_2 OUTPUT;" in batch
+    assert f"SELECT @{RETURN_CODE_COLUMN} AS [{RETURN_CODE_COLUMN}], @__out_1, @__out_2;" in batch
+    assert batch.startswith("SET NOCOUNT ON;") and batch.endswith("SET NOCOUNT OFF;")
+    assert values == ["x", "H"]
+
+
+def test_call_procedure_streams_result_sets(client_with_cursor):
+    """複数の結果セットが接続を保持したまま fetchmany で順に読み込まれ、最後に戻り値コードと出力値が取得されるかを検証"""
+    client, cursor = client_with_cursor([
+        (["tag", "value"], [("A", 1), ("B", 2), ("C", 3)]),
+        None,
+        (["factory"], [("H",)]),
+        ([RETURN_CODE_COLUMN, ""], [(0, 42)]),
+    ])
+    count = OutputParam("INT")
+
+    batches = []
+    with client.call_procedure("batch.export", ["H", count], batch_size=2) as call:
+        for result_set in call.result_sets():
+            batches.append((result_set.index, result_set.columns, list(result_set)))
+
+    assert batches == [
+        (0, ["tag", "value"], [[("A", 1), ("B", 2)], [("C", 3)]]),
+        (1, ["factory"], [[("H",)]]),
+    ]
+    assert call.return_code == 0
+    assert call.output_values == [42]
+    assert count.value == 42
+
+
+def test_call_procedure_drains_unread_sets(client_with_cursor):
+    """読み残した結果セットがあっても、ブロックを抜けると戻り値コードが取得されるかを検証"""
+    client, _ = client_with_cursor([
+        (["a"], [(1,), (2,)]),
+        (["b"], [(3,)]),
+        ([RETURN_CODE_COLUMN], [(5,)]),
+    ])
+
+    assert client.execute_with_result_set("batch.export") == [(1,), (2,)]
+    client, _ = client_with_cursor([(["a"], [(1,)]), ([RETURN_CODE_COLUMN], [(5,)])])
+    assert client.execute_with_return_code("batch.export") == 5
+
+
+def test_iter_procedure(client_with_cursor):
+    client, _ = client_with_cursor([
+        (["a"], [(1,), (2,), (3,)]),
+        (["b"], [(4,)]),
+        ([RETURN_CODE_COLUMN], [(0,)]),
+    ])
+
+    assert list(client.iter_procedure("batch.export", batch_size=2)) == [(0, [(1,), (2,)]), (0, [(3,)]), (1, [(4,)])]
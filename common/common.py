@@ -2,17 +2,27 @@ from common.service.sensor_data_service.sensor_data_service import SensorDataSer
 from common.service.formula_data_service.formula_data_service import FormulaDataService
 
 from common.service.sensor_data_batch_service.sensor_data_batch_service import SensorDataBatchService
+from common.service.sensor_data_ingest_service.sensor_data_ingest_service import SensorDataIngestService
 
 
 from common.repository.schedule_repository import ScheduleRepository
 from common.repository.sensor_data_repository import SensorDataRepository, ProductionSensorDataRepository, TestSensorDataRepository
+from common.repository.sensor_data_cache import SensorDataCache
+from common.repository.sensor_data_store import SensorDataDiskStore, SettledSensorDataRepository
 from common.repository.formula_data_repository import FormulaDataRepository, ProductionFormulaDataRepository,TestFormulaDataRepository
 
 from common.repository.batch_repository import BatchRepository
 
 
+from common.formula.formula_cache import FormulaCache
+from common.settings import (
+    FORMULA_CACHE_SETTINGS, QUERY_INSTRUMENTATION_SETTINGS, SENSOR_DATA_CACHE_SETTINGS, SENSOR_DATA_DISK_STORE_SETTINGS,
+    SQL_ISOLATION_SETTINGS,
+)
+
 from common.logger import Logger
 from common.SQLServer.client import SQLClient,ConnectionFactory
+from common.SQLServer.instrumentation import QueryProfiler, SlowQueryLog
 
 from typing import Optional
 
@@ -21,12 +31,18 @@ from typing import Optional
 class CommonFacade:
     _instance = None
     logger: Optional[Logger] = None
+    connection_factory: Optional[ConnectionFactory] = None
+    sql_client: Optional[SQLClient] = None
+    query_profiler: Optional[QueryProfiler] = None
 
     sensor_data_service: Optional[SensorDataService] = None
     formula_data_service: Optional[FormulaDataService] = None
 
     sensor_data_batch_service: Optional[SensorDataBatchService] = None
+    sensor_data_ingest_service: Optional[SensorDataIngestService] = None
 
+    formula_cache: Optional[FormulaCache] = None
+    sensor_data_cache: Optional[SensorDataCache] = None
 
     _schedule_repository: Optional[ScheduleRepository] = None
     _sensor_data_repository: Optional[SensorDataRepository] = None
@@ -53,17 +69,48 @@ class CommonFacade:
                 username="tem_prog",
                 password="Ladm01#"
             )
-            sql_client = SQLClient(factory)
+            sql_client = SQLClient(factory, track_lock_waits=SQL_ISOLATION_SETTINGS["track_lock_waits"])
+            cls._instance.connection_factory = factory
+            # 複数の操作を 1 つのトランザクションにまとめる場合は sql_client.unit_of_work() を使う
+            cls._instance.sql_client = sql_client
 
             # ロガーのインスタンス
             cls._instance.logger = Logger()
 
+            # クエリの計測（形毎の集計と遅いクエリのログ）
+            if QUERY_INSTRUMENTATION_SETTINGS["enabled"]:
+                cls._instance.query_profiler = QueryProfiler(QUERY_INSTRUMENTATION_SETTINGS["max_shapes"])
+                sql_client.add_hook(cls._instance.query_profiler)
+                sql_client.add_hook(SlowQueryLog(cls._instance.logger, QUERY_INSTRUMENTATION_SETTINGS["slow_query_seconds"]))
+
+            # センサーデータの読み込みキャッシュ
+            if SENSOR_DATA_CACHE_SETTINGS["enabled"]:
+                cls._instance.sensor_data_cache = SensorDataCache(
+                    max_bytes=SENSOR_DATA_CACHE_SETTINGS["max_bytes"],
+                    revalidate_after_seconds=SENSOR_DATA_CACHE_SETTINGS["revalidate_after_seconds"],
+                    logger=cls._instance.logger,
+                )
+
             # センサーデータリポジトリのラップ
-            production_sensor_repo = ProductionSensorDataRepository(sql_client, cls._instance.logger)
-            cls._instance._sensor_data_repository = SensorDataRepository(production_sensor_repo, cls._instance.logger)
+            production_sensor_repo = ProductionSensorDataRepository(
+                sql_client.with_isolation(SQL_ISOLATION_SETTINGS["sensor_data_read"]), cls._instance.logger
+            )
+            if SENSOR_DATA_DISK_STORE_SETTINGS["path"]:
+                # 確定済みの日はローカルディスクから読み込む
+                production_sensor_repo = SettledSensorDataRepository(
+                    production_sensor_repo,
+                    SensorDataDiskStore(SENSOR_DATA_DISK_STORE_SETTINGS["path"], SENSOR_DATA_DISK_STORE_SETTINGS["settle_days"]),
+                    revalidate=SENSOR_DATA_DISK_STORE_SETTINGS["revalidate"],
+                    logger=cls._instance.logger,
+                )
+            cls._instance._sensor_data_repository = SensorDataRepository(
+                production_sensor_repo, cls._instance.logger, cache=cls._instance.sensor_data_cache
+            )
 
             # 計算処理リポジトリのラップ
-            production_formula_repo = ProductionFormulaDataRepository(sql_client, cls._instance.logger)
+            production_formula_repo = ProductionFormulaDataRepository(
+                sql_client.with_isolation(SQL_ISOLATION_SETTINGS["formula_data_read"]), cls._instance.logger
+            )
             cls._instance._formula_data_repository = FormulaDataRepository(production_formula_repo, cls._instance.logger)
 
             # リポジトリをサービスに渡す
@@ -72,6 +119,11 @@ class CommonFacade:
 
             cls._instance._batch_repository = BatchRepository(sql_client, cls._instance.logger)   
             cls._instance.sensor_data_batch_service = SensorDataBatchService(cls._instance._batch_repository, cls._instance.logger)
+            # 読み込み～マージを段毎に並行して行う取り込み
+            cls._instance.sensor_data_ingest_service = SensorDataIngestService(cls._instance._batch_repository, cls._instance.logger)
+
+            # コンパイル済み演算式キャッシュ
+            cls._instance.formula_cache = FormulaCache(**FORMULA_CACHE_SETTINGS)
 
 
         return cls._instance
\ No newline at end of file
@@ -0,0 +1,94 @@
+import ast
+import threading
+from collections import OrderedDict
+from typing import Sequence
+
+from common.formula.formula_compiler import CompiledFormula, get_compiler
+
+
+class FormulaCache:
+    """
+    コンパイル済み演算式のキャッシュ。
+
+    キーは「正規化した演算式 + タグ順 + エンジン」で、メモリ上は件数上限付きの LRU で保持します。
+    ディスクには保存しません。生成した関数を復元するにはファイルの内容を実行する必要があり、
+    実行しない照合方式では SQLite の読み込みが ast エンジンのコンパイル（1 式あたり 1 ミリ秒未満）より遅いためです。
+    """
+
+    def __init__(self, max_size: int = 4096):
+        """
+        :param max_size: int, 保持する最大件数
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be a positive integer")
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, CompiledFormula]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize_formula(formula: str) -> str:
+        """
+        演算式の表記ゆれ（空白・冗長な括弧）を除いた正規形を返します。
+        構文エラーの式は空白のみ正規化します（コンパイル時に改めてエラーになります）。
+        """
+        try:
+            return ast.unparse(ast.parse(formula.strip(), mode="eval"))
+        except SyntaxError:
+            return " ".join(formula.split())
+
+    @classmethod
+    def make_key(cls, formula: str, tags: Sequence[str], engine: str) -> str:
+        return f"{engine}|{','.join(tags)}|{cls.normalize_formula(formula)}"
+
+    def get(self, formula: str, tags: Sequence[str], engine: str = "ast") -> CompiledFormula:
+        """
+        コンパイル済み演算式を取得します。キャッシュに無い場合はコンパイルして保持します。
+
+        :param formula: str, 演算式
+        :param tags: Sequence[str], 関数の引数順のタグ
+        :param engine: str, コンパイルエンジン名（省略時は DataPocessing と同じ "ast"）
+        :return: CompiledFormula
+        """
+        key = self.make_key(formula, tags, engine)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        compiled = get_compiler(engine)(formula, tags)
+
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    def clear(self):
+        """キャッシュを破棄します。"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        監視用のカウンタを返します。
+
+        :return: dict, {"size", "max_size", "hits", "misses", "evictions", "hit_ratio"}
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
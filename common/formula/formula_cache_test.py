@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from common.formula.formula_cache import FormulaCache
+
+
+@pytest.fixture
+def tags():
+    return ["HD13001", "HD13002", "HD13003", "HD13004"]
+
+
+def test_cache_hit_and_miss(tags):
+    """同じ式・タグ順の 2 回目以降がキャッシュヒットになるかを検証"""
+    cache = FormulaCache(max_size=10)
+
+    first = cache.get("(HD13001 + HD13002) * HD13003 / HD13004", tags)
+    second = cache.get("(HD13001+HD13002)*HD13003/HD13004", tags)  # 空白違い
+
+    assert first is second, "正規化後に同じ式がキャッシュヒットしていません"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert first(1.0, 2.0, 3.0, 4.0) == pytest.approx(2.25)
+
+
+def test_cache_key_includes_tag_order(tags):
+    """タグ順が異なる場合は別エントリになるかを検証"""
+    cache = FormulaCache(max_size=10)
+
+    forward = cache.get("HD13001 - HD13002", tags[:2])
+    backward = cache.get("HD13001 - HD13002", list(reversed(tags[:2])))
+
+    assert forward is not backward
+    assert forward(5.0, 3.0) == 2.0
+    assert backward(3.0, 5.0) == 2.0
+
+
+def test_cache_lru_eviction(tags):
+    """上限件数を超えた場合に最も古いエントリが破棄されるかを検証"""
+    cache = FormulaCache(max_size=2)
+
+    cache.get("HD13001 + 1", tags[:1])
+    cache.get("HD13001 + 2", tags[:1])
+    cache.get("HD13001 + 1", tags[:1])   # 最近使用に更新
+    cache.get("HD13001 + 3", tags[:1])   # "+ 2" が破棄される
+
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    cache.get("HD13001 + 1", tags[:1])
+    assert cache.stats()["hits"] == 2, "最近使用したエントリが破棄されています"
+
+
+def test_default_engine_matches_processor(tags):
+    """エンジンを省略した場合、DataPocessing の既定と同じ ast エンジンでコンパイルされるかを検証"""
+    cache = FormulaCache(max_size=10)
+
+    compiled = cache.get("sqrt(HD13001) * max(HD13002, HD13003) / HD13004", tags)
+
+    assert compiled.engine == "ast"
+    assert cache.get("sqrt(HD13001)*max(HD13002,HD13003)/HD13004", tags, engine="ast") is compiled
+    values = [np.array([4.0, 9.0]), np.array([1.0, 5.0]), np.array([2.0, 3.0]), np.array([2.0, 5.0])]
+    np.testing.assert_allclose(compiled(*values), [2.0, 3.0])
+
+
+def test_invalid_max_size():
+    with pytest.raises(ValueError):
+        FormulaCache(max_size=0)
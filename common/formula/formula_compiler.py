@@ -0,0 +1,224 @@
+import ast
+import re
+from typing import Callable, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class CompiledFormula:
+    """
+    演算式をコンパイルした結果を保持するクラス。
+
+    属性:
+        func (Callable): タグ順に配列を受け取る演算関数
+        source (str): func を生成した Python ソース（デバッグ用）
+        engine (str): コンパイルに使用したエンジン名
+        tags (Tuple[str, ...]): func の引数順のタグ
+    """
+    def __init__(self, func: Callable, source: str, engine: str, tags: Sequence[str]):
+        self.func = func
+        self.source = source
+        self.engine = engine
+        self.tags = tuple(tags)
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+
+class UnsupportedFormulaError(ValueError):
+    """AST コンパイラで扱えない構文・関数を含む演算式"""
+
+
+def _placeholder(i: int) -> str:
+    return f"VAR_{i}"
+
+
+def _replace_tags(formula: str, tags: Sequence[str], names: Optional[Sequence[str]] = None) -> str:
+    """
+    タグをプレースホルダーに変換します（タグ同士の部分一致を避けるため単語境界で置換）。
+    names を省略した場合はタグの並び順で VAR_0, VAR_1, ... に変換します。
+    """
+    converted_formula = formula
+    for i, tag in enumerate(tags):
+        name = names[i] if names is not None else _placeholder(i)
+        converted_formula = re.sub(rf"\b{re.escape(tag)}\b", name, converted_formula)
+    return converted_formula
+
+
+def parse_formula(converted_formula: str) -> ast.Expression:
+    """
+    プレースホルダー変換済みの演算式を構文解析します。
+
+    sympify と同様に ^ をべき乗として扱います（演算子の優先順位も ** と同じにするため構文解析前に置換）。
+    """
+    try:
+        return ast.parse(converted_formula.replace("^", "**").strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid formula syntax: {e}")
+
+
+# AST コンパイラで許可する演算子・関数
+_BINARY_OPERATORS = {
+    ast.Add: ast.Add, ast.Sub: ast.Sub, ast.Mult: ast.Mult, ast.Div: ast.Div,
+    ast.Pow: ast.Pow, ast.Mod: ast.Mod,
+}
+_UNARY_OPERATORS = (ast.UAdd, ast.USub)
+_COMPARE_FUNCTIONS = {
+    ast.Lt: "less", ast.LtE: "less_equal", ast.Gt: "greater", ast.GtE: "greater_equal",
+    ast.Eq: "equal", ast.NotEq: "not_equal",
+}
+_FUNCTIONS = {
+    "abs": "abs", "Abs": "abs", "sqrt": "sqrt", "exp": "exp", "log": "log", "log10": "log10",
+    "sin": "sin", "cos": "cos", "tan": "tan", "floor": "floor", "ceil": "ceil",
+    "min": "minimum", "Min": "minimum", "max": "maximum", "Max": "maximum", "where": "where",
+}
+_VARIADIC_FUNCTIONS = ("minimum", "maximum")
+_KERNEL_NAME = "_formula_kernel"
+
+
+class _NumpyKernelBuilder(ast.NodeTransformer):
+    """
+    ホワイトリスト外のノードを拒否しながら、演算式の AST を NumPy 呼び出しの AST に変換します。
+    """
+    def __init__(self, argument_names: Sequence[str]):
+        self.argument_names = set(argument_names)
+
+    @staticmethod
+    def _np_call(func_name: str, args: list) -> ast.Call:
+        return ast.Call(func=ast.Attribute(value=ast.Name(id="_np", ctx=ast.Load()), attr=func_name, ctx=ast.Load()),
+                        args=args, keywords=[])
+
+    def _reduce_call(self, func_name: str, args: list) -> ast.expr:
+        result = args[0]
+        for arg in args[1:]:
+            result = self._np_call(func_name, [result, arg])
+        return result
+
+    def generic_visit(self, node):
+        raise UnsupportedFormulaError(f"Unsupported syntax in formula: {type(node).__name__}")
+
+    def visit_Expression(self, node):
+        return ast.Expression(body=self.visit(node.body))
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise UnsupportedFormulaError(f"Unsupported constant in formula: {node.value!r}")
+        return node
+
+    def visit_Name(self, node):
+        if node.id not in self.argument_names:
+            raise UnsupportedFormulaError(f"Unknown name in formula: {node.id}")
+        return node
+
+    def visit_BinOp(self, node):
+        op = _BINARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise UnsupportedFormulaError(f"Unsupported operator in formula: {type(node.op).__name__}")
+        return ast.BinOp(left=self.visit(node.left), op=op(), right=self.visit(node.right))
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return self._np_call("logical_not", [self.visit(node.operand)])
+        if not isinstance(node.op, _UNARY_OPERATORS):
+            raise UnsupportedFormulaError(f"Unsupported operator in formula: {type(node.op).__name__}")
+        return ast.UnaryOp(op=node.op, operand=self.visit(node.operand))
+
+    def visit_Compare(self, node):
+        # a < b < c は (a < b) and (b < c) として評価
+        operands = [self.visit(node.left)] + [self.visit(c) for c in node.comparators]
+        comparisons = []
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            func_name = _COMPARE_FUNCTIONS.get(type(op))
+            if func_name is None:
+                raise UnsupportedFormulaError(f"Unsupported comparison in formula: {type(op).__name__}")
+            comparisons.append(self._np_call(func_name, [left, right]))
+        return self._reduce_call("logical_and", comparisons)
+
+    def visit_BoolOp(self, node):
+        func_name = "logical_and" if isinstance(node.op, ast.And) else "logical_or"
+        return self._reduce_call(func_name, [self.visit(v) for v in node.values])
+
+    def visit_IfExp(self, node):
+        return self._np_call("where", [self.visit(node.test), self.visit(node.body), self.visit(node.orelse)])
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+            raise UnsupportedFormulaError(f"Unsupported function call in formula: {ast.unparse(node.func)}")
+        func_name = _FUNCTIONS[node.func.id]
+        args = [self.visit(arg) for arg in node.args]
+        if func_name in _VARIADIC_FUNCTIONS:
+            if not args:
+                raise UnsupportedFormulaError(f"{node.func.id}() requires at least one argument")
+            return self._reduce_call(func_name, args)
+        return self._np_call(func_name, args)
+
+
+def compile_ast(formula: str, tags: Sequence[str]) -> CompiledFormula:
+    """
+    Python の ast で演算式を解析し、NumPy カーネルを直接生成します（sympy 不要）。
+
+    四則演算・べき乗・剰余・比較・論理演算・条件式と、_FUNCTIONS の関数のみ扱えます。
+    それ以外を含む式は UnsupportedFormulaError になります。
+
+    :param formula: str, 演算式
+    :param tags: Sequence[str], 演算式の入力タグ（生成する関数の引数順）
+    :return: CompiledFormula
+    """
+    argument_names = [_placeholder(i) for i in range(len(tags))]
+    tree = parse_formula(_replace_tags(formula, tags))
+    func, source = build_numpy_kernel(tree.body, argument_names)
+    return CompiledFormula(func, source, "ast", tags)
+
+
+def build_numpy_kernel(body: ast.expr, argument_names: Sequence[str]) -> Tuple[Callable, str]:
+    """
+    式の AST から NumPy カーネルを生成します（compile_ast と formula_planner で共用）。
+
+    :param body: ast.expr, 引数名のみを変数として含む式
+    :param argument_names: Sequence[str], 生成する関数の引数名
+    :return: Tuple[Callable, str], (関数, 関数定義のソース)
+    """
+    kernel_body = _NumpyKernelBuilder(argument_names).visit(ast.Expression(body=body)).body
+    source = f"def {_KERNEL_NAME}({', '.join(argument_names)}):\n    return {ast.unparse(kernel_body)}\n"
+    namespace = {"_np": np}
+    exec(compile(source, "<compiled formula: ast>", "exec"), namespace)
+    return namespace[_KERNEL_NAME], source
+
+
+def compile_ast_with_fallback(formula: str, tags: Sequence[str]) -> CompiledFormula:
+    """AST コンパイラで扱えない式のみ sympy でコンパイルします。"""
+    try:
+        return compile_ast(formula, tags)
+    except UnsupportedFormulaError:
+        return compile_sympy(formula, tags)
+
+
+def compile_sympy(formula: str, tags: Sequence[str]) -> CompiledFormula:
+    """
+    sympy で演算式を解釈し、NumPy 用の関数を生成します。
+
+    :param formula: str, 演算式
+    :param tags: Sequence[str], 演算式の入力タグ（生成する関数の引数順）
+    :return: CompiledFormula
+    """
+    import inspect
+    # sympy の import は時間が掛かるため、sympy エンジンを使う場合のみ読み込む
+    from sympy import sympify, symbols, lambdify
+
+    converted_formula = _replace_tags(formula, tags)
+    tag_symbols = [symbols(_placeholder(i)) for i in range(len(tags))]  # プレースホルダーで順序を明示
+    formula_expr = sympify(converted_formula, locals={str(s): s for s in tag_symbols})
+    func = lambdify(tag_symbols, formula_expr, modules="numpy")
+    return CompiledFormula(func, inspect.getsource(func), "sympy", tags)
+
+
+COMPILERS = {
+    "ast": compile_ast_with_fallback,
+    "sympy": compile_sympy,
+}
+
+
+def get_compiler(engine: str) -> Callable[[str, Sequence[str]], CompiledFormula]:
+    if engine not in COMPILERS:
+        raise ValueError(f"Unknown formula engine: {engine}")
+    return COMPILERS[engine]
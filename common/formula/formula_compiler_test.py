@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from common.formula.formula_compiler import (
+    UnsupportedFormulaError, compile_ast, compile_ast_with_fallback, compile_sympy, get_compiler
+)
+
+
+@pytest.fixture
+def arrays():
+    rng = np.random.default_rng(1)
+    return [rng.uniform(1, 100, size=(30, 3)) for _ in range(4)]
+
+
+@pytest.mark.parametrize("formula", [
+    "(HD13001 + HD13002) * HD13003 / HD13004",
+    "HD13001 - HD13002 + HD13003",
+    "(HD13001 * HD13002) / (HD13003 - HD13004)",
+    "HD13001 ** 2 + HD13002 ^ 2 - sqrt(HD13003) % 3",
+    "max(HD13001, HD13002, HD13003) - min(HD13004, 50) + abs(-HD13001)",
+    "log(HD13001) + exp(HD13002 / 100)",
+])
+def test_ast_matches_sympy(formula, arrays):
+    """AST コンパイラの結果が sympy と一致するかを検証"""
+    tags = ["HD13001", "HD13002", "HD13003", "HD13004"]
+
+    compiled = compile_ast(formula, tags)
+
+    assert compiled.engine == "ast"
+    np.testing.assert_allclose(compiled(*arrays), compile_sympy(formula, tags)(*arrays))
+
+
+def test_ast_comparisons_and_conditionals():
+    """比較・論理演算・条件式が要素単位で評価されるかを検証"""
+    tags = ["A1", "A2"]
+    a = np.array([1.0, 5.0, 10.0])
+    b = np.array([2.0, 5.0, 3.0])
+
+    np.testing.assert_array_equal(compile_ast("A1 if A1 > A2 else A2", tags)(a, b), [2.0, 5.0, 10.0])
+    np.testing.assert_array_equal(compile_ast("(0 < A1 <= 5) * A2", tags)(a, b), [2.0, 5.0, 0.0])
+    np.testing.assert_array_equal(compile_ast("(A1 >= 5 and not A2 == 5) * 1", tags)(a, b), [0, 0, 1])
+
+
+def test_ast_tags_not_valid_identifiers():
+    """識別子として不正なタグ（数字始まり）や部分一致するタグを扱えるかを検証"""
+    compiled = compile_ast("13D001 + 13D0012 * 2", ["13D001", "13D0012"])
+
+    assert compiled(1.0, 10.0) == 21.0
+
+
+@pytest.mark.parametrize("formula", [
+    "__import__('os').system('echo')",
+    "HD13001.real",
+    "HD13001[0]",
+    "'text'",
+    "unknown_function(HD13001)",
+    "pi * HD13001",
+])
+def test_ast_rejects_unsupported(formula):
+    """ホワイトリスト外の構文・関数・名前を拒否するかを検証"""
+    with pytest.raises(UnsupportedFormulaError):
+        compile_ast(formula, ["HD13001"])
+
+
+def test_ast_invalid_syntax():
+    with pytest.raises(ValueError, match="Invalid formula syntax"):
+        compile_ast("(HD13001 + ) * HD13002", ["HD13001", "HD13002"])
+
+
+def test_fallback_to_sympy():
+    """AST コンパイラで扱えない式は sympy にフォールバックするかを検証"""
+    compiled = compile_ast_with_fallback("pi * HD13001", ["HD13001"])
+
+    assert compiled.engine == "sympy"
+    assert compiled(2.0) == pytest.approx(2 * np.pi)
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError, match="Unknown formula engine"):
+        get_compiler("numexpr")
@@ -0,0 +1,97 @@
+import re
+from collections import deque
+from typing import Collection, Dict, List, Mapping, Sequence, Set, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def find_formula_references(formula: str, formula_ids: Collection[str]) -> List[str]:
+    """
+    演算式中で参照されている他の演算式ID（計算済みタグ）を出現順に返します。
+
+    :param formula: str, 演算式
+    :param formula_ids: Collection[str], 演算式IDの集合
+    :return: List[str], 参照している演算式ID（重複なし）
+    """
+    return list(dict.fromkeys(token for token in _TOKEN_PATTERN.findall(formula) if token in formula_ids))
+
+
+def _find_cycle(start: str, dependencies: Mapping[str, Sequence[str]], remaining: Collection[str]) -> List[str]:
+    """未解決の演算式から依存をたどり、最初に見つかった循環を返します。"""
+    path, positions = [], {}
+    node = start
+    while node not in positions:
+        positions[node] = len(path)
+        path.append(node)
+        node = next(dep for dep in dependencies[node] if dep in remaining)
+    return path[positions[node]:] + [node]
+
+
+def topological_order(dependencies: Mapping[str, Sequence[str]]) -> Tuple[List[str], Dict[str, str]]:
+    """
+    依存関係から評価順を決定します（Kahn のアルゴリズム）。依存先は依存元より先に並びます。
+
+    循環している演算式と、循環に依存している演算式は評価順に含めず、エラー内容を返します。
+    dependencies に含まれない依存先（マスタにない ID など）は無視します。
+
+    :param dependencies: Mapping[str, Sequence[str]], {formula_id: [依存先の formula_id]}
+    :return: Tuple[List[str], Dict[str, str]], (評価順, {formula_id: エラー内容})
+    """
+    dependents: Dict[str, List[str]] = {formula_id: [] for formula_id in dependencies}
+    in_degree = {}
+    for formula_id, deps in dependencies.items():
+        known_deps = [dep for dep in dict.fromkeys(deps) if dep in dependencies]
+        in_degree[formula_id] = len(known_deps)
+        for dep in known_deps:
+            dependents[dep].append(formula_id)
+
+    queue = deque(formula_id for formula_id, degree in in_degree.items() if degree == 0)
+    order = []
+    while queue:
+        formula_id = queue.popleft()
+        order.append(formula_id)
+        for dependent in dependents[formula_id]:
+            in_degree[dependent] -= 1
+            if in_degree[dependent] == 0:
+                queue.append(dependent)
+
+    remaining = set(dependencies) - set(order)
+    failed = {}
+    for formula_id in dependencies:
+        if formula_id in remaining:
+            cycle = _find_cycle(formula_id, dependencies, remaining)
+            failed[formula_id] = f"Circular dependency detected: {' -> '.join(cycle)}"
+    return order, failed
+
+
+def build_reverse_index(formula_set: Mapping[str, dict]) -> Dict[str, List[str]]:
+    """
+    入力タグ → そのタグを直接参照する演算式ID の逆引きインデックスを作成します。
+    計算済みタグ（演算式ID）も入力タグとして扱うため、依存する演算式もたどれます。
+
+    :param formula_set: Mapping[str, dict], {formula_id: {"tags": 入力タグ, ...}}
+    :return: Dict[str, List[str]], {tag: [formula_id]}
+    """
+    reverse_index: Dict[str, List[str]] = {}
+    for formula_id, item in formula_set.items():
+        for tag in dict.fromkeys(item["tags"]):
+            reverse_index.setdefault(tag, []).append(formula_id)
+    return reverse_index
+
+
+def affected_formulas(reverse_index: Mapping[str, Sequence[str]], changed_tags: Collection[str]) -> Set[str]:
+    """
+    変更されたタグの影響を受ける演算式ID（間接的に参照するものを含む）を返します。
+
+    :param reverse_index: Mapping[str, Sequence[str]], build_reverse_index の結果
+    :param changed_tags: Collection[str], 変更されたタグ
+    :return: Set[str], 影響を受ける演算式ID
+    """
+    affected: Set[str] = set()
+    queue = deque(changed_tags)
+    while queue:
+        for formula_id in reverse_index.get(queue.popleft(), ()):
+            if formula_id not in affected:
+                affected.add(formula_id)
+                queue.append(formula_id)
+    return affected
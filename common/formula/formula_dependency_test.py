@@ -0,0 +1,57 @@
+from common.formula.formula_dependency import (
+    affected_formulas, build_reverse_index, find_formula_references, topological_order
+)
+
+
+def test_find_formula_references():
+    """演算式中の他の演算式IDが出現順・重複なしで抽出されるかを検証（部分一致は除外）"""
+    formula_ids = {"CH3001", "CH3002", "CH300"}
+
+    references = find_formula_references("CH3002 * 13D001 + CH3001 / CH3002 + CH30011", formula_ids)
+
+    assert references == ["CH3002", "CH3001"]
+
+
+def test_topological_order():
+    """依存先が依存元より先に並ぶかを検証"""
+    order, failed = topological_order({
+        "C": ["A", "B"],
+        "B": ["A"],
+        "A": [],
+        "D": ["UNKNOWN"],  # マスタにない依存先は無視
+    })
+
+    assert failed == {}
+    assert order.index("A") < order.index("B") < order.index("C")
+    assert "D" in order
+
+
+def test_topological_order_detects_cycles():
+    """循環依存と、循環に依存する演算式が評価順から除外されるかを検証"""
+    order, failed = topological_order({
+        "A": ["B"],
+        "B": ["A"],
+        "C": ["A"],
+        "S": ["S"],
+        "E": [],
+    })
+
+    assert order == ["E"]
+    assert failed["A"] == "Circular dependency detected: A -> B -> A"
+    assert failed["C"] == "Circular dependency detected: A -> B -> A"
+    assert failed["S"] == "Circular dependency detected: S -> S"
+
+
+def test_affected_formulas_through_reverse_index():
+    """変更タグを直接・間接に参照する演算式のみが抽出されるかを検証"""
+    formula_set = {
+        "CH3001": {"tags": ["13D001", "13D002"]},
+        "CH3002": {"tags": ["CH3001", "13D003"]},
+        "CH3003": {"tags": ["13D004"]},
+    }
+    reverse_index = build_reverse_index(formula_set)
+
+    assert reverse_index["CH3001"] == ["CH3002"]
+    assert affected_formulas(reverse_index, ["13D001"]) == {"CH3001", "CH3002"}
+    assert affected_formulas(reverse_index, ["13D003"]) == {"CH3002"}
+    assert affected_formulas(reverse_index, ["13D999"]) == set()
@@ -0,0 +1,73 @@
+from typing import Callable, Sequence, Tuple
+
+import numpy as np
+
+# データ保証区分
+ASSURANCE_NG = 0      # 入力タグのいずれかが正常値でない
+ASSURANCE_OK = 1      # 全ての入力タグが正常値
+ASSURANCE_ERROR = 2   # 計算エラー（ゼロ除算・不正演算）
+
+EVALUATION_MODES = ("vectorized", "per_hour")
+
+
+def evaluate_vectorized(formula_func: Callable, values: Sequence[np.ndarray], assurances: Sequence[np.ndarray],
+                        decimals: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    演算式を (時間 × チャネル) 配列全体に対して一度だけ評価します。
+
+    ゼロ除算・不正演算は例外にせず、要素単位のエラーマスク（非有限値）として検出します。
+    いずれかのチャネルでエラーとなった時間は、従来どおり d1～d3 を全て欠損値とし、保証区分を 2 にします。
+
+    :param formula_func: Callable, タグ順に配列を受け取る演算関数
+    :param values: Sequence[np.ndarray], タグ毎の値配列 (..., 時間, チャネル)
+    :param assurances: Sequence[np.ndarray], タグ毎の保証区分配列 (..., 時間)
+    :param decimals: int, 丸め桁数
+    :return: Tuple[np.ndarray, np.ndarray], 計算結果 (..., 時間, チャネル)（エラーは NaN）と保証区分 (..., 時間)
+    """
+    if not values:
+        raise ValueError("At least one tag is required for evaluation.")
+
+    values = [np.asarray(v, dtype=np.float64) for v in values]
+    shape = np.broadcast_shapes(*(v.shape for v in values))
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        raw = np.asarray(formula_func(*values), dtype=np.float64)
+        # 定数式などでスカラーが返る場合も入力と同じ形状に揃える
+        result = np.round(np.broadcast_to(raw, shape), decimals)
+
+    error_mask = ~np.isfinite(result)
+    hour_error = error_mask.any(axis=-1)
+    result[hour_error] = np.nan
+
+    assurance = np.logical_and.reduce([np.asarray(a) == 1 for a in assurances]).astype(np.int64)
+    assurance[hour_error] = ASSURANCE_ERROR
+    return result, assurance
+
+
+def evaluate_per_hour(formula_func: Callable, values: Sequence[np.ndarray], assurances: Sequence[np.ndarray],
+                      decimals: int = 1, logger=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    従来方式: 時間・チャネル毎に演算関数を呼び出して評価します。
+
+    evaluate_vectorized と同じ入出力形式で、結果比較や切り分け用に残しています。
+    """
+    if not values:
+        raise ValueError("At least one tag is required for evaluation.")
+
+    shape = np.broadcast_shapes(*(np.shape(v) for v in values))
+    result = np.full(shape, np.nan)
+    assurance = np.zeros(shape[:-1], dtype=np.int64)
+    for index in np.ndindex(*shape[:-1]):
+        try:
+            with np.errstate(divide="raise", invalid="raise"):
+                for c in range(shape[-1]):
+                    result[index + (c,)] = round(formula_func(*[v[index + (c,)] for v in values]), decimals)
+                assurance[index] = int(all(a[index] == 1 for a in assurances))
+        except (FloatingPointError, ZeroDivisionError, ValueError):
+            result[index] = np.nan
+            assurance[index] = ASSURANCE_ERROR
+        except Exception as e:
+            if logger:
+                logger.error(f"Unexpected error at index {index}: {e}")
+            result[index] = np.nan
+            assurance[index] = ASSURANCE_ERROR
+    return result, assurance
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from common.formula.formula_evaluator import evaluate_vectorized, evaluate_per_hour, ASSURANCE_ERROR
+
+
+@pytest.fixture
+def sample_inputs():
+    """2タグ分の (30時間 × 3チャネル) 入力データ"""
+    rng = np.random.default_rng(0)
+    tag1 = rng.uniform(100, 200, size=(30, 3))
+    tag2 = rng.uniform(1, 10, size=(30, 3))
+    tag2[5, 1] = 0.0   # ゼロ除算
+    tag1[7, 2] = 0.0
+    tag2[7, 2] = 0.0   # 0 / 0
+    assurances = [np.ones(30, dtype=int), np.ones(30, dtype=int)]
+    assurances[1][3] = 4
+    return [tag1, tag2], assurances
+
+
+def test_evaluate_vectorized_matches_per_hour(sample_inputs):
+    """一括評価の結果が従来の時間毎評価と一致するかを検証"""
+    values, assurances = sample_inputs
+    formula_func = lambda a, b: (a + b) * a / b
+
+    expected_values, expected_assurance = evaluate_per_hour(formula_func, values, assurances)
+    result_values, result_assurance = evaluate_vectorized(formula_func, values, assurances)
+
+    np.testing.assert_array_equal(result_values, expected_values)
+    np.testing.assert_array_equal(result_assurance, expected_assurance)
+
+
+def test_evaluate_vectorized_error_hours(sample_inputs):
+    """ゼロ除算・不正演算の時間が欠損値かつ保証区分 2 になるかを検証"""
+    values, assurances = sample_inputs
+    result_values, result_assurance = evaluate_vectorized(lambda a, b: a / b, values, assurances)
+
+    assert np.isnan(result_values[5]).all(), "ゼロ除算の時間が欠損値になっていません"
+    assert np.isnan(result_values[7]).all(), "0/0 の時間が欠損値になっていません"
+    assert result_assurance[5] == ASSURANCE_ERROR
+    assert result_assurance[7] == ASSURANCE_ERROR
+    assert result_assurance[3] == 0, "異常値を含む時間の保証区分が正しくありません"
+    assert result_assurance[0] == 1
+    assert not np.isnan(result_values[0]).any()
+
+
+def test_evaluate_vectorized_leading_axes():
+    """日付などの先頭軸を含む配列でも一括評価できるかを検証"""
+    values = [np.full((2, 4, 30, 3), 3.0), np.full((2, 4, 30, 3), 2.0)]
+    assurances = [np.ones((2, 4, 30)), np.ones((2, 4, 30))]
+
+    result_values, result_assurance = evaluate_vectorized(lambda a, b: a * b + 0.04, values, assurances)
+
+    assert result_values.shape == (2, 4, 30, 3)
+    assert result_assurance.shape == (2, 4, 30)
+    assert (result_values == 6.0).all(), "丸め結果が正しくありません"
+
+
+def test_evaluate_vectorized_requires_tags():
+    """タグが無い場合に ValueError が発生するかを検証"""
+    with pytest.raises(ValueError):
+        evaluate_vectorized(lambda: 1.0, [], [])
@@ -0,0 +1,215 @@
+import ast
+import copy
+from typing import Dict, List, Mapping, Sequence
+
+import numpy as np
+
+from common.formula.formula_compiler import (
+    _FUNCTIONS, CompiledFormula, _NumpyKernelBuilder, _replace_tags, build_numpy_kernel,
+    parse_formula
+)
+
+_TAG_PREFIX = "VAR_"
+_STEP_PREFIX = "STEP_"
+# 同じ NumPy 関数に対応する関数名の別名（Max / max など）を 1 つに揃える
+_CANONICAL_FUNCTIONS = {}
+for _name, _func_name in _FUNCTIONS.items():
+    _CANONICAL_FUNCTIONS.setdefault(_func_name, _name)
+_FUNCTION_ALIASES = {name: _CANONICAL_FUNCTIONS[func_name] for name, func_name in _FUNCTIONS.items()}
+
+
+class _Canonicalizer(ast.NodeTransformer):
+    """
+    演算式の AST を正規形に変換します。
+
+    浮動小数点の計算結果が変わらない変換（2 項の + / * の左右の入れ替え、関数名の別名の統一）のみ行います。
+    結合順序の変更（(a + b) + c → a + (b + c)）は丸め誤差で結果が変わるため行いません。
+    """
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, (ast.Add, ast.Mult)) and ast.dump(node.right) < ast.dump(node.left):
+            node.left, node.right = node.right, node.left
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if isinstance(node.func, ast.Name) and node.func.id in _FUNCTION_ALIASES:
+            node.func = ast.Name(id=_FUNCTION_ALIASES[node.func.id], ctx=ast.Load())
+        return node
+
+
+def _is_composite(node: ast.AST) -> bool:
+    return isinstance(node, ast.expr) and not isinstance(node, (ast.Name, ast.Constant))
+
+
+def _references_tag(node: ast.AST) -> bool:
+    return any(isinstance(n, ast.Name) and n.id.startswith(_TAG_PREFIX) for n in ast.walk(node))
+
+
+class _StepExtractor(ast.NodeTransformer):
+    """
+    共通部分式を計算ステップとして切り出し、参照元をステップ名に置き換えます（帰りがけ順）。
+    """
+    def __init__(self, plan: "FormulaPlan", shared_keys: set):
+        self.plan = plan
+        self.shared_keys = shared_keys
+
+    def visit(self, node):
+        if not _is_composite(node):
+            return self.generic_visit(node)
+        key = ast.dump(node)
+        if key in self.plan._step_keys:
+            return ast.Name(id=self.plan._step_keys[key], ctx=ast.Load())
+        node = self.generic_visit(node)
+        if key in self.shared_keys:
+            return ast.Name(id=self.plan._add_step(key, node), ctx=ast.Load())
+        return node
+
+
+class FormulaPlan:
+    """
+    演算式の集合をまとめて評価するための計算計画。
+
+    全演算式を正規化し、
+    - 正規形が一致する演算式（重複）は 1 回だけ計算して各演算式IDに配る
+    - 複数の演算式（または 1 つの式の中の複数箇所）で使われる部分式は 1 回だけ計算して再利用する
+    ように、部分式単位の計算ステップに分解します。
+    AST コンパイラで扱えない式（sympy が必要な式・構文エラー）は unplanned に理由を記録し、計画に含めません。
+
+    属性:
+        steps (Dict[str, CompiledFormula]): ステップ名 → 計算関数（tags は引数のタグ / ステップ名）
+        outputs (Dict[str, str]): 演算式ID → 結果を持つステップ名
+        tag_names (Dict[str, str]): タグ → 計画内の変数名
+        unplanned (Dict[str, str]): 計画に含めなかった演算式ID → 理由
+    """
+    def __init__(self):
+        self.steps: Dict[str, CompiledFormula] = {}
+        self.outputs: Dict[str, str] = {}
+        self.tag_names: Dict[str, str] = {}
+        self.unplanned: Dict[str, str] = {}
+        self.shared_subexpressions = 0
+        self._step_keys: Dict[str, str] = {}
+
+    @classmethod
+    def build(cls, formula_set: Mapping[str, dict]) -> "FormulaPlan":
+        """
+        :param formula_set: Mapping[str, dict], {formula_id: {"formula": 演算式, "tags": 入力タグ}}
+        :return: FormulaPlan
+        """
+        plan = cls()
+        for item in formula_set.values():
+            for tag in item["tags"]:
+                plan.tag_names.setdefault(tag, f"{_TAG_PREFIX}{len(plan.tag_names)}")
+
+        # 正規化した式の AST。正規形が同じ演算式は 1 つにまとめる
+        roots: Dict[str, ast.expr] = {}
+        root_ids: Dict[str, List[str]] = {}
+        for formula_id, item in formula_set.items():
+            try:
+                body = plan._canonical_body(item["formula"], item["tags"])
+            except ValueError as e:  # UnsupportedFormulaError / 構文エラー
+                plan.unplanned[formula_id] = str(e)
+                continue
+            key = ast.dump(body)
+            roots.setdefault(key, body)
+            root_ids.setdefault(key, []).append(formula_id)
+
+        # 2 回以上現れるタグを含む部分式を共通部分式とする
+        counts: Dict[str, int] = {}
+        for body in roots.values():
+            for node in ast.walk(body):
+                if _is_composite(node) and _references_tag(node):
+                    key = ast.dump(node)
+                    counts[key] = counts.get(key, 0) + 1
+        shared_keys = {key for key, count in counts.items() if count > 1}
+        plan.shared_subexpressions = len(shared_keys)
+
+        extractor = _StepExtractor(plan, shared_keys)
+        for key, body in roots.items():
+            lowered = extractor.visit(body)
+            if isinstance(lowered, ast.Name) and lowered.id.startswith(_STEP_PREFIX):
+                step_name = lowered.id
+            else:
+                step_name = plan._add_step(key, lowered)
+            for formula_id in root_ids[key]:
+                plan.outputs[formula_id] = step_name
+        return plan
+
+    def _canonical_body(self, formula: str, tags: Sequence[str]) -> ast.expr:
+        converted_formula = _replace_tags(formula, tags, [self.tag_names[tag] for tag in tags])
+        body = _Canonicalizer().visit(parse_formula(converted_formula)).body
+        # AST コンパイラで扱えない式はここで UnsupportedFormulaError にする
+        _NumpyKernelBuilder([self.tag_names[tag] for tag in tags]).visit(ast.Expression(body=copy.deepcopy(body)))
+        return body
+
+    def _add_step(self, key: str, body: ast.expr) -> str:
+        step_name = self._step_keys.get(key)
+        if step_name is not None:
+            return step_name
+        step_name = f"{_STEP_PREFIX}{len(self.steps)}"
+        arguments = list(dict.fromkeys(
+            n.id for n in ast.walk(body)
+            if isinstance(n, ast.Name) and n.id.startswith((_TAG_PREFIX, _STEP_PREFIX))
+        ))
+        func, source = build_numpy_kernel(body, arguments)
+        self.steps[step_name] = CompiledFormula(func, source, "ast", arguments)
+        self._step_keys[key] = step_name
+        return step_name
+
+    def evaluate(self, values: Mapping[str, np.ndarray]) -> "PlanEvaluation":
+        """
+        入力データを与えて評価を開始します。各ステップは最初に必要になった時点で 1 回だけ計算されます。
+
+        :param values: Mapping[str, np.ndarray], タグ → 値の配列（全タグで同じ形状）
+        :return: PlanEvaluation
+        """
+        return PlanEvaluation(self, values)
+
+    def stats(self) -> dict:
+        """
+        :return: dict, {"formulas", "unique_formulas", "shared_subexpressions", "steps", "unplanned"}
+        """
+        return {
+            "formulas": len(self.outputs),
+            "unique_formulas": len(set(self.outputs.values())),
+            "shared_subexpressions": self.shared_subexpressions,
+            "steps": len(self.steps),
+            "unplanned": len(self.unplanned),
+        }
+
+
+class PlanEvaluation:
+    """
+    1 回分の入力データ（工場・日付のキューブ）に対する計算計画の評価結果。中間結果をメモ化します。
+    """
+    def __init__(self, plan: FormulaPlan, values: Mapping[str, np.ndarray]):
+        self.plan = plan
+        self._results: Dict[str, np.ndarray] = {
+            name: values[tag] for tag, name in plan.tag_names.items() if tag in values
+        }
+
+    def result(self, formula_id: str) -> np.ndarray:
+        """
+        :param formula_id: str, 演算式ID
+        :return: np.ndarray, 演算式の計算結果（丸め・エラー判定前）
+        """
+        return self._compute(self.plan.outputs[formula_id])
+
+    def add_values(self, tag: str, values: np.ndarray):
+        """
+        評価の途中で入力データを追加します（他の演算式の計算結果を参照する場合）。
+
+        :param tag: str, タグ
+        :param values: np.ndarray, 値の配列
+        """
+        name = self.plan.tag_names.get(tag)
+        if name is not None:
+            self._results[name] = values
+
+    def _compute(self, name: str) -> np.ndarray:
+        result = self._results.get(name)
+        if result is None:
+            step = self.plan.steps[name]
+            result = step(*[self._compute(argument) for argument in step.tags])
+            self._results[name] = result
+        return result
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from common.formula.formula_compiler import compile_ast
+from common.formula.formula_planner import FormulaPlan
+
+
+@pytest.fixture
+def values():
+    rng = np.random.default_rng(2)
+    return {tag: rng.uniform(1, 100, size=(2, 30, 3)) for tag in ["HD13001", "HD13002", "HD13003", "HD13004"]}
+
+
+def _formula_set(formulas):
+    tags = ["HD13001", "HD13002", "HD13003", "HD13004"]
+    return {
+        formula_id: {"formula": formula, "tags": [tag for tag in tags if tag in formula]}
+        for formula_id, formula in formulas.items()
+    }
+
+
+def test_plan_matches_individual_compilation(values):
+    """計画による評価結果が演算式毎のコンパイル結果とビット単位で一致するかを検証"""
+    formula_set = _formula_set({
+        "H1": "(HD13001 + HD13002) * HD13003 / HD13004",
+        "H2": "(HD13002 + HD13001) - HD13003",
+        "H3": "sqrt(HD13001 + HD13002) + Max(HD13003, HD13004) * (HD13001 + HD13002)",
+        "H4": "max(HD13004, HD13003) ^ 2",
+    })
+
+    evaluation = FormulaPlan.build(formula_set).evaluate(values)
+
+    for formula_id, item in formula_set.items():
+        expected = compile_ast(item["formula"], item["tags"])(*[values[tag] for tag in item["tags"]])
+        np.testing.assert_array_equal(evaluation.result(formula_id), expected)
+
+
+def test_shared_subexpressions_computed_once():
+    """共通部分式（加算の順序違い・関数名の別名を含む）が 1 つのステップにまとめられるかを検証"""
+    plan = FormulaPlan.build(_formula_set({
+        "H1": "(HD13001 + HD13002) * HD13003",
+        "H2": "(HD13002 + HD13001) / HD13004",
+        "H3": "Max(HD13003, HD13004) - max(HD13003, HD13004)",
+    }))
+
+    # HD13001 + HD13002 / max(HD13003, HD13004) の 2 つ + 各演算式の 3 つ
+    assert plan.stats()["shared_subexpressions"] == 2
+    assert plan.stats()["steps"] == 5
+
+
+def test_duplicate_formulas_fan_out(values):
+    """正規形が同じ演算式が 1 回だけ計算され、各演算式IDに配られるかを検証"""
+    plan = FormulaPlan.build(_formula_set({
+        "H1": "(HD13001 + HD13002) * 2",
+        "H2": "2*(HD13002+HD13001)",
+        "H3": "HD13001 + HD13002 * 2",
+    }))
+
+    assert plan.outputs["H1"] == plan.outputs["H2"]
+    assert plan.outputs["H1"] != plan.outputs["H3"]
+    assert plan.stats()["unique_formulas"] == 2
+    evaluation = plan.evaluate(values)
+    assert evaluation.result("H1") is evaluation.result("H2")
+
+
+def test_reassociation_is_not_merged():
+    """結合順序の違い（丸め誤差で結果が変わり得る）は同じ式として扱わないことを検証"""
+    plan = FormulaPlan.build(_formula_set({
+        "H1": "(HD13001 + HD13002) + HD13003",
+        "H2": "HD13001 + (HD13002 + HD13003)",
+    }))
+
+    assert plan.outputs["H1"] != plan.outputs["H2"]
+
+
+def test_unplanned_formulas():
+    """AST コンパイラで扱えない式・構文エラーの式が計画から除外されるかを検証"""
+    plan = FormulaPlan.build(_formula_set({
+        "H1": "HD13001 * 2",
+        "H2": "pi * HD13001",
+        "H3": "(HD13001 + ) * HD13002",
+    }))
+
+    assert set(plan.outputs) == {"H1"}
+    assert set(plan.unplanned) == {"H2", "H3"}
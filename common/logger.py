@@ -30,8 +30,9 @@ class Logger:
         formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
         stream_handler.setFormatter(formatter)
         
-        # ハンドラをロガーに追加
-        self.logger.addHandler(stream_handler)
+        # ハンドラをロガーに追加（複数回作成しても同じメッセージを重複して出力しない）
+        if not self.logger.handlers:
+            self.logger.addHandler(stream_handler)
 
     def debug(self, message):
         self.logger.debug(message)
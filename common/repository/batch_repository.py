@@ -1,9 +1,11 @@
 from common.SQLServer.client import SQLClient
+from common.repository.sensor_data_bulk_loader import SensorDataBulkLoader, parse_bcp_command
 
 class BatchRepository:
-    def __init__(self, sql_client: SQLClient, logger):
+    def __init__(self, sql_client: SQLClient, logger, loader: SensorDataBulkLoader = None):
         self.sql_client = sql_client
         self.logger = logger
+        self.loader = loader or SensorDataBulkLoader(sql_client, logger)
 
     def execute_stored_procedure_without_result(self, procedure_name, params=None):
         """
@@ -37,7 +39,7 @@ class BatchRepository:
         出力パラメータを返すストアドプロシージャを実行する
 
         :param procedure_name: 実行するストアドプロシージャの名前
-        :param params: ストアドプロシージャの入力・出力パラメータ（リスト）
+        :param params: ストアドプロシージャの入力・出力パラメータ（リスト、出力パラメータは common.SQLServer.procedure.OutputParam）
         :return: 出力パラメータのリスト
         """
         self.logger.info(f"Executing stored procedure with output params: {procedure_name}")
@@ -54,21 +56,28 @@ class BatchRepository:
         self.logger.info(f"Executing stored procedure with return code: {procedure_name}")
         return self.sql_client.execute_with_return_code(procedure_name, params)
 
-#TODO バッチ処理実行ロジック
-    def load_data_to_temp_table(self, bcp_command):
-        pass
+    def load_data_to_temp_table(self, source, format_file=None):
+        """
+        データファイルを取り込みテーブル（一時テーブル）にロードする
 
-    #     BCPコマンドを使用して一時テーブルにデータをロードする
+        :param source: データファイル（CSV）のパス、または bcp_all_factories.bat の bcp コマンド
+                       （bcp コマンドの場合は取り込み先・データファイル・フォーマットファイル・エラーファイルを引き継ぐ）
+        :param format_file: BCP フォーマットファイル（省略時は generate_bcp_format_file.py の並び）
+        :return: 処理件数・rows/sec・除外件数・チャンク毎の処理時間（SensorDataBulkLoader.load の結果）
+        """
+        if str(source).lstrip().lower().startswith("bcp "):
+            command = parse_bcp_command(source)
+            data_file, table_name = command["data_file"], command["table"]
+            format_file, error_file = format_file or command["format_file"], command["error_file"]
+        else:
+            data_file, table_name, error_file = source, None, None
 
-    #     :param bcp_command: BCPコマンドの文字列
-    #     """
-    #     self.logger.info("BCPコマンドを実行中...")
-    #     try:
-    #         result = subprocess.run(bcp_command, shell=True, check=True, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    #         self.logger.info(f"BCPコマンドが成功しました: {result.stdout}")
-    #     except subprocess.CalledProcessError as e:
-    #         self.logger.error(f"BCPコマンドの実行に失敗しました: {e.stderr}")
-    #         raise
+        self.logger.info(f"データファイルをロード中: {data_file}")
+        try:
+            return self.loader.load(data_file, table_name, format_file, error_file)
+        except Exception as e:
+            self.logger.error(f"データファイルのロードに失敗しました: {e}")
+            raise
 
     def merge_temp_to_main(self, process_date, factory_code):
         """
@@ -36,4 +36,20 @@ def test_execute_stored_procedure_without_result_failure(batch_repository, sql_c
 
     sql_client_mock._execute_procedure.assert_called_once_with(procedure_name, params)
     logger_mock.info.assert_called_once_with(f"Executing stored procedure without result: {procedure_name}")
-    logger_mock.error.assert_called_once_with("ストアドプロシージャの実行に失敗しました: Execution failed")
\ No newline at end of file
+    logger_mock.error.assert_called_once_with("ストアドプロシージャの実行に失敗しました: Execution failed")
+
+def test_load_data_to_temp_table_with_bcp_command(sql_client_mock, logger_mock):
+    """bcp コマンドからデータファイル・取り込み先・フォーマットファイルを引き継いでローダーを呼び出すかを検証"""
+    loader = Mock()
+    loader.load.return_value = {"rows": 10}
+    repository = BatchRepository(sql_client=sql_client_mock, logger=logger_mock, loader=loader)
+
+    result = repository.load_data_to_temp_table(
+        'bcp batch.data_loader_data_load_temp in "data.csv" -S host -d TEM -f "format.fmt" -e "error.log" -b 1000'
+    )
+
+    assert result == {"rows": 10}
+    loader.load.assert_called_once_with("data.csv", "batch.data_loader_data_load_temp", "format.fmt", "error.log")
+
+    repository.load_data_to_temp_table("other.csv")
+    loader.load.assert_called_with("other.csv", None, None, None)
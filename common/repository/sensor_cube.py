@@ -0,0 +1,143 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+HOURS = 30                                  # 0時～翌5時までの30時間
+CHANNELS = ("d0", "d1", "d2", "d3")         # d0: データ保証区分, d1～d3: 値
+KEY_COLUMNS = ["factory", "date", "tag"]
+
+# fetch_sensor_data が返す値カラムの並び（チャネル優先: d0_0..d0_29, d1_0..）
+VALUE_COLUMNS = [f"d{i}_{j}" for i in range(len(CHANNELS)) for j in range(HOURS)]
+
+
+def normalize_dates(dates) -> pd.Series:
+    """
+    日付ラベルを 'YYYY-MM-DD' 形式の文字列に揃えます（str / date / datetime の混在対策）。
+    """
+    return pd.to_datetime(pd.Series(dates)).dt.strftime("%Y-%m-%d")
+
+
+class SensorCube:
+    """
+    ワイド形式 (d{i}_{j}) のセンサーデータを [factory, date, tag, hour, channel] の
+    連続した ndarray として保持するクラス。
+
+    各軸のラベルは factories / dates / tags とそのインデックス辞書で引けます。
+    存在しない (factory, date, tag) の組み合わせは NaN で埋められ、present で判別できます。
+    day / tag_block / series はいずれもコピーを伴わないビューを返します。
+
+    add_tag で計算結果（他の演算式から参照される仮想センサー）をタグとして追加できます。
+    追加したタグは values とは別に保持され、tag_block / series / has_tags から参照できます（day には含まれません）。
+    """
+
+    def __init__(self, values: np.ndarray, factories: Sequence[str], dates: Sequence[str], tags: Sequence[str],
+                 present: np.ndarray, meta: pd.DataFrame):
+        self.values = values
+        self.factories = list(factories)
+        self.dates = list(dates)
+        self.tags = list(tags)
+        self.factory_index = {factory: i for i, factory in enumerate(self.factories)}
+        self.date_index = {date: i for i, date in enumerate(self.dates)}
+        self.tag_index = {tag: i for i, tag in enumerate(self.tags)}
+        self.present = present
+        self.meta = meta
+        self.derived_blocks = {}
+        self.derived_present = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "SensorCube":
+        """
+        fetch_sensor_data が返すワイド形式の DataFrame からキューブを構築します。
+
+        120 個の値カラムを 1 回の reshape で (行, 時間, チャネル) に並べ替え、
+        factorize したラベル位置へまとめて書き込みます。
+
+        :param df: pd.DataFrame, factory / tag / date と d0_0～d3_29 を含むデータ
+        :return: SensorCube
+        """
+        missing_columns = [col for col in KEY_COLUMNS + VALUE_COLUMNS if col not in df.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {missing_columns[:5]}")
+
+        dates = normalize_dates(df["date"]).to_numpy()
+        factory_codes, factories = pd.factorize(df["factory"].to_numpy(), sort=True)
+        date_codes, date_labels = pd.factorize(dates, sort=True)
+        tag_codes, tags = pd.factorize(df["tag"].to_numpy(), sort=True)
+
+        block = (
+            df[VALUE_COLUMNS].to_numpy(dtype=np.float64)
+            .reshape(len(df), len(CHANNELS), HOURS)
+            .transpose(0, 2, 1)
+        )
+        shape = (len(factories), len(date_labels), len(tags))
+        values = np.full(shape + (HOURS, len(CHANNELS)), np.nan)
+        values[factory_codes, date_codes, tag_codes] = block
+        present = np.zeros(shape, dtype=bool)
+        present[factory_codes, date_codes, tag_codes] = True
+
+        meta = df.drop(columns=VALUE_COLUMNS).reset_index(drop=True)
+        meta["date"] = dates
+        return cls(values, factories, date_labels, tags, present, meta)
+
+    @property
+    def empty(self) -> bool:
+        return self.values.size == 0
+
+    def day(self, factory: str, date: str) -> np.ndarray:
+        """指定工場・日付の (tag, hour, channel) ビューを返します。"""
+        return self.values[self.factory_index[factory], self.date_index[date]]
+
+    def tag_block(self, tag: str) -> np.ndarray:
+        """指定タグの (factory, date, hour, channel) ビューを返します。"""
+        if tag in self.derived_blocks:
+            return self.derived_blocks[tag]
+        return self.values[:, :, self.tag_index[tag]]
+
+    def series(self, factory: str, date: str, tag: str) -> np.ndarray:
+        """指定工場・日付・タグの (hour, channel) ビューを返します。"""
+        return self.tag_block(tag)[self.factory_index[factory], self.date_index[date]]
+
+    def has_tag(self, tag: str) -> bool:
+        return tag in self.tag_index or tag in self.derived_blocks
+
+    def has_tags(self, tags: List[str]) -> np.ndarray:
+        """
+        指定タグが全て揃っている (factory, date) の真偽値配列を返します。
+        キューブに存在しないタグが含まれる場合は全て False になります。
+        """
+        if any(not self.has_tag(tag) for tag in tags):
+            return np.zeros(self.present.shape[:2], dtype=bool)
+        available = np.ones(self.present.shape[:2], dtype=bool)
+        stored_tags = [self.tag_index[tag] for tag in tags if tag in self.tag_index]
+        if stored_tags:
+            available &= self.present[:, :, stored_tags].all(axis=-1)
+        for tag in tags:
+            if tag in self.derived_present:
+                available &= self.derived_present[tag]
+        return available
+
+    def add_tag(self, tag: str, factory_idx: np.ndarray, date_idx: np.ndarray, values: np.ndarray,
+                assurance_codes: np.ndarray, meta: Optional[pd.DataFrame] = None):
+        """
+        計算結果をタグとして追加します。
+
+        :param tag: str, 追加するタグ（既存のタグとは重複不可）
+        :param factory_idx: np.ndarray, 結果がある工場のインデックス (G,)
+        :param date_idx: np.ndarray, 結果がある日付のインデックス (G,)
+        :param values: np.ndarray, d1～d3 の値 (G, hour, 3)
+        :param assurance_codes: np.ndarray, データ保証区分 (G, hour)
+        :param meta: Optional[pd.DataFrame], 追加するタグの非値カラム（unit / data_division の引き継ぎ用）
+        """
+        if self.has_tag(tag):
+            raise ValueError(f"Tag already exists in cube: {tag}")
+        shape = self.present.shape[:2]
+        block = np.full(shape + (HOURS, len(CHANNELS)), np.nan)
+        block[factory_idx, date_idx, :, 0] = assurance_codes
+        block[factory_idx, date_idx, :, 1:] = values
+        present = np.zeros(shape, dtype=bool)
+        present[factory_idx, date_idx] = True
+        self.derived_blocks[tag] = block
+        self.derived_present[tag] = present
+        if meta is not None and not meta.empty:
+            self.meta = pd.concat([self.meta, meta], ignore_index=True)
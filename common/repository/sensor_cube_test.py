@@ -0,0 +1,85 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from common.repository.sensor_cube import SensorCube, VALUE_COLUMNS
+
+
+@pytest.fixture
+def wide_frame():
+    """fetch_sensor_data 形式のワイドデータ（2工場 × 2日付、タグ欠けあり）"""
+    rows = []
+    for factory, date, tag, base in [
+        ("H", "2024-12-20", "HD13001", 100),
+        ("H", "2024-12-20", "HD13002", 200),
+        ("H", datetime.date(2024, 12, 21), "HD13001", 300),
+        ("J", "2024-12-20", "HD13002", 400),
+    ]:
+        row = {"factory": factory, "tag": tag, "date": date, "unit": "kwh", "data_division": 3}
+        for i in range(4):
+            for j in range(30):
+                row[f"d{i}_{j}"] = 1 if i == 0 else base + i * 1000 + j
+        rows.append(row)
+    return pd.DataFrame(rows)[["factory", "tag", "date", "unit", "data_division"] + VALUE_COLUMNS]
+
+
+def test_from_frame_labels_and_shape(wide_frame):
+    """ラベルとキューブの形状が正しいかを検証"""
+    cube = SensorCube.from_frame(wide_frame)
+
+    assert cube.factories == ["H", "J"]
+    assert cube.dates == ["2024-12-20", "2024-12-21"], "日付ラベルが正規化されていません"
+    assert cube.tags == ["HD13001", "HD13002"]
+    assert cube.values.shape == (2, 2, 2, 30, 4)
+    assert cube.values.flags["C_CONTIGUOUS"]
+
+
+def test_series_values(wide_frame):
+    """(hour, channel) の並びが元のカラムと一致するかを検証"""
+    cube = SensorCube.from_frame(wide_frame)
+
+    series = cube.series("H", "2024-12-21", "HD13001")
+    assert series[0, 0] == 1
+    assert series[5, 1] == 300 + 1000 + 5
+    assert series[29, 3] == 300 + 3000 + 29
+
+
+def test_views_are_zero_copy(wide_frame):
+    """day / tag_block がコピーではなくビューを返すかを検証"""
+    cube = SensorCube.from_frame(wide_frame)
+
+    assert np.shares_memory(cube.day("H", "2024-12-20"), cube.values)
+    assert np.shares_memory(cube.tag_block("HD13002"), cube.values)
+
+
+def test_missing_combinations(wide_frame):
+    """存在しない組み合わせが NaN かつ present=False になるかを検証"""
+    cube = SensorCube.from_frame(wide_frame)
+
+    assert np.isnan(cube.series("J", "2024-12-20", "HD13001")).all()
+    available = cube.has_tags(["HD13001", "HD13002"])
+    assert available.tolist() == [[True, False], [False, False]]
+    assert not cube.has_tags(["UNKNOWN"]).any()
+
+
+def test_add_tag(wide_frame):
+    """追加した計算結果タグが他のタグと同様に参照できるかを検証"""
+    cube = SensorCube.from_frame(wide_frame)
+    values = np.full((1, 30, 3), 7.0)
+    assurance = np.ones((1, 30))
+
+    cube.add_tag("CH3001", np.array([0]), np.array([1]), values, assurance)
+
+    assert cube.has_tag("CH3001")
+    assert cube.series("H", "2024-12-21", "CH3001")[0].tolist() == [1, 7, 7, 7]
+    assert np.isnan(cube.series("H", "2024-12-20", "CH3001")).all()
+    assert cube.has_tags(["HD13001", "CH3001"]).tolist() == [[False, True], [False, False]]
+    with pytest.raises(ValueError, match="already exists"):
+        cube.add_tag("HD13001", np.array([0]), np.array([0]), values, assurance)
+
+
+def test_missing_columns():
+    """必須カラムが欠けている場合に ValueError が発生するかを検証"""
+    with pytest.raises(ValueError, match="Missing required columns"):
+        SensorCube.from_frame(pd.DataFrame({"factory": ["H"], "tag": ["HD13001"], "date": ["2024-12-20"]}))
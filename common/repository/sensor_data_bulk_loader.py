@@ -0,0 +1,254 @@
+import os
+import shlex
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common.settings import SENSOR_DATA_LOAD_SETTINGS, TABLE_NAME_SETTINGS
+
+_NULL_VALUES = ["", "NULL"]
+_REQUIRED_COLUMNS = ("factory", "tag", "date")
+
+
+def default_load_columns() -> List[str]:
+    """
+    generate_bcp_format_file.py のフォーマット（固定カラム、時間毎の d0～d3、last_update）のカラムの並びを返します。
+    """
+    columns = ["factory", "tag", "date", "local_tag", "local_id", "name", "unit", "data_division"]
+    for hour in range(30):
+        columns += [f"d0_{hour}", f"d1_{hour}", f"d2_{hour}", f"d3_{hour}"]
+    columns.append("last_update")
+    return columns
+
+
+def column_kind(column: str) -> str:
+    """
+    取り込みテーブルのカラムの型（"int": data_division / d0、"float": d1～d3、"text": それ以外）を返します。
+    文字モードのフォーマットファイルは全て SQLCHAR のため、型はテーブルのカラムから決めます。
+    """
+    if column == "data_division" or column.startswith("d0_"):
+        return "int"
+    if column[:3] in ("d1_", "d2_", "d3_"):
+        return "float"
+    return "text"
+
+
+def read_format_file(path: str) -> List[str]:
+    """
+    BCP の非 XML フォーマットファイルから、データファイルの列の並びのカラム名を読み込みます。
+
+    :param path: str, フォーマットファイル（generate_bcp_format_file.py で生成したもの）
+    :return: List[str], カラム名
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    columns = []
+    for line in lines[2:2 + int(lines[1])]:
+        fields = line.split()
+        # フィールド番号, データ型, プレフィックス長, 長さ, ターミネータ, テーブルの列番号, カラム名, 照合順序
+        if fields[5] == "0":
+            continue  # テーブルに取り込まない列
+        columns.append(fields[6])
+    return columns
+
+
+def parse_bcp_command(command: str) -> dict:
+    """
+    bcp_all_factories.bat の bcp コマンドから取り込み先・データファイル・フォーマットファイルなどを取り出します。
+
+    :param command: str, 例: bcp batch.data_loader_data_load_temp in "data.csv" -f "format.fmt" -e "error.log" -b 1000
+    :return: dict, {"table", "data_file", "format_file", "error_file", "batch_size"}（指定の無いものは None）
+    """
+    tokens = [token.strip('"') for token in shlex.split(command, posix=False)]
+    if len(tokens) < 4 or tokens[0].lower() != "bcp" or tokens[2].lower() != "in":
+        raise ValueError(f"Unsupported bcp command: {command}")
+    options = {}
+    for flag, value in zip(tokens[4:], tokens[5:]):
+        if flag.startswith("-"):
+            options[flag] = value
+    return {
+        "table": tokens[1],
+        "data_file": tokens[3],
+        "format_file": options.get("-f"),
+        "error_file": options.get("-e"),
+        "batch_size": int(options["-b"]) if "-b" in options else None,
+    }
+
+
+class SensorDataBulkLoader:
+    """
+    データファイル（CSV）をセンサーデータの取り込みテーブルに投入するローダー（bcp の代わり）。
+
+    - chunk_rows 行ずつ読み込み、列単位で型を変換します（変換できない行は rejected として除外）
+    - チャンク毎に fast_executemany で INSERT し、チャンク毎に commit します（bcp -b と同様）
+    - workers 本の接続で並列に投入します。投入待ちのチャンクは max_pending_chunks までに抑えます
+    処理件数・rows/sec・チャンク毎の処理時間は last_load_stats に記録します。
+    """
+
+    def __init__(self, sql_client, logger, chunk_rows: Optional[int] = None, workers: Optional[int] = None,
+                 max_pending_chunks: Optional[int] = None):
+        """
+        :param sql_client: SQLClient, 接続は sql_client.connection_factory から借ります
+        :param logger: ロガー
+        :param chunk_rows: Optional[int], 1 チャンクの行数（省略時は設定値）
+        :param workers: Optional[int], 並列に投入する接続数（省略時は設定値）
+        :param max_pending_chunks: Optional[int], 読み込み済みで投入待ちのチャンク数の上限（省略時は workers の 2 倍）
+        """
+        self.sql_client = sql_client
+        self.logger = logger
+        self.chunk_rows = chunk_rows or SENSOR_DATA_LOAD_SETTINGS["chunk_rows"]
+        self.workers = workers or SENSOR_DATA_LOAD_SETTINGS["workers"]
+        self.max_pending_chunks = max_pending_chunks or SENSOR_DATA_LOAD_SETTINGS["max_pending_chunks"] or self.workers * 2
+        self.last_load_stats: dict = {}
+
+    def read_chunks(self, data_file: str, names: List[str]) -> Iterator[pd.DataFrame]:
+        """
+        データファイルを chunk_rows 行ずつ文字列として読み込みます（先頭行がカラム名の場合は読み飛ばします）。
+        """
+        with open(data_file, encoding="utf-8") as f:
+            has_header = f.readline().strip().split(",")[:1] == names[:1]
+        reader = pd.read_csv(
+            data_file, header=None, names=names, skiprows=1 if has_header else 0, dtype=str,
+            na_values=_NULL_VALUES, keep_default_na=False, chunksize=self.chunk_rows,
+        )
+        with reader:
+            yield from reader
+
+    @staticmethod
+    def convert(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        文字列のチャンクを列単位で型変換します。
+
+        :return: Tuple[pd.DataFrame, pd.Series], (変換後のチャンク, 除外する行の真偽値)
+        """
+        converted = {}
+        rejected = np.zeros(len(chunk), dtype=bool)
+        for name in chunk.columns:
+            kind = column_kind(name)
+            raw = chunk[name]
+            if kind == "text":
+                converted[name] = raw.str.strip()
+                continue
+            values = pd.to_numeric(raw, errors="coerce")
+            # 値があるのに数値に変換できない場合は除外する
+            rejected |= (values.isna() & raw.notna()).to_numpy()
+            if kind == "int":
+                fractional = (values.notna() & (values % 1 != 0)).to_numpy()
+                rejected |= fractional
+                converted[name] = values.mask(fractional).astype("Int32")
+            else:
+                converted[name] = values.astype(np.float64)
+        frame = pd.DataFrame(converted, index=chunk.index)
+
+        if "date" in frame.columns:
+            dates = pd.to_datetime(frame["date"], format="%Y-%m-%d", errors="coerce")
+            rejected |= dates.isna().to_numpy()
+            frame["date"] = dates.dt.strftime("%Y-%m-%d")
+        if "last_update" in frame.columns:
+            last_updates = pd.to_datetime(frame["last_update"], errors="coerce")
+            rejected |= (last_updates.isna() & frame["last_update"].notna()).to_numpy()
+        for name in _REQUIRED_COLUMNS:
+            if name in frame.columns:
+                rejected |= frame[name].isna().to_numpy()
+        return frame, pd.Series(rejected, index=chunk.index)
+
+    def insert_frame(self, frame: pd.DataFrame, table_name: Optional[str] = None) -> float:
+        """
+        変換済みのチャンクを 1 つの接続で fast_executemany により投入し、commit します。
+
+        :param frame: pd.DataFrame, convert で変換したチャンク（カラム名は取り込み先のカラム）
+        :param table_name: Optional[str], 取り込み先（省略時は TABLE_NAME_SETTINGS["sensor_data_table"]）
+        :return: float, 処理時間（秒）
+        """
+        started = time.perf_counter()
+        table_name = table_name or TABLE_NAME_SETTINGS["sensor_data_table"]
+        insert_query = (
+            f"INSERT INTO {table_name} ({', '.join(f'[{name}]' for name in frame.columns)}) "
+            f"VALUES ({', '.join(['?'] * len(frame.columns))})"
+        )
+        rows = frame.astype(object).where(frame.notna(), None).to_numpy().tolist()
+        with self.sql_client.connection_factory.create_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.fast_executemany = True
+                cursor.executemany(insert_query, rows)
+        return time.perf_counter() - started
+
+    def load(self, data_file: str, table_name: Optional[str] = None, format_file: Optional[str] = None,
+             error_file: Optional[str] = None) -> dict:
+        """
+        データファイルを取り込みテーブルに投入します。
+
+        :param data_file: str, データファイル（CSV）
+        :param table_name: Optional[str], 取り込み先（省略時は TABLE_NAME_SETTINGS["sensor_data_table"]）
+        :param format_file: Optional[str], BCP フォーマットファイル（省略時は default_load_columns の並び）
+        :param error_file: Optional[str], 除外した行を書き出すファイル（省略可能）
+        :return: dict, {"rows", "rejected", "chunks", "seconds", "rows_per_second",
+                        "chunk_seconds": {"avg", "max", "p95"}}
+        """
+        table_name = table_name or TABLE_NAME_SETTINGS["sensor_data_table"]
+        names = read_format_file(format_file) if format_file else default_load_columns()
+        stats = {"rows": 0, "rejected": 0, "chunks": [], "seconds": 0.0}
+        lock = threading.Lock()
+        started = time.perf_counter()
+
+        def insert(number: int, frame: pd.DataFrame):
+            seconds = self.insert_frame(frame, table_name)
+            with lock:
+                stats["rows"] += len(frame)
+                stats["chunks"].append({"chunk": number, "rows": len(frame), "seconds": seconds})
+            self.logger.debug(f"Loaded chunk {number}: {len(frame)} rows in {seconds:.3f}s.")
+
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for number, chunk in enumerate(self.read_chunks(data_file, names), start=1):
+                    frame, rejected = self.convert(chunk)
+                    if rejected.any():
+                        stats["rejected"] += int(rejected.sum())
+                        if error_file:
+                            chunk[rejected.to_numpy()].to_csv(error_file, mode="a", header=False, index=False)
+                        frame = frame[~rejected.to_numpy()]
+                    if frame.empty:
+                        continue
+                    # 投入待ちが上限に達した場合は、いずれかのチャンクの投入が終わるまで読み込みを止める
+                    while len(pending) >= self.max_pending_chunks:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    pending.add(executor.submit(insert, number, frame))
+                for future in pending:
+                    future.result()
+            except Exception:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        stats["seconds"] = time.perf_counter() - started
+        self.last_load_stats = stats
+        report = self.summarize(stats)
+        self.logger.info(
+            f"Loaded {report['rows']} rows into {table_name} from {os.path.basename(data_file)} in "
+            f"{report['seconds']:.2f}s ({report['rows_per_second']:.0f} rows/s, {report['rejected']} rejected, "
+            f"{report['chunks']} chunks, p95 {report['chunk_seconds']['p95']:.3f}s/chunk)."
+        )
+        return report
+
+    @staticmethod
+    def summarize(stats: dict) -> dict:
+        chunk_seconds = np.array([chunk["seconds"] for chunk in stats["chunks"]], dtype=np.float64)
+        return {
+            "rows": stats["rows"],
+            "rejected": stats["rejected"],
+            "chunks": len(chunk_seconds),
+            "seconds": stats["seconds"],
+            "rows_per_second": stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0,
+            "chunk_seconds": {
+                "avg": float(chunk_seconds.mean()) if chunk_seconds.size else 0.0,
+                "max": float(chunk_seconds.max()) if chunk_seconds.size else 0.0,
+                "p95": float(np.percentile(chunk_seconds, 95)) if chunk_seconds.size else 0.0,
+            },
+        }
@@ -0,0 +1,90 @@
+import os
+from unittest.mock import MagicMock, Mock
+
+import pytest
+
+from common.repository.sensor_data_bulk_loader import (
+    SensorDataBulkLoader, default_load_columns, parse_bcp_command, read_format_file,
+)
+
+BCP_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "utility", "generate_dummy_sensor_data", "bcp")
+
+
+def _csv_line(factory="H", tag="T1", date="2024-12-20", d0="1", value="1.5", last_update="2024-12-21 00:00:00"):
+    values = [factory, tag, date, tag, tag, f"Sensor {tag}", "unit", "1"]
+    for _ in range(30):
+        values += [d0, value, value, value]
+    return ",".join(values + [last_update])
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    header = ",".join(default_load_columns())
+    lines = [
+        header,
+        _csv_line(tag="T1"),
+        _csv_line(tag="T2", value="NULL"),
+        _csv_line(tag="T3", d0="1.5"),           # 整数に変換できない
+        _csv_line(tag="T4", date="2024-13-01"),  # 日付が不正
+        _csv_line(tag="T5"),
+    ]
+    path = tmp_path / "data.csv"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_read_format_file_matches_default_columns():
+    """リポジトリのフォーマットファイルが既定のカラムの並びと一致するかを検証"""
+    columns = read_format_file(os.path.join(BCP_DIR, "data_loader_format.fmt"))
+
+    assert columns == default_load_columns()
+
+
+def test_parse_bcp_command():
+    with open(os.path.join(BCP_DIR, "bcp_all_factories.bat"), encoding="utf-8") as f:
+        command = parse_bcp_command(f.read().strip())
+
+    assert command == {
+        "table": "batch.data_loader_data_load_temp",
+        "data_file": "bcp_all_factories_data.csv",
+        "format_file": "data_loader_format.fmt",
+        "error_file": "bcp_error.log",
+        "batch_size": 1000,
+    }
+    with pytest.raises(ValueError):
+        parse_bcp_command("bcp batch.t out data.csv")
+
+
+def test_load_inserts_chunks_and_rejects_invalid_rows(data_file, tmp_path):
+    """チャンク毎に fast_executemany で投入され、変換できない行が除外・記録されるかを検証"""
+    sql_client = MagicMock()
+    cursor = sql_client.connection_factory.create_connection.return_value.__enter__.return_value \
+        .cursor.return_value.__enter__.return_value
+    loader = SensorDataBulkLoader(sql_client, Mock(), chunk_rows=2, workers=2)
+    error_file = str(tmp_path / "error.log")
+
+    report = loader.load(data_file, "batch.data_loader_data_load_temp", error_file=error_file)
+
+    assert report["rows"] == 3
+    assert report["rejected"] == 2
+    assert report["chunks"] == 2  # 全行が除外されたチャンクは投入しない
+    assert report["rows_per_second"] > 0
+    inserted = [row for call in cursor.executemany.call_args_list for row in call.args[1]]
+    assert sorted(row[1] for row in inserted) == ["T1", "T2", "T5"]
+    query = cursor.executemany.call_args_list[0].args[0]
+    assert query.startswith("INSERT INTO batch.data_loader_data_load_temp ([factory], [tag], [date]")
+    t2 = next(row for row in inserted if row[1] == "T2")
+    assert t2[7] == 1 and t2[8] == 1 and t2[9] is None
+    assert cursor.fast_executemany is True
+    with open(error_file, encoding="utf-8") as f:
+        assert [line.split(",")[1] for line in f.read().splitlines()] == ["T3", "T4"]
+
+
+def test_load_raises_when_chunk_fails(data_file):
+    sql_client = MagicMock()
+    cursor = sql_client.connection_factory.create_connection.return_value.__enter__.return_value \
+        .cursor.return_value.__enter__.return_value
+    cursor.executemany.side_effect = RuntimeError("insert failed")
+
+    with pytest.raises(RuntimeError, match="insert failed"):
+        SensorDataBulkLoader(sql_client, Mock(), chunk_rows=2, workers=1).load(data_file)
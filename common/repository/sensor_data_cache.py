@@ -0,0 +1,265 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common.repository.sensor_cube import normalize_dates
+from common.repository.sensor_data_decoder import VALUE_COLUMNS, build_sensor_frame
+
+# (table, factory, tag, date)
+CacheKey = Tuple[str, str, str, str]
+
+# 1 行あたりの管理用オブジェクト（キー・エントリ）の大きさの見積もり
+_ENTRY_OVERHEAD_BYTES = 256
+
+
+class _CachedRow:
+    """1 タグ・1 日分の行（値カラムは float64 の配列で保持）"""
+    __slots__ = ("columns", "meta", "values", "last_update", "nbytes", "validated_at")
+
+    def __init__(self, columns: Tuple[str, ...], meta: tuple, values: np.ndarray, last_update, validated_at: float):
+        self.columns = columns
+        self.meta = meta
+        self.values = values
+        self.last_update = last_update
+        self.nbytes = values.nbytes + sum(sys.getsizeof(value) for value in meta) + _ENTRY_OVERHEAD_BYTES
+        self.validated_at = validated_at
+
+
+def _date_key(date) -> str:
+    return pd.Timestamp(date).strftime("%Y-%m-%d")
+
+
+def same_last_update(current, cached) -> bool:
+    """last_update が同じか（どちらも NULL の場合も同じとみなす）"""
+    if pd.isna(current) or pd.isna(cached):
+        return pd.isna(current) and pd.isna(cached)
+    return pd.Timestamp(current) == pd.Timestamp(cached)
+
+
+class SensorDataCache:
+    """
+    fetch_sensor_data の読み込みキャッシュ。
+
+    (table, factory, tag, date) 毎の行をバイト数上限付きの LRU で保持します。
+    - 一部のタグのみキャッシュにある場合は、無いタグだけを取得して結合します
+    - キャッシュにある行は、値カラムを含まない fetch_last_updates で last_update を確認し、
+      更新・削除されていた行のみ取得し直します（revalidate_after_seconds 以内に確認済みの行は確認しません）
+    - 保存・削除・コピーの際は SensorDataRepository から invalidate / invalidate_frame が呼ばれます
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, revalidate_after_seconds: float = 0.0, logger=None):
+        """
+        :param max_bytes: int, 保持する行の合計バイト数の上限
+        :param revalidate_after_seconds: float, 前回の確認からこの秒数が経過した行のみ last_update を確認する
+        :param logger: ロガー（省略可能）
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive integer")
+        self.max_bytes = max_bytes
+        self.revalidate_after_seconds = revalidate_after_seconds
+        self.logger = logger
+        self._entries: "OrderedDict[CacheKey, _CachedRow]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.probes = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.bytes_saved = 0
+
+    def fetch(self, repository, table_name: str, tag_factory_map: dict, date: str) -> pd.DataFrame:
+        """
+        キャッシュを経由してセンサーデータを取得します。
+
+        :param repository: AbstractSensorDataRepository, キャッシュに無い行を取得するリポジトリ
+        :param table_name: str, テーブル名
+        :param tag_factory_map: dict, タグと工場コードの辞書 {tag: factory}
+        :param date: str, 対象日
+        :return: pd.DataFrame, repository.fetch_sensor_data と同じカラムの DataFrame（行の並び順は保証しません）
+        """
+        date_key = _date_key(date)
+        now = time.monotonic()
+        with self._lock:
+            cached = {}
+            for tag, factory in tag_factory_map.items():
+                entry = self._entries.get((table_name, factory, tag, date_key))
+                if entry is not None:
+                    cached[tag] = entry
+
+        stale_tags = self._revalidate(repository, table_name, tag_factory_map, date, cached, now)
+        for tag in stale_tags:
+            del cached[tag]
+
+        missing = {tag: factory for tag, factory in tag_factory_map.items() if tag not in cached}
+        fetched = repository.fetch_sensor_data(table_name, missing, date) if missing else None
+        if fetched is not None:
+            self.put_frame(table_name, fetched)
+
+        with self._lock:
+            for tag, entry in cached.items():
+                key = (table_name, tag_factory_map[tag], tag, date_key)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            self.hits += len(cached)
+            self.misses += len(missing)
+            self.stale += len(stale_tags)
+            self.bytes_saved += sum(entry.nbytes for entry in cached.values())
+        if self.logger:
+            self.logger.debug(
+                f"Sensor data cache for {table_name} {date_key}: {len(cached)} hits, "
+                f"{len(missing)} misses ({len(stale_tags)} stale)."
+            )
+
+        frames = [frame for frame in (self._build_frame(list(cached.values())), fetched) if frame is not None]
+        if not frames:
+            return pd.DataFrame()
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    def _revalidate(self, repository, table_name: str, tag_factory_map: dict, date: str,
+                    cached: Dict[str, _CachedRow], now: float) -> List[str]:
+        """キャッシュにある行の last_update を確認し、更新・削除されていたタグを返します。"""
+        targets = {
+            tag: tag_factory_map[tag] for tag, entry in cached.items()
+            if now - entry.validated_at >= self.revalidate_after_seconds
+        }
+        if not targets:
+            return []
+        with self._lock:
+            self.probes += 1
+        updates = repository.fetch_last_updates(table_name, targets, date)
+        current = {
+            (factory, tag): last_update
+            for factory, tag, last_update in zip(updates["factory"], updates["tag"], updates["last_update"])
+        }
+
+        stale_tags = []
+        for tag, factory in targets.items():
+            entry = cached[tag]
+            if (factory, tag) in current and same_last_update(current[(factory, tag)], entry.last_update):
+                entry.validated_at = now
+            else:
+                stale_tags.append(tag)
+        if stale_tags:
+            self.invalidate(table_name, stale_tags, date)
+        return stale_tags
+
+    def put_frame(self, table_name: str, df: pd.DataFrame):
+        """
+        取得したワイド形式の DataFrame を行毎にキャッシュに追加します（値カラムを含まない場合は何もしません）。
+
+        :param table_name: str, テーブル名
+        :param df: pd.DataFrame, factory / tag / date と d0_0～d3_29 を含むデータ
+        """
+        if df.empty or any(column not in df.columns for column in VALUE_COLUMNS):
+            return
+        columns = tuple(df.columns)
+        meta_columns = [column for column in columns if column not in VALUE_COLUMNS]
+        values = df[VALUE_COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan)
+        dates = normalize_dates(df["date"]).tolist()
+        last_updates = df["last_update"].tolist() if "last_update" in df.columns else [None] * len(df)
+        now = time.monotonic()
+
+        with self._lock:
+            for i, meta in enumerate(df[meta_columns].itertuples(index=False, name=None)):
+                row = dict(zip(meta_columns, meta))
+                key = (table_name, row["factory"], row["tag"], dates[i])
+                entry = _CachedRow(columns, meta, values[i].copy(), last_updates[i], now)
+                self._remove(key)
+                self._entries[key] = entry
+                self.bytes += entry.nbytes
+            while self.bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def invalidate(self, table_name: str, tags: Optional[Sequence[str]] = None, date: Optional[str] = None,
+                   end_date: Optional[str] = None):
+        """
+        キャッシュから行を破棄します（保存・削除・コピーの後に呼び出します）。
+
+        :param table_name: str, テーブル名
+        :param tags: Optional[Sequence[str]], 対象タグ（None の場合は全タグ）
+        :param date: Optional[str], 対象日（期間指定の場合は開始日、None の場合は全日付）
+        :param end_date: Optional[str], 対象期間の終了日（当日を含む、省略時は date のみ）
+        """
+        tag_set = set(tags) if tags is not None else None
+        start_key = _date_key(date) if date is not None else None
+        end_key = _date_key(end_date) if end_date is not None else start_key
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if key[0] == table_name
+                and (tag_set is None or key[2] in tag_set)
+                and (start_key is None or start_key <= key[3] <= end_key)
+            ]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+    def invalidate_frame(self, table_name: str, df: pd.DataFrame):
+        """
+        DataFrame に含まれる (factory, tag, date) の行をキャッシュから破棄します。
+
+        :param table_name: str, テーブル名
+        :param df: pd.DataFrame, factory / tag / date を含むデータ
+        """
+        if df.empty or not {"factory", "tag", "date"}.issubset(df.columns):
+            return
+        keys = set(zip(df["factory"], df["tag"], normalize_dates(df["date"])))
+        with self._lock:
+            removed = 0
+            for factory, tag, date_key in keys:
+                removed += self._remove((table_name, factory, tag, date_key))
+            self.invalidations += removed
+
+    def clear(self):
+        """キャッシュを全て破棄します。"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        """
+        監視用のカウンタを返します。
+
+        :return: dict, {"entries", "bytes", "max_bytes", "hits", "misses", "stale", "probes", "evictions",
+                        "invalidations", "bytes_saved", "hit_ratio"}
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "probes": self.probes,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "bytes_saved": self.bytes_saved,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key: CacheKey) -> int:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return 0
+        self.bytes -= entry.nbytes
+        return 1
+
+    @staticmethod
+    def _build_frame(entries: List[_CachedRow]) -> Optional[pd.DataFrame]:
+        if not entries:
+            return None
+        columns = entries[0].columns
+        meta_columns = [column for column in columns if column not in VALUE_COLUMNS]
+        meta = {column: [entry.meta[i] for entry in entries] for i, column in enumerate(meta_columns)}
+        return build_sensor_frame(columns, meta, np.vstack([entry.values for entry in entries]))
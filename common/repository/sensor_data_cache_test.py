@@ -0,0 +1,95 @@
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock
+from common.repository.sensor_data_cache import SensorDataCache
+from common.repository.sensor_data_decoder import VALUE_COLUMNS
+
+TABLE = "sensor_data_table"
+UPDATED = pd.Timestamp("2025-01-01 01:00")
+
+
+def _frame(tags, date="2024-12-31", last_update=UPDATED):
+    rows = [["A", tag, date] + [float(k)] * 120 + [last_update] for k, tag in enumerate(tags)]
+    return pd.DataFrame(rows, columns=["factory", "tag", "date"] + VALUE_COLUMNS + ["last_update"])
+
+
+@pytest.fixture
+def repository():
+    """要求されたタグのみ返すリポジトリのモック"""
+    repository = MagicMock()
+    repository.last_update = UPDATED
+    repository.fetch_sensor_data.side_effect = lambda table, tag_map, date: _frame(list(tag_map), date)
+    repository.fetch_last_updates.side_effect = lambda table, tag_map, date: pd.DataFrame(
+        {"factory": list(tag_map.values()), "tag": list(tag_map), "date": date,
+         "last_update": repository.last_update}
+    )
+    return repository
+
+
+def test_partial_hit_fetches_only_missing_tags(repository):
+    """キャッシュにあるタグは last_update の確認のみで、無いタグだけ取得されるかを検証"""
+    cache = SensorDataCache()
+    cache.fetch(repository, TABLE, {"sensor_1": "A", "sensor_2": "A"}, "2024-12-31")
+
+    result = cache.fetch(repository, TABLE, {"sensor_1": "A", "sensor_2": "A", "sensor_3": "A"}, "2024-12-31")
+
+    assert repository.fetch_sensor_data.call_args.args[1] == {"sensor_3": "A"}
+    assert repository.fetch_last_updates.call_args.args[1] == {"sensor_1": "A", "sensor_2": "A"}
+    assert sorted(result["tag"]) == ["sensor_1", "sensor_2", "sensor_3"]
+    assert result.loc[result["tag"] == "sensor_2", "d3_29"].item() == 1.0
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 3)
+    assert stats["bytes_saved"] > 0
+
+
+def test_updated_rows_are_refetched(repository):
+    """last_update が変わった行は取得し直されるかを検証"""
+    cache = SensorDataCache()
+    cache.fetch(repository, TABLE, {"sensor_1": "A"}, "2024-12-31")
+    repository.last_update = UPDATED + pd.Timedelta(hours=1)
+
+    cache.fetch(repository, TABLE, {"sensor_1": "A"}, "2024-12-31")
+
+    assert repository.fetch_sensor_data.call_count == 2
+    assert cache.stats()["stale"] == 1
+
+
+def test_revalidate_after_seconds_skips_probe(repository):
+    cache = SensorDataCache(revalidate_after_seconds=3600)
+    cache.fetch(repository, TABLE, {"sensor_1": "A"}, "2024-12-31")
+
+    result = cache.fetch(repository, TABLE, {"sensor_1": "A"}, "2024-12-31")
+
+    repository.fetch_last_updates.assert_not_called()
+    assert repository.fetch_sensor_data.call_count == 1
+    assert result["d0_0"].dtype == "Int16"
+    assert result["last_update"].item() == UPDATED
+
+
+def test_lru_eviction_by_bytes(repository):
+    """バイト数の上限を超えると古い行から破棄されるかを検証"""
+    cache = SensorDataCache()
+    cache.put_frame(TABLE, _frame(["sensor_1"]))
+    cache.max_bytes = cache.stats()["bytes"] * 2
+
+    cache.put_frame(TABLE, _frame(["sensor_2", "sensor_3"]))
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+    cache.fetch(repository, TABLE, {"sensor_1": "A"}, "2024-12-31")
+    assert repository.fetch_sensor_data.call_args.args[1] == {"sensor_1": "A"}
+
+
+def test_repository_invalidates_on_save_and_delete(repository):
+    """SensorDataRepository の保存・削除・コピーでキャッシュが破棄されるかを検証"""
+    from common.repository.sensor_data_repository import SensorDataRepository
+    cache = SensorDataCache()
+    wrapper = SensorDataRepository(repository, MagicMock(), cache=cache)
+    wrapper.fetch_sensor_data(TABLE, {"sensor_1": "A", "sensor_2": "A", "sensor_3": "A"}, "2024-12-31")
+
+    wrapper.save_sensor_data(_frame(["sensor_1"]), TABLE)
+    wrapper.delete_sensor_data(TABLE, ["sensor_2"], "2024-12-31")
+    wrapper.copy_sensor_data("source_table", TABLE, ["sensor_3"], "2024-12-31")
+
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 3
@@ -0,0 +1,111 @@
+from itertools import chain
+from typing import Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# センサーデータテーブルの値カラムの型（generate_bcp_format_file のフォーマットと同じ）
+# d0: データ保証区分（INT、取得後は小さい整数として int16 で保持）, d1～d3: 値（FLOAT）
+ASSURANCE_COLUMNS = [f"d0_{j}" for j in range(30)]
+MEASURE_COLUMNS = [f"d{i}_{j}" for i in range(1, 4) for j in range(30)]
+VALUE_COLUMNS = ASSURANCE_COLUMNS + MEASURE_COLUMNS
+ASSURANCE_DTYPE = np.int16
+MEASURE_DTYPE = np.float64
+
+_ASSURANCE_MIN = np.iinfo(ASSURANCE_DTYPE).min
+_ASSURANCE_MAX = np.iinfo(ASSURANCE_DTYPE).max
+
+
+def _decode_value_block(rows: Sequence, start: int, stop: int) -> np.ndarray:
+    """
+    行の [start, stop) の値カラムを (行数, カラム数) の float64 配列に変換します（NULL は NaN）。
+
+    NULL を含まないバッチは np.fromiter で事前に確保した配列へ直接書き込みます。
+    NULL（None）を含む場合のみ、バッチ単位で object 配列を経由して変換します。
+    Decimal で返された値も float に変換されます。
+    """
+    width = stop - start
+    try:
+        values = np.fromiter(chain.from_iterable(row[start:stop] for row in rows), dtype=np.float64,
+                             count=len(rows) * width)
+    except TypeError:
+        values = np.array([tuple(row[start:stop]) for row in rows], dtype=object).reshape(-1)
+        values[np.equal(values, None)] = np.nan
+        values = values.astype(np.float64)
+    return values.reshape(len(rows), width)
+
+
+class SensorBatchDecoder:
+    """
+    カーソルから fetchmany で取得した行のバッチを列単位の型付き配列に変換し、DataFrame を構築します。
+
+    値カラム（d0_0～d3_29）は 1 つの float64 配列にまとめて変換し、
+    - d0 はデータ保証区分として Int16（NULL は pd.NA）
+    - d1～d3 は float64（NULL は NaN）
+    の列にします。行や値毎の Python オブジェクト（list / DataFrame のセル）は作りません。
+    値カラム以外（factory / tag / date / last_update など）は取得した値をそのまま保持します。
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        """
+        :param columns: Sequence[str], SELECT するカラムの並び
+        """
+        self.columns = list(columns)
+        positions = [i for i, column in enumerate(self.columns) if column in VALUE_COLUMNS]
+        if positions and (
+            [self.columns[i] for i in positions] != VALUE_COLUMNS or positions[-1] - positions[0] + 1 != len(positions)
+        ):
+            raise ValueError("Value columns must be selected contiguously in d0_0..d3_29 order")
+        self.value_slice = slice(positions[0], positions[-1] + 1) if positions else None
+        self.meta_positions = [i for i in range(len(self.columns)) if i not in positions]
+
+    def decode(self, batches: Iterable[Sequence]) -> pd.DataFrame:
+        """
+        :param batches: Iterable[Sequence], 行のバッチ（fetchmany / fetchall の結果）
+        :return: pd.DataFrame, columns の並びの DataFrame
+        """
+        meta_parts: List[List[list]] = [[] for _ in self.meta_positions]
+        value_parts: List[np.ndarray] = []
+        for rows in batches:
+            if not len(rows):
+                continue
+            for part, position in zip(meta_parts, self.meta_positions):
+                part.append([row[position] for row in rows])
+            if self.value_slice is not None:
+                value_parts.append(_decode_value_block(rows, self.value_slice.start, self.value_slice.stop))
+
+        meta = {
+            self.columns[position]: [value for part in parts for value in part]
+            for position, parts in zip(self.meta_positions, meta_parts)
+        }
+        if self.value_slice is None:
+            return pd.DataFrame(meta, columns=self.columns)
+        values = np.concatenate(value_parts) if value_parts else np.empty((0, len(VALUE_COLUMNS)))
+        return build_sensor_frame(self.columns, meta, values)
+
+
+def build_sensor_frame(columns: Sequence[str], meta: dict, values: np.ndarray) -> pd.DataFrame:
+    """
+    値カラム以外の列と値カラムの配列から、fetch_sensor_data と同じ型の DataFrame を構築します。
+
+    :param columns: Sequence[str], DataFrame のカラムの並び
+    :param meta: dict, 値カラム以外のカラム名 → 値のリスト
+    :param values: np.ndarray, d0_0～d3_29 の並びの (行数, 120) の float64 配列（NULL は NaN）
+    :return: pd.DataFrame, d0 は Int16、d1～d3 は float64 の DataFrame
+    """
+    frame = dict(meta)
+    frame.update(_assurance_columns(values[:, :len(ASSURANCE_COLUMNS)]))
+    measures = pd.DataFrame(values[:, len(ASSURANCE_COLUMNS):], columns=MEASURE_COLUMNS, copy=False)
+    return pd.concat([pd.DataFrame(frame), measures], axis=1)[list(columns)]
+
+
+def _assurance_columns(block: np.ndarray) -> dict:
+    mask = np.isnan(block)
+    codes = np.where(mask, 0, block)
+    if codes.size and (codes.min() < _ASSURANCE_MIN or codes.max() > _ASSURANCE_MAX):
+        raise ValueError("Assurance code is out of range for int16")
+    codes = codes.astype(ASSURANCE_DTYPE)
+    return {
+        column: pd.arrays.IntegerArray(codes[:, j].copy(), mask[:, j].copy())
+        for j, column in enumerate(ASSURANCE_COLUMNS)
+    }
@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+from common.repository.sensor_data_decoder import SensorBatchDecoder, VALUE_COLUMNS
+
+COLUMNS = ["factory", "tag", "date"] + VALUE_COLUMNS + ["last_update"]
+
+
+def _row(tag, assurance=1, value=1.5):
+    return ("A", tag, "2024-12-31") + (assurance,) * 30 + (value,) * 90 + (None,)
+
+
+def test_decode_typed_columns():
+    """d0 が Int16、d1～d3 が float64 に変換され、バッチが連結されるかを検証"""
+    batches = [[_row("sensor_1"), _row("sensor_2", value=Decimal("2.25"))], [_row("sensor_3", assurance=3)]]
+
+    df = SensorBatchDecoder(COLUMNS).decode(iter(batches))
+
+    assert df.columns.tolist() == COLUMNS
+    assert df["tag"].tolist() == ["sensor_1", "sensor_2", "sensor_3"]
+    assert df["d0_0"].dtype == "Int16"
+    assert df["d3_29"].dtype == np.float64
+    assert df["d0_5"].tolist() == [1, 1, 3]
+    assert df["d2_0"].tolist() == [1.5, 2.25, 1.5]
+
+
+def test_decode_nulls():
+    """NULL が d0 では pd.NA、d1～d3 では NaN になるかを検証"""
+    row = list(_row("sensor_1"))
+    row[3] = None                       # d0_0
+    row[3 + 30] = None                  # d1_0
+
+    df = SensorBatchDecoder(COLUMNS).decode([[tuple(row), _row("sensor_2")]])
+
+    assert df["d0_0"].isna().tolist() == [True, False]
+    assert np.isnan(df.loc[0, "d1_0"])
+    assert df.loc[1, "d1_0"] == 1.5
+
+
+def test_decode_empty_and_meta_only():
+    """結果が 0 行の場合と値カラムを含まない場合を検証"""
+    empty = SensorBatchDecoder(COLUMNS).decode([])
+    assert empty.empty and empty.columns.tolist() == COLUMNS
+
+    meta = SensorBatchDecoder(["factory", "tag"]).decode([[("A", "sensor_1")]])
+    pd.testing.assert_frame_equal(meta, pd.DataFrame({"factory": ["A"], "tag": ["sensor_1"]}))
+
+
+def test_decode_rejects_out_of_range_assurance():
+    with pytest.raises(ValueError, match="out of range"):
+        SensorBatchDecoder(COLUMNS).decode([[_row("sensor_1", assurance=99999)]])
@@ -1,9 +1,14 @@
 from dataclasses import dataclass
-from typing import List
+from typing import Iterator, List, Optional
+import numpy as np
 import pandas as pd
 from abc import ABC, abstractmethod
 
 from common.SQLServer.client import SQLClient
+from common.repository.sensor_cube import CHANNELS, HOURS, VALUE_COLUMNS
+from common.repository.sensor_data_cache import SensorDataCache
+from common.repository.sensor_data_decoder import SensorBatchDecoder
+from common.settings import SENSOR_DATA_FETCH_SETTINGS, SENSOR_DATA_SAVE_SETTINGS
 
 
 # DTO定義: 正規化された形式を反映
@@ -13,6 +18,113 @@ class SensorDataDTO:
     tag: str           # タグ名 (例: tag1, tag2)
     timestamp: str     # タイムスタンプ (YYYY-MM-DD HH:MM:SS)
     value: float       # 値 (データ1, データ2, データ3などに対応)
+    channel: Optional[str] = None  # 値の種類 (d0: データ保証区分, d1～d3: 値)
+
+
+LONG_FORMAT_COLUMNS = ["factory", "tag", "timestamp", "channel", "value"]
+_HOUR_LABELS = np.array([f" {hour:02d}:00:00" for hour in range(HOURS)], dtype=object)
+
+
+def to_long_format(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    ワイド形式 (d{i}_{j}) のセンサーデータを 1 値 1 行の縦持ち形式に変換します。
+
+    120 個の値カラムを 1 回の reshape で (行, 時間, チャネル) に並べ替えて平坦化するため、
+    行・値毎の Python ループはありません。行の並びは 元の行 → 時間 → チャネル の順です。
+
+    :param df: pd.DataFrame, factory / tag / date と d0_0～d3_29 を含むデータ
+    :return: pd.DataFrame, factory / tag / timestamp（'YYYY-MM-DD HH:00:00'、24時以降は 24～29時）/ channel / value
+    """
+    values_per_row = HOURS * len(CHANNELS)
+    values = (
+        df[VALUE_COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan)
+        .reshape(len(df), len(CHANNELS), HOURS)
+        .transpose(0, 2, 1)
+        .reshape(-1)
+    )
+    hour_labels = np.repeat(_HOUR_LABELS, len(CHANNELS))
+    return pd.DataFrame({
+        "factory": np.repeat(df["factory"].to_numpy(), values_per_row),
+        "tag": np.repeat(df["tag"].to_numpy(), values_per_row),
+        "timestamp": np.repeat(df["date"].astype(str).to_numpy(dtype=object), values_per_row)
+                     + np.tile(hour_labels, len(df)),
+        "channel": np.tile(np.array(CHANNELS, dtype=object), len(df) * HOURS),
+        "value": values,
+    }, columns=LONG_FORMAT_COLUMNS)
+
+
+def from_long_format(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    縦持ち形式（to_long_format の形式）のセンサーデータをワイド形式 (d{i}_{j}) に変換します。
+
+    timestamp の 'YYYY-MM-DD' を date、時（0～29）を時間として、(factory, tag, date) 毎に 1 行にまとめます。
+    値は 1 回の代入で (行, 120) の配列に書き込むため、行・値毎の Python ループはありません。
+    同じ値が複数ある場合は後の行の値になります。無い値は NaN です。
+
+    :param df: pd.DataFrame, factory / tag / timestamp / channel（d0～d3）/ value
+    :return: pd.DataFrame, factory / tag / date と d0_0～d3_29（float64）
+    """
+    timestamps = df["timestamp"].astype(str)
+    dates = timestamps.str.slice(0, 10)
+    hours = pd.to_numeric(timestamps.str.slice(11, 13), errors="coerce")
+    channels = pd.Categorical(df["channel"], categories=CHANNELS).codes
+    if len(df) and (hours.isna().any() or not hours.between(0, HOURS - 1).all() or (channels < 0).any()):
+        raise ValueError("Long format rows must have hours 0-29 and channels d0-d3")
+
+    keys = pd.DataFrame({"factory": df["factory"].to_numpy(), "tag": df["tag"].to_numpy(), "date": dates.to_numpy()})
+    row_ids = keys.groupby(["factory", "tag", "date"], sort=False).ngroup().to_numpy()
+    first = np.unique(row_ids, return_index=True)[1]
+    values = np.full((len(first), len(VALUE_COLUMNS)), np.nan)
+    values[row_ids, channels * HOURS + hours.to_numpy(dtype=np.int64)] = pd.to_numeric(df["value"]).to_numpy(
+        dtype=np.float64, na_value=np.nan
+    )
+    wide = keys.iloc[first].reset_index(drop=True)
+    return pd.concat([wide, pd.DataFrame(values, columns=VALUE_COLUMNS)], axis=1)
+
+
+class SensorDataDTOView:
+    """
+    縦持ち形式の配列を参照する SensorDataDTO のシーケンス。
+
+    SensorDataDTO は要素を参照（インデックス・イテレーション）した時点で 1 件ずつ作成し、保持しません。
+    len / インデックス / スライス / イテレーションに対応します（スライスは SensorDataDTO のリスト）。
+    """
+    __slots__ = ("factories", "tags", "timestamps", "channels", "values")
+
+    def __init__(self, long_df: pd.DataFrame):
+        """
+        :param long_df: pd.DataFrame, to_long_format の結果
+        """
+        self.factories = long_df["factory"].to_numpy()
+        self.tags = long_df["tag"].to_numpy()
+        self.timestamps = long_df["timestamp"].to_numpy()
+        self.channels = long_df["channel"].to_numpy()
+        self.values = long_df["value"].to_numpy()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _dto(self, i: int) -> SensorDataDTO:
+        return SensorDataDTO(
+            factory=self.factories[i],
+            tag=self.tags[i],
+            timestamp=self.timestamps[i],
+            value=float(self.values[i]),
+            channel=self.channels[i],
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._dto(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("SensorDataDTOView index out of range")
+        return self._dto(index)
+
+    def __iter__(self) -> Iterator[SensorDataDTO]:
+        for i in range(len(self)):
+            yield self._dto(i)
 
 
 class AbstractSensorDataRepository(ABC):
@@ -27,39 +139,205 @@ class AbstractSensorDataRepository(ABC):
 
 # 本番環境用のリポジトリ
 class ProductionSensorDataRepository(AbstractSensorDataRepository):
-    def __init__(self, sql_client: SQLClient, logger):
+    def __init__(self, sql_client: SQLClient, logger, save_mode: Optional[str] = None, chunk_size: Optional[int] = None,
+                 param_chunk_size: Optional[int] = None, key_table_threshold: Optional[int] = -1):
+        """
+        :param sql_client: SQLClient, SQL Server クライアント
+        :param logger: ロガー
+        :param save_mode: Optional[str], 保存方式（"bulk": 一時テーブル経由の一括保存、"row": 1 行ずつ保存）。省略時は設定値
+        :param chunk_size: Optional[int], 一括保存で 1 回の executemany に渡す行数。省略時は設定値
+        :param param_chunk_size: Optional[int], 取得時に 1 回のクエリでパラメータとして渡す (tag, factory) の数。省略時は設定値
+        :param key_table_threshold: Optional[int], 一時テーブルで取得する (tag, factory) の数の閾値（None の場合は使わない）。省略時は設定値
+        """
         self.sql_client = sql_client
         self.logger = logger
+        self.save_mode = save_mode or SENSOR_DATA_SAVE_SETTINGS["mode"]
+        self.chunk_size = chunk_size or SENSOR_DATA_SAVE_SETTINGS["chunk_size"]
+        if self.save_mode not in ("bulk", "row"):
+            raise ValueError(f"Unknown save mode: {self.save_mode}")
+        if self.chunk_size <= 0:
+            raise ValueError("chunk_size must be a positive integer")
+        self.param_chunk_size = param_chunk_size or SENSOR_DATA_FETCH_SETTINGS["param_chunk_size"]
+        if not 0 < self.param_chunk_size <= self.MAX_PARAM_CHUNK_SIZE:
+            raise ValueError(f"param_chunk_size must be between 1 and {self.MAX_PARAM_CHUNK_SIZE}")
+        self.key_table_threshold = (
+            SENSOR_DATA_FETCH_SETTINGS["key_table_threshold"] if key_table_threshold == -1 else key_table_threshold
+        )
+        self.fetch_batch_rows = SENSOR_DATA_FETCH_SETTINGS["fetch_batch_rows"]
+        self.stream_batch_rows = max(
+            1, SENSOR_DATA_FETCH_SETTINGS["stream_memory_budget_mb"] * 1024 * 1024 // self.ESTIMATED_ROW_BYTES
+        )
+        self.last_save_stats: Optional[dict] = None
 
 
-    def fetch_sensor_data(self, table_name: str, tag_factory_map: dict, date: str) -> pd.DataFrame:
-        conditions = " OR ".join(
-            [f"(tag = ? AND factory = ?)" for _ in tag_factory_map]
+    FETCH_COLUMNS = ["factory", "tag", "date", "local_tag", "local_id", "name", "unit", "data_division"] + \
+                    [f"d{i}_{j}" for i in range(4) for j in range(30)] + ["last_update"]
+
+    LAST_UPDATE_COLUMNS = ["factory", "tag", "date", "last_update"]
+    # 1 クエリのパラメータ数上限 2,100 から日付条件の分を除いた (tag, factory) の数
+    MAX_PARAM_CHUNK_SIZE = 1040
+
+    KEY_TABLE = "#fetch_keys"
+    # iter_sensor_data の 1 行あたりのメモリ使用量の見積もり（pyodbc の Row と変換後の配列）
+    ESTIMATED_ROW_BYTES = 5 * 1024
+
+    def _fetch_by_tags(self, table_name: str, tag_factory_map: dict, date_condition: str, date_params: list,
+                       columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        タグ・工場の組み合わせと日付条件でセンサーデータを取得する共通処理。
+        columns を省略した場合は FETCH_COLUMNS（全カラム）を取得します。
+
+        SQL Server のパラメータ数上限（2,100）を超えないよう、組み合わせの数に応じて取得方法を切り替えます。
+        - key_table_threshold 以下: param_chunk_size 件ずつのパラメータで取得して結合（_fetch_with_parameters）
+        - key_table_threshold 超: 一時テーブルに組み合わせを投入して 1 回の結合で取得（_fetch_with_key_table）
+        取得した行は fetchmany のバッチ毎に SensorBatchDecoder で型付きの配列に変換します
+        （d0: Int16, d1～d3: float64）。
+        """
+        columns = columns or self.FETCH_COLUMNS
+        try:
+            batches = self._iter_row_batches(table_name, list(tag_factory_map.items()), date_condition, date_params,
+                                             columns, self.fetch_batch_rows)
+            return SensorBatchDecoder(columns).decode(batches)
+        except Exception as e:
+            raise RuntimeError(f"Error fetching sensor data: {e}")
+
+    def _iter_row_batches(self, table_name: str, keys: List[tuple], date_condition: str, date_params: list,
+                          columns: List[str], batch_rows: int) -> Iterator[list]:
+        """
+        (tag, factory) の数に応じた取得方法（_fetch_by_tags を参照）で、fetchmany の行のバッチを返します。
+        """
+        if self.key_table_threshold is not None and len(keys) > self.key_table_threshold:
+            return self._fetch_with_key_table(table_name, keys, date_condition, date_params, columns, batch_rows)
+        return (
+            batch
+            for chunk_start in range(0, len(keys), self.param_chunk_size)
+            for batch in self._fetch_with_parameters(
+                table_name, keys[chunk_start:chunk_start + self.param_chunk_size],
+                date_condition, date_params, columns, batch_rows
+            )
         )
+
+    def _fetch_with_parameters(self, table_name: str, keys: List[tuple], date_condition: str, date_params: list,
+                               columns: List[str], batch_rows: int) -> Iterator[list]:
+        """
+        (tag, factory) の組み合わせを VALUES のパラメータで渡して取得し、batch_rows 行ずつ返します。
+
+        組み合わせの数を 2 のべき乗（上限 param_chunk_size）に切り上げて最後の組み合わせで埋めることで、
+        クエリの形を数種類に抑えて実行計画を再利用できるようにします（重複は EXISTS で無視されます）。
+        """
+        bucket_size = min(1 << (len(keys) - 1).bit_length(), self.param_chunk_size)
+        padded_keys = keys + [keys[-1]] * (bucket_size - len(keys))
+        sql_query = f"""
+        SELECT 
+            {', '.join(f't.[{column}]' for column in columns)}
+        FROM {table_name} AS t
+        WHERE EXISTS (
+            SELECT 1 FROM (VALUES {', '.join(['(?, ?)'] * bucket_size)}) AS k(tag, factory)
+            WHERE k.tag = t.[tag] AND k.factory = t.[factory]
+        ) AND {date_condition}
+        """
+        params = [item for pair in padded_keys for item in pair] + date_params
+        return self.sql_client.iter_query(sql_query, params, batch_rows)
+
+    def _fetch_with_key_table(self, table_name: str, keys: List[tuple], date_condition: str, date_params: list,
+                              columns: List[str], batch_rows: int) -> Iterator[list]:
+        """
+        (tag, factory) の組み合わせを一時テーブルに fast_executemany で投入し、1 回の結合で取得して
+        batch_rows 行ずつ返します。
+        一時テーブルは取得と同じ接続で作成する必要があるため、SQLClient.iter_query の setup / teardown で作成・削除します
+        （計測フックや遅いクエリのログの対象になります）。
+        """
+        def create_key_table(cursor):
+            # tag / factory と同じ型の一時テーブル（接続毎に作成される）
+            cursor.execute(f"SELECT TOP 0 [tag], [factory] INTO {self.KEY_TABLE} FROM {table_name}")
+            cursor.fast_executemany = True
+            cursor.executemany(f"INSERT INTO {self.KEY_TABLE} ([tag], [factory]) VALUES (?, ?)", keys)
+
+        def drop_key_table(cursor):
+            cursor.execute(f"DROP TABLE {self.KEY_TABLE}")
+
         sql_query = f"""
         SELECT 
-            [factory], [tag], [date],
-            [local_tag], [local_id], [name], [unit], [data_division],
-            {', '.join([f'[d{i}_{j}]' for i in range(4) for j in range(30)])},
-            [last_update]
-        FROM {table_name}
-        WHERE ({conditions}) AND [date] = ?
+            {', '.join(f't.[{column}]' for column in columns)}
+        FROM {table_name} AS t
+        INNER JOIN {self.KEY_TABLE} AS k ON k.[tag] = t.[tag] AND k.[factory] = t.[factory]
+        WHERE {date_condition}
         """
-        params = [item for pair in tag_factory_map.items() for item in pair] + [date]
+        return self.sql_client.iter_query(sql_query, date_params, batch_rows,
+                                          setup=create_key_table, teardown=drop_key_table)
+
+    def fetch_sensor_data(self, table_name: str, tag_factory_map: dict, date: str) -> pd.DataFrame:
+        return self._fetch_by_tags(table_name, tag_factory_map, "[date] = ?", [date])
 
+    def fetch_sensor_data_range(self, table_name: str, tag_factory_map: dict, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        指定期間（開始日・終了日を含む）のセンサーデータを 1 回のクエリで取得します。
+        """
+        return self._fetch_by_tags(table_name, tag_factory_map, "[date] BETWEEN ? AND ?", [start_date, end_date])
+
+    def fetch_last_updates(self, table_name: str, tag_factory_map: dict, date: str) -> pd.DataFrame:
+        """
+        値カラムを除き、行の最終更新日時のみを取得します（差分計算の判定用）。
+
+        :return: pd.DataFrame, factory / tag / date / last_update
+        """
+        return self._fetch_by_tags(table_name, tag_factory_map, "[date] = ?", [date], columns=self.LAST_UPDATE_COLUMNS)
+
+    def fetch_last_updates_range(self, table_name: str, tag_factory_map: dict, start_date: str,
+                                 end_date: str) -> pd.DataFrame:
+        """
+        指定期間（開始日・終了日を含む）の行の最終更新日時のみを 1 回のクエリで取得します。
+
+        :return: pd.DataFrame, factory / tag / date / last_update
+        """
+        return self._fetch_by_tags(table_name, tag_factory_map, "[date] BETWEEN ? AND ?", [start_date, end_date],
+                                   columns=self.LAST_UPDATE_COLUMNS)
+
+    def iter_sensor_data(self, table_name: str, tag_factory_map: dict, start_date: str, end_date: Optional[str] = None,
+                         batch_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        指定期間のセンサーデータを batch_rows 行ずつの DataFrame で返すジェネレータ。
+
+        サーバーの結果セットを fetchmany で読み進めるため、保持するのは処理中の 1 バッチ分のみです。
+        最後のバッチ以外は batch_rows 行ちょうどになります（行の並び順は保証しません）。
+        接続はジェネレータを最後まで読むか閉じるまで保持されます。
+
+        :param table_name: str, テーブル名
+        :param tag_factory_map: dict, タグと工場コードの辞書 {tag: factory}
+        :param start_date: str, 開始日（当日を含む）
+        :param end_date: Optional[str], 終了日（当日を含む、省略時は開始日のみ）
+        :param batch_rows: Optional[int], 1 バッチの行数（省略時は stream_batch_rows）
+        :return: Iterator[pd.DataFrame], fetch_sensor_data と同じカラムの DataFrame
+        """
+        batch_rows = batch_rows or self.stream_batch_rows
+        decoder = SensorBatchDecoder(self.FETCH_COLUMNS)
+        batches = self._iter_row_batches(table_name, list(tag_factory_map.items()), "[date] BETWEEN ? AND ?",
+                                         [start_date, end_date or start_date], self.FETCH_COLUMNS, batch_rows)
+        buffer = []
         try:
-            sql_response = self.sql_client.execute_query(sql_query, params)
-            sql_response = [list(row) for row in sql_response]
-            columns = ["factory", "tag", "date", "local_tag", "local_id", "name", "unit", "data_division"] + \
-                    [f"d{i}_{j}" for i in range(4) for j in range(30)] + ["last_update"]
-            return pd.DataFrame(sql_response, columns=columns)
+            # パラメータのチャンク毎に端数のバッチが出るため、batch_rows 行ずつに詰め直す
+            for rows in batches:
+                buffer.extend(rows)
+                while len(buffer) >= batch_rows:
+                    yield decoder.decode([buffer[:batch_rows]])
+                    del buffer[:batch_rows]
+            if buffer:
+                yield decoder.decode([buffer])
         except Exception as e:
-            raise RuntimeError(f"Error fetching sensor data: {e}")
+            raise RuntimeError(f"Error streaming sensor data: {e}")
+        finally:
+            batches.close()
+
+    SAVE_KEY_COLUMNS = ["factory", "tag", "date"]
+    STAGE_TABLE = "#sensor_data_stage"
 
     def save_sensor_data(self, df: pd.DataFrame, table_name: str) -> bool:
         """
         Save sensor data to the specified table in the database using DELETE + INSERT 
         to avoid updating primary key columns directly.
+
+        save_mode が "bulk" の場合は一時テーブル経由の一括保存（_save_bulk）、
+        "row" の場合は 1 行ずつの DELETE + INSERT（_save_row_by_row）で保存します。
         """
         try:
             if not {"factory", "tag", "date", "d0_0"}.issubset(df.columns):
@@ -67,41 +345,16 @@ class ProductionSensorDataRepository(AbstractSensorDataRepository):
                 return False
 
             import datetime
-            df['last_update'] = datetime.datetime.now()
+            # 計算結果は入力の最終更新日時で last_update を指定する（差分計算の比較用）。指定の無い行は保存日時
+            if "last_update" in df.columns:
+                df['last_update'] = df['last_update'].astype(object).where(df['last_update'].notna(), datetime.datetime.now())
+            else:
+                df['last_update'] = datetime.datetime.now()
             columns = df.columns.tolist()
 
-            # DELETE用のクエリ
-            delete_query = f"""
-            DELETE FROM {table_name}
-            WHERE factory = ? AND tag = ? AND date = ?
-            """
-
-            # INSERT用のクエリ
-            insert_query = f"""
-            INSERT INTO {table_name} ({', '.join(columns)})
-            VALUES ({', '.join(['?'] * len(columns))})
-            """
-
-            with self.sql_client.connection_factory.create_connection() as connection:
-                try:
-                    with connection.cursor() as cursor:
-                        for _, row in df.iterrows():
-                            delete_params = [row['factory'], row['tag'], row['date']]
-                            cursor.execute(delete_query, delete_params)
-
-                            insert_params = [row[col] for col in columns]
-                            cursor.execute(insert_query, insert_params)
-
-                        connection.commit()
-                except Exception as e:
-                    connection.rollback()
-                    self.logger.error(f"SQL execution error during save operation: {e}")
-                    import traceback
-                    self.logger.error(traceback.format_exc())
-                    return False
-
-            self.logger.info(f"Data successfully saved to {table_name}.")
-            return True
+            if self.save_mode == "bulk":
+                return self._save_bulk(df, table_name, columns)
+            return self._save_row_by_row(df, table_name, columns)
 
         except Exception as e:
             self.logger.error(f"Unexpected error during save operation: {e}")
@@ -109,58 +362,191 @@ class ProductionSensorDataRepository(AbstractSensorDataRepository):
             self.logger.error(traceback.format_exc())
             return False
 
-
-    def copy_sensor_data(self, source_table: str, target_table: str, tags: List[str], date: str) -> bool:
+    def _save_row_by_row(self, df: pd.DataFrame, table_name: str, columns: List[str]) -> bool:
         """
-        指定したタグと日付のデータを、ソーステーブルからターゲットテーブルにコピーします。
-        
-        Args:
-            source_table (str): データを取得する元テーブル名
-            target_table (str): データを保存する先テーブル名
-            tags (List[str]): コピー対象のタグのリスト
-            date (str): コピー対象の日付（フォーマット例: 'YYYY-MM-DD'）
-        
-        Returns:
-            bool: コピー成功時はTrue、それ以外はFalse
+        1 行ずつ DELETE + INSERT で保存します（save_mode="row"）。
         """
-        try:
-            # ソーステーブルからデータを取得
-            self.logger.error(f"Fetching data from table {source_table} for date {date} and tags {tags}...")
-            sql_query = f"""
-            SELECT 
-                [factory], [tag], [date],
-                [local_tag], [local_id], [name], [unit], [data_division],
-                {', '.join([f'[d{i}_{j}]' for i in range(4) for j in range(30)])}
-            FROM {source_table}
-            WHERE [tag] IN ({', '.join(['?' for _ in tags])})
-            AND [date] = ?
-            """
-            params = tags + [date]
-            sql_response = self.sql_client.execute_query(sql_query, params)
-            
-            if not sql_response:
-                self.logger.error("No data found for the given tags and date.")
+        # DELETE用のクエリ
+        delete_query = f"""
+        DELETE FROM {table_name}
+        WHERE factory = ? AND tag = ? AND date = ?
+        """
+
+        # INSERT用のクエリ
+        insert_query = f"""
+        INSERT INTO {table_name} ({', '.join(columns)})
+        VALUES ({', '.join(['?'] * len(columns))})
+        """
+
+        with self.sql_client.connection_factory.create_connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    for _, row in df.iterrows():
+                        delete_params = [row['factory'], row['tag'], row['date']]
+                        cursor.execute(delete_query, delete_params)
+
+                        insert_params = [row[col] for col in columns]
+                        cursor.execute(insert_query, insert_params)
+
+                    connection.commit()
+            except Exception as e:
+                connection.rollback()
+                self.logger.error(f"SQL execution error during save operation: {e}")
+                import traceback
+                self.logger.error(traceback.format_exc())
                 return False
 
-            # レスポンスをデータフレームに変換
-            columns = ["factory", "tag", "date", "local_tag", "local_id", "name", "unit", "data_division"] + \
-                      [f"d{i}_{j}" for i in range(4) for j in range(30)]
-            df = pd.DataFrame([list(row) for row in sql_response], columns=columns)
+        self.logger.info(f"Data successfully saved to {table_name}.")
+        return True
 
-            # ターゲットテーブルにデータを保存
-            self.logger.error(f"Saving data to table {target_table}...")
-            save_result = self.save_sensor_data(df, target_table)
+    @staticmethod
+    def _to_parameter_rows(df: pd.DataFrame) -> List[list]:
+        """
+        DataFrame を executemany 用のパラメータ（Python の値、欠損値は None）に変換します。
+        """
+        return df.astype(object).where(df.notna(), None).to_numpy().tolist()
 
-            if save_result:
-                self.logger.error("Data copy operation completed successfully.")
-                return True
-            else:
-                self.logger.error("Data copy operation failed during save.")
+    def _save_bulk(self, df: pd.DataFrame, table_name: str, columns: List[str]) -> bool:
+        """
+        一時テーブル経由で一括保存します（save_mode="bulk"）。
+
+        1. 保存先と同じ構成の一時テーブルに fast_executemany で chunk_size 行ずつ投入
+        2. (factory, tag, date) で結合した 1 回の DELETE と 1 回の INSERT ... SELECT で保存先に反映
+        をまとめて 1 トランザクションで実行します。
+        同じキーの行が複数ある場合は、1 行ずつの保存と同様に最後の行を保存します。
+        チャンク毎の行数・処理時間は last_save_stats に記録します。
+        """
+        import time
+
+        df = df.drop_duplicates(self.SAVE_KEY_COLUMNS, keep="last")
+        column_list = ", ".join(f"[{column}]" for column in columns)
+        key_condition = " AND ".join(f"t.[{column}] = s.[{column}]" for column in self.SAVE_KEY_COLUMNS)
+        stats = {"mode": "bulk", "rows": len(df), "chunks": [], "apply_seconds": 0.0, "total_seconds": 0.0}
+        started = time.perf_counter()
+
+        with self.sql_client.connection_factory.create_connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    # 保存先と同じ列定義の空の一時テーブル（接続毎に作成される）
+                    cursor.execute(f"SELECT TOP 0 {column_list} INTO {self.STAGE_TABLE} FROM {table_name}")
+
+                    cursor.fast_executemany = True
+                    stage_insert = (
+                        f"INSERT INTO {self.STAGE_TABLE} ({column_list}) VALUES ({', '.join(['?'] * len(columns))})"
+                    )
+                    for chunk_start in range(0, len(df), self.chunk_size):
+                        chunk = df.iloc[chunk_start:chunk_start + self.chunk_size]
+                        chunk_started = time.perf_counter()
+                        cursor.executemany(stage_insert, self._to_parameter_rows(chunk))
+                        seconds = time.perf_counter() - chunk_started
+                        stats["chunks"].append({"rows": len(chunk), "seconds": seconds})
+                        self.logger.debug(f"Staged chunk {len(stats['chunks'])}: {len(chunk)} rows in {seconds:.3f}s.")
+
+                    apply_started = time.perf_counter()
+                    cursor.execute(
+                        f"DELETE t FROM {table_name} AS t INNER JOIN {self.STAGE_TABLE} AS s ON {key_condition}"
+                    )
+                    cursor.execute(
+                        f"INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM {self.STAGE_TABLE}"
+                    )
+                    cursor.execute(f"DROP TABLE {self.STAGE_TABLE}")
+                    stats["apply_seconds"] = time.perf_counter() - apply_started
+
+                    connection.commit()
+            except Exception as e:
+                connection.rollback()
+                self.logger.error(f"SQL execution error during bulk save operation: {e}")
+                import traceback
+                self.logger.error(traceback.format_exc())
                 return False
 
-        except Exception as e:
-            self.logger.error(f"Error during copy_sensor_data operation: {e}")
-            return False
+        stats["total_seconds"] = time.perf_counter() - started
+        self.last_save_stats = stats
+        self.logger.info(
+            f"Data successfully saved to {table_name}: {stats['rows']} rows in {len(stats['chunks'])} chunks, "
+            f"staging {sum(c['seconds'] for c in stats['chunks']):.3f}s, apply {stats['apply_seconds']:.3f}s, "
+            f"total {stats['total_seconds']:.3f}s."
+        )
+        return True
+
+
+    COPY_TAG_TABLE = "#copy_tags"
+
+    def copy_sensor_data(self, source_table: str, target_table: str, tags: Optional[List[str]], date: str,
+                         end_date: Optional[str] = None, factories: Optional[List[str]] = None) -> int:
+        """
+        指定したタグ・工場・期間のデータを、ソーステーブルからターゲットテーブルにコピーします。
+
+        データは Python を経由せず、1 トランザクション内の
+        1. ターゲットの同じ (factory, tag, date) の行の DELETE
+        2. ソースからの INSERT ... SELECT（last_update はコピーした日時）
+        でサーバー側でコピーします。タグが param_chunk_size を超える場合は一時テーブルで絞り込みます。
+
+        Args:
+            source_table (str): データを取得する元テーブル名
+            target_table (str): データを保存する先テーブル名
+            tags (Optional[List[str]]): コピー対象のタグのリスト（None の場合は全タグ）
+            date (str): コピー対象の日付（期間指定の場合は開始日、フォーマット例: 'YYYY-MM-DD'）
+            end_date (Optional[str]): コピー対象の終了日（当日を含む、省略時は date のみ）
+            factories (Optional[List[str]]): コピー対象の工場コードのリスト（None の場合は全工場）
+
+        Returns:
+            int: コピーした行数（失敗した場合は 0）
+        """
+        if tags is not None and not tags:
+            self.logger.warning("No tags specified for copy operation.")
+            return 0
+
+        conditions = ["s.[date] BETWEEN ? AND ?"]
+        params = [date, end_date or date]
+        use_tag_table = tags is not None and len(tags) > self.param_chunk_size
+        if use_tag_table:
+            conditions.append(f"s.[tag] IN (SELECT [tag] FROM {self.COPY_TAG_TABLE})")
+        elif tags is not None:
+            conditions.append(f"s.[tag] IN ({', '.join(['?'] * len(tags))})")
+            params += list(tags)
+        if factories:
+            conditions.append(f"s.[factory] IN ({', '.join(['?'] * len(factories))})")
+            params += list(factories)
+        where = " AND ".join(conditions)
+
+        copy_columns = [column for column in self.FETCH_COLUMNS if column != "last_update"]
+        column_list = ", ".join(f"[{column}]" for column in copy_columns)
+        key_condition = " AND ".join(f"t.[{column}] = s.[{column}]" for column in self.SAVE_KEY_COLUMNS)
+
+        with self.sql_client.connection_factory.create_connection() as connection:
+            try:
+                with connection.cursor() as cursor:
+                    if use_tag_table:
+                        cursor.execute(f"SELECT TOP 0 [tag] INTO {self.COPY_TAG_TABLE} FROM {source_table}")
+                        cursor.fast_executemany = True
+                        cursor.executemany(f"INSERT INTO {self.COPY_TAG_TABLE} ([tag]) VALUES (?)",
+                                           [[tag] for tag in dict.fromkeys(tags)])
+                    cursor.execute(
+                        f"DELETE t FROM {target_table} AS t INNER JOIN {source_table} AS s ON {key_condition} "
+                        f"WHERE {where}",
+                        params,
+                    )
+                    cursor.execute(
+                        f"INSERT INTO {target_table} ({column_list}, [last_update]) "
+                        f"SELECT {', '.join(f's.[{column}]' for column in copy_columns)}, SYSDATETIME() "
+                        f"FROM {source_table} AS s WHERE {where}",
+                        params,
+                    )
+                    copied_rows = cursor.rowcount
+                    if use_tag_table:
+                        cursor.execute(f"DROP TABLE {self.COPY_TAG_TABLE}")
+                    connection.commit()
+            except Exception as e:
+                connection.rollback()
+                self.logger.error(f"Error during copy_sensor_data operation: {e}")
+                return 0
+
+        if copied_rows == 0:
+            self.logger.warning(f"No data found in {source_table} for the given tags and dates.")
+        else:
+            self.logger.info(f"Copied {copied_rows} rows from {source_table} to {target_table}.")
+        return copied_rows
 
     def delete_sensor_data(self, table_name: str, tags: List[str], date: str) -> bool:
         """
@@ -215,6 +601,36 @@ class TestSensorDataRepository(AbstractSensorDataRepository):
         self.logger.error(sensor_df)
         return sensor_df
         
+    def fetch_sensor_data_range(self, table_name: str, tags: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        期間内の各日付についてモックデータを生成。
+        """
+        frames = [
+            self.fetch_sensor_data(table_name, tags, date.strftime("%Y-%m-%d"))
+            for date in pd.date_range(start_date, end_date)
+        ]
+        return pd.concat(frames, ignore_index=True) if frames else self.fetch_sensor_data(table_name, [], start_date)
+
+    def iter_sensor_data(self, table_name: str, tags: List[str], start_date: str, end_date: Optional[str] = None,
+                         batch_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        期間内のモックデータを batch_rows 行ずつ返す。
+        """
+        df = self.fetch_sensor_data_range(table_name, tags, start_date, end_date or start_date)
+        batch_rows = batch_rows or max(len(df), 1)
+        for start in range(0, len(df), batch_rows):
+            yield df.iloc[start:start + batch_rows].reset_index(drop=True)
+
+    def fetch_last_updates(self, table_name: str, tags: List[str], date: str) -> pd.DataFrame:
+        """
+        有効なタグについて現在日時を最終更新日時として返す。
+        """
+        rows = [
+            {"factory": "A", "tag": tag, "date": date, "last_update": pd.Timestamp.now()}
+            for tag in tags if tag in self.valid_tags
+        ]
+        return pd.DataFrame(rows, columns=["factory", "tag", "date", "last_update"])
+
     def generate_mock_sql_response(self, tags: List[str], date: str) -> List[dict]:
             """SQL Serverのレスポンスを模倣した辞書リストを生成。"""
             import numpy as np
@@ -264,16 +680,20 @@ class TestSensorDataRepository(AbstractSensorDataRepository):
         return True
 
 
-    def copy_sensor_data(self, source_table: str, target_table: str, tags: List[str], date: str) -> bool:
+    def copy_sensor_data(self, source_table: str, target_table: str, tags: Optional[List[str]], date: str,
+                         end_date: Optional[str] = None, factories: Optional[List[str]] = None) -> int:
         """
-        モックデータを使用して、データコピー処理をシミュレート。
+        モックデータを使用して、データコピー処理をシミュレート。コピーした行数を返す。
         """
         self.logger.error(f"Copying data from {source_table} to {target_table} for tags: {tags} and date: {date}")
-        source_data = self.fetch_sensor_data(tags, date)
+        source_data = self.fetch_sensor_data_range(source_table, tags if tags is not None else self.valid_tags,
+                                                   date, end_date or date)
+        if factories:
+            source_data = source_data[source_data["factory"].isin(factories)]
         if source_data.empty:
             self.logger.error(f"No data found in {source_table} for the given tags and date.")
-            return False
-        return self.save_sensor_data(source_data, target_table)
+            return 0
+        return len(source_data) if self.save_sensor_data(source_data, target_table) else 0
 
     def delete_sensor_data(self, table_name: str, tags: List[str], date: str) -> bool:
         """
@@ -290,19 +710,53 @@ class TestSensorDataRepository(AbstractSensorDataRepository):
 
 # センサーデータリポジトリ: 共通のインターフェース
 class SensorDataRepository:
-    def __init__(self, repository: AbstractSensorDataRepository, logger):
+    def __init__(self, repository: AbstractSensorDataRepository, logger, cache: Optional[SensorDataCache] = None):
+        """
+        :param repository: AbstractSensorDataRepository, 実装（本番 / テスト）
+        :param logger: ロガー
+        :param cache: Optional[SensorDataCache], fetch_sensor_data の読み込みキャッシュ（None の場合は使わない）
+        """
         self.repository = repository
         self.logger=logger
+        self.cache = cache
 
     def fetch_sensor_data(self, table_name: str, tags: List[str], date: str) -> pd.DataFrame:
         """
-        非正規化形式でデータを取得。
+        非正規化形式でデータを取得。キャッシュがある場合はキャッシュに無い行のみ取得します。
         """
+        if self.cache is not None:
+            return self.cache.fetch(self.repository, table_name, tags, date)
         return self.repository.fetch_sensor_data(table_name, tags, date)
 
-    def fetch_as_dto(self, table_name: str, tags: List[str], date: str) -> List[SensorDataDTO]:
+    def fetch_sensor_data_range(self, table_name: str, tags: List[str], start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        非正規化形式で期間内のデータを取得。
+        """
+        return self.repository.fetch_sensor_data_range(table_name, tags, start_date, end_date)
+
+    def iter_sensor_data(self, table_name: str, tags: List[str], start_date: str, end_date: Optional[str] = None,
+                         batch_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        非正規化形式で期間内のデータを batch_rows 行ずつ取得。
+        """
+        return self.repository.iter_sensor_data(table_name, tags, start_date, end_date, batch_rows)
+
+    def fetch_last_updates(self, table_name: str, tags: List[str], date: str) -> pd.DataFrame:
+        """
+        行の最終更新日時のみを取得。
+        """
+        return self.repository.fetch_last_updates(table_name, tags, date)
+
+    def fetch_as_long(self, table_name: str, tags: List[str], date: str) -> pd.DataFrame:
+        """
+        センサーデータを縦持ち形式（factory / tag / timestamp / channel / value）で取得。
+        """
+        return to_long_format(self.fetch_sensor_data(table_name, tags, date))
+
+    def fetch_as_dto(self, table_name: str, tags: List[str], date: str) -> SensorDataDTOView:
         """
-        センサーデータをDTOリストとして取得。
+        センサーデータをDTOのシーケンスとして取得。
+        DTO は参照した時点で作成されます（SensorDataDTOView）。
         """
         # 共通処理: fetch_sensor_data を利用してデータを取得
         df = self.fetch_sensor_data(table_name, tags, date)
@@ -310,19 +764,7 @@ class SensorDataRepository:
             self.logger.error("fetch_as_dto: Received empty DataFrame.")
             return []
 
-        dtos = []
-        for _, row in df.iterrows():
-            for hour in range(30):  # 30 時間分
-                for prefix in ["d0", "d1", "d2", "d3"]:
-                    timestamp = f"{row['date']} {hour:02d}:00:00"  # 修正: hour をゼロ埋めで 2 桁に
-                    value = row[f"{prefix}_{hour}"]
-                    dtos.append(SensorDataDTO(
-                        factory=row["factory"],
-                        tag=row["tag"],
-                        timestamp=timestamp,
-                        value=value
-                    ))
-
+        dtos = SensorDataDTOView(to_long_format(df))
         self.logger.error(f"Generated DTOs: {dtos[:5]}")  # 最初の5件を表示
         return dtos
 
@@ -331,16 +773,29 @@ class SensorDataRepository:
         """
         データを指定されたテーブル名に保存します。
         """
-        return self.repository.save_sensor_data(df, table_name)
+        try:
+            return self.repository.save_sensor_data(df, table_name)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate_frame(table_name, df)
     
     def delete_sensor_data(self, table_name: str, tags: List[str], date: str) -> bool:
         """
         データ削除処理のラップ。
         """
-        return self.repository.delete_sensor_data(table_name, tags, date)
+        try:
+            return self.repository.delete_sensor_data(table_name, tags, date)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(table_name, tags, date)
     
-    def copy_sensor_data(self, source_table: str, target_table: str, tags: List[str], date: str) -> bool:
+    def copy_sensor_data(self, source_table: str, target_table: str, tags: Optional[List[str]], date: str,
+                         end_date: Optional[str] = None, factories: Optional[List[str]] = None) -> int:
         """
-        データコピー処理のラップ。
+        データコピー処理のラップ。コピーした行数を返します。
         """
-        return self.repository.copy_sensor_data(source_table, target_table, tags, date)
\ No newline at end of file
+        try:
+            return self.repository.copy_sensor_data(source_table, target_table, tags, date, end_date, factories)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(target_table, tags, date, end_date)
\ No newline at end of file
@@ -124,7 +124,7 @@ def test_production_repository_fetch_data(production_repository, mocker):
     mock_df = pd.DataFrame(mock_sql_response, columns=mock_columns)
 
     # SQL クエリの結果をモック
-    mocker.patch.object(production_repository.repository.sql_client, "execute_query", return_value=mock_sql_response)
+    mocker.patch.object(production_repository.repository.sql_client, "iter_query", return_value=iter([mock_sql_response]))
 
     # 実行
     result = production_repository.fetch_sensor_data(table_name, tag_factory_map, date)
@@ -133,6 +133,43 @@ def test_production_repository_fetch_data(production_repository, mocker):
     pd.testing.assert_frame_equal(result, mock_df, check_dtype=False)
 
 
+def test_production_repository_fetch_data_range(production_repository, mocker):
+    """fetch_sensor_data_range が期間条件付きの 1 回のクエリで取得するかを検証"""
+    tag_factory_map = {"sensor_1": "A", "sensor_2": "A"}
+    mock_sql_response = [
+        ["A", "sensor_1", date, "local_tag1", "local_id1", "name1", "unit1", "division1"] + [100] * 120 + [None]
+        for date in ["2024-12-01", "2024-12-02"]
+    ]
+    iter_query = mocker.patch.object(production_repository.repository.sql_client, "iter_query",
+                                     return_value=iter([mock_sql_response]))
+
+    # 実行
+    result = production_repository.fetch_sensor_data_range("sensor_data_table", tag_factory_map, "2024-12-01", "2024-12-31")
+
+    # 検証
+    iter_query.assert_called_once()
+    sql_query, params = iter_query.call_args[0][:2]
+    assert "[date] BETWEEN ? AND ?" in sql_query
+    assert params == ["sensor_1", "A", "sensor_2", "A", "2024-12-01", "2024-12-31"]
+    assert result["date"].tolist() == ["2024-12-01", "2024-12-02"]
+
+
+def test_production_repository_fetch_last_updates(production_repository, mocker):
+    """fetch_last_updates が値カラムを取得せずに最終更新日時のみ返すかを検証"""
+    mock_sql_response = [["A", "sensor_1", "2024-12-31", pd.Timestamp("2025-01-01 01:00")]]
+    iter_query = mocker.patch.object(production_repository.repository.sql_client, "iter_query",
+                                     return_value=iter([mock_sql_response]))
+
+    # 実行
+    result = production_repository.fetch_last_updates("sensor_data_table", {"sensor_1": "A"}, "2024-12-31")
+
+    # 検証
+    sql_query = iter_query.call_args[0][0]
+    assert "[d1_0]" not in sql_query
+    assert result.columns.tolist() == ["factory", "tag", "date", "last_update"]
+    assert result["last_update"].iloc[0] == pd.Timestamp("2025-01-01 01:00")
+
+
 def test_production_repository_save_data_missing_columns(production_repository):
     """ProductionSensorDataRepository の save_sensor_data が必須列欠損時にエラーを返すかを検証"""
     table_name = "sensor_data_table"
@@ -249,6 +286,200 @@ def test_production_repository_save_sql_error(production_repository, mocker):
     mock_cursor.execute.assert_called()  # 少なくとも `execute` が呼び出されることを確認
     assert not result, "SQL エラー時に保存処理が成功してしまいました"
 
+def _mock_cursor(mocker, repository):
+    """create_connection() の with ブロック内で使われるカーソルのモックを返す"""
+    mock_cursor = MagicMock()
+    mock_connection = MagicMock()
+    mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
+    mock_sql_client = MagicMock()
+    mock_sql_client.connection_factory.create_connection.return_value.__enter__.return_value = mock_connection
+    mocker.patch.object(repository, "sql_client", mock_sql_client)
+    return mock_cursor, mock_connection
+
+
+def test_production_repository_bulk_save(logger_mock, mocker):
+    """一括保存がチャンク毎の executemany と 1 回の DELETE / INSERT で保存されるかを検証"""
+    from common.repository.sensor_data_repository import ProductionSensorDataRepository
+    repository = ProductionSensorDataRepository(MagicMock(), logger_mock, save_mode="bulk", chunk_size=2)
+    mock_cursor, mock_connection = _mock_cursor(mocker, repository)
+    df = pd.DataFrame({
+        "factory": ["A"] * 5,
+        "tag": ["sensor_1", "sensor_2", "sensor_3", "sensor_4", "sensor_1"],  # sensor_1 は重複（最後の行を保存）
+        "date": ["2024-12-31"] * 5,
+        "d0_0": [1, 1, 1, 1, 2],
+        "d1_0": [1.0, float("nan"), 3.0, 4.0, 5.0],
+    })
+
+    # 実行
+    result = repository.save_sensor_data(df, "sensor_data_table")
+
+    # 検証
+    assert result
+    staged_rows = [row for c in mock_cursor.executemany.call_args_list for row in c.args[1]]
+    assert [len(c.args[1]) for c in mock_cursor.executemany.call_args_list] == [2, 2]
+    assert staged_rows[0][:5] == ["A", "sensor_2", "2024-12-31", 1, None], "欠損値が None に変換されていません"
+    assert staged_rows[-1][:5] == ["A", "sensor_1", "2024-12-31", 2, 5.0]
+    statements = [c.args[0] for c in mock_cursor.execute.call_args_list]
+    assert len(statements) == 4  # 一時テーブル作成 / DELETE / INSERT ... SELECT / DROP
+    assert statements[1].startswith("DELETE t FROM sensor_data_table")
+    assert statements[2].startswith("INSERT INTO sensor_data_table")
+    mock_connection.commit.assert_called_once()
+    assert [chunk["rows"] for chunk in repository.last_save_stats["chunks"]] == [2, 2]
+
+
+def test_production_repository_row_save(logger_mock, mocker):
+    """save_mode="row" の場合は 1 行ずつ DELETE + INSERT で保存されるかを検証"""
+    from common.repository.sensor_data_repository import ProductionSensorDataRepository
+    repository = ProductionSensorDataRepository(MagicMock(), logger_mock, save_mode="row")
+    mock_cursor, _ = _mock_cursor(mocker, repository)
+    df = pd.DataFrame({"factory": ["A"] * 3, "tag": ["s1", "s2", "s3"], "date": ["2024-12-31"] * 3, "d0_0": [1] * 3})
+
+    # 実行
+    result = repository.save_sensor_data(df, "sensor_data_table")
+
+    # 検証
+    assert result
+    assert mock_cursor.execute.call_count == 6
+    mock_cursor.executemany.assert_not_called()
+
+
+def test_production_repository_save_keeps_given_last_update(logger_mock, mocker):
+    """指定された last_update（計算結果の入力の最終更新日時）は保存日時で上書きせず、無い行のみ保存日時にするかを検証"""
+    from common.repository.sensor_data_repository import ProductionSensorDataRepository
+    repository = ProductionSensorDataRepository(MagicMock(), logger_mock, save_mode="row")
+    mock_cursor, _ = _mock_cursor(mocker, repository)
+    df = pd.DataFrame({
+        "factory": ["A"] * 2, "tag": ["s1", "s2"], "date": ["2024-12-31"] * 2, "d0_0": [1] * 2,
+        "last_update": [pd.Timestamp("2024-12-31 10:00"), pd.NaT],
+    })
+
+    assert repository.save_sensor_data(df, "calculation_result_table")
+
+    inserted = [c.args[1] for c in mock_cursor.execute.call_args_list if c.args[0].strip().startswith("INSERT")]
+    assert inserted[0][-1] == pd.Timestamp("2024-12-31 10:00")
+    assert inserted[1][-1] > pd.Timestamp("2024-12-31 10:00")
+
+
+def test_production_repository_fetch_in_parameter_chunks(logger_mock):
+    """パラメータ数の上限を超えないように (tag, factory) をチャンクに分けて取得・結合するかを検証"""
+    from common.repository.sensor_data_repository import ProductionSensorDataRepository
+    sql_client = MagicMock()
+    sql_client.iter_query.side_effect = lambda query, params, batch_size: iter([[
+        ["A", params[0], "2024-12-31", "local", "id", "name", "unit", "division"] + [100] * 120 + [None]
+    ]])
+    repository = ProductionSensorDataRepository(sql_client, logger_mock, param_chunk_size=4, key_table_threshold=None)
+    tag_factory_map = {f"sensor_{i}": "A" for i in range(11)}
+
+    # 実行
+    result = repository.fetch_sensor_data("sensor_data_table", tag_factory_map, "2024-12-31")
+
+    # 検証
+    params = [c.args[1] for c in sql_client.iter_query.call_args_list]
+    assert [len(p) for p in params] == [9, 9, 9]  # 4 + 4 + 3（4 に切り上げ）の組み合わせ + 日付
+    assert params[-1][:8] == ["sensor_8", "A", "sensor_9", "A", "sensor_10", "A", "sensor_10", "A"]
+    assert sql_client.iter_query.call_args_list[0].args[0] == sql_client.iter_query.call_args_list[-1].args[0]
+    assert result["tag"].tolist() == ["sensor_0", "sensor_4", "sensor_8"]
+
+
+def test_production_repository_fetch_with_key_table(logger_mock, mocker):
+    """閾値を超える (tag, factory) が一時テーブル経由の 1 回の結合で取得され、SQLClient のフックで計測されるかを検証"""
+    from common.repository.sensor_data_repository import ProductionSensorDataRepository
+    from common.SQLServer.client import ConnectionFactory, SQLClient
+    mock_connect = mocker.patch("pyodbc.connect")
+    mock_cursor = mock_connect.return_value.cursor.return_value.__enter__.return_value
+    events = []
+    sql_client = SQLClient(ConnectionFactory("s", "d", "u", "p"), hooks=[events.append])
+    repository = ProductionSensorDataRepository(sql_client, logger_mock, key_table_threshold=2)
+    mock_cursor.fetchmany.side_effect = [[["A", "sensor_1", "2024-12-31", pd.Timestamp("2025-01-01")]], []]
+    tag_factory_map = {f"sensor_{i}": "A" for i in range(3000)}
+
+    # 実行
+    result = repository.fetch_last_updates("sensor_data_table", tag_factory_map, "2024-12-31")
+
+    # 検証
+    mock_cursor.executemany.assert_called_once()
+    assert len(mock_cursor.executemany.call_args.args[1]) == 3000
+    statements = [c.args for c in mock_cursor.execute.call_args_list]
+    assert len(statements) == 3  # 一時テーブル作成 / 結合による取得 / DROP
+    assert "INNER JOIN #fetch_keys" in statements[1][0]
+    assert statements[1][1] == ["2024-12-31"]
+    assert statements[2][0] == "DROP TABLE #fetch_keys"
+    assert result["tag"].tolist() == ["sensor_1"]
+    assert len(events) == 1
+    assert "INNER JOIN #fetch_keys" in events[0].statement
+    assert (events[0].rows, events[0].error) == (1, None)
+
+
+def test_production_repository_iter_sensor_data(logger_mock):
+    """iter_sensor_data がチャンクを跨いで batch_rows 行ずつの DataFrame を返すかを検証"""
+    from common.repository.sensor_data_repository import ProductionSensorDataRepository
+    sql_client = MagicMock()
+    sql_client.iter_query.side_effect = lambda query, params, batch_size: iter([
+        [["A", params[0], date, "local", "id", "name", "unit", "division"] + [1] * 120 + [None]
+         for date in ["2024-12-01", "2024-12-02", "2024-12-03"]]
+    ])
+    repository = ProductionSensorDataRepository(sql_client, logger_mock, param_chunk_size=1, key_table_threshold=None)
+
+    # 実行
+    batches = list(repository.iter_sensor_data("sensor_data_table", {"sensor_1": "A", "sensor_2": "A"},
+                                               "2024-12-01", "2024-12-03", batch_rows=4))
+
+    # 検証
+    assert [len(batch) for batch in batches] == [4, 2]
+    assert batches[1]["tag"].tolist() == ["sensor_2", "sensor_2"]
+    assert batches[0]["d0_0"].dtype == "Int16"
+    assert sql_client.iter_query.call_args_list[0].args[1][-2:] == ["2024-12-01", "2024-12-03"]
+
+
+def test_production_repository_stream_batch_rows_from_budget(logger_mock, mocker):
+    """バッチの行数が設定のメモリ量から決まるかを検証"""
+    from common.repository import sensor_data_repository
+    mocker.patch.dict(sensor_data_repository.SENSOR_DATA_FETCH_SETTINGS, {"stream_memory_budget_mb": 10})
+    repository = sensor_data_repository.ProductionSensorDataRepository(MagicMock(), logger_mock)
+
+    assert repository.stream_batch_rows == 10 * 1024 * 1024 // repository.ESTIMATED_ROW_BYTES
+
+
+def test_production_repository_copy_server_side(logger_mock, mocker):
+    """copy_sensor_data が DELETE + INSERT ... SELECT を 1 トランザクションで実行し、行数を返すかを検証"""
+    from common.repository.sensor_data_repository import ProductionSensorDataRepository
+    repository = ProductionSensorDataRepository(MagicMock(), logger_mock)
+    mock_cursor, mock_connection = _mock_cursor(mocker, repository)
+    mock_cursor.rowcount = 42
+
+    # 実行
+    copied = repository.copy_sensor_data("source_table", "target_table", ["sensor_1", "sensor_2"], "2024-12-01",
+                                         end_date="2024-12-31", factories=["H"])
+
+    # 検証
+    assert copied == 42
+    statements = [c.args for c in mock_cursor.execute.call_args_list]
+    assert statements[0][0].startswith("DELETE t FROM target_table AS t INNER JOIN source_table AS s")
+    assert statements[1][0].startswith("INSERT INTO target_table")
+    assert "SELECT" in statements[1][0] and "SYSDATETIME()" in statements[1][0]
+    assert statements[0][1] == statements[1][1] == ["2024-12-01", "2024-12-31", "sensor_1", "sensor_2", "H"]
+    mock_cursor.executemany.assert_not_called()
+    mock_connection.commit.assert_called_once()
+
+
+def test_production_repository_copy_many_tags_and_rollback(logger_mock, mocker):
+    """タグが多い場合は一時テーブルで絞り込み、エラー時はロールバックして 0 を返すかを検証"""
+    from common.repository.sensor_data_repository import ProductionSensorDataRepository
+    repository = ProductionSensorDataRepository(MagicMock(), logger_mock, param_chunk_size=2)
+    mock_cursor, mock_connection = _mock_cursor(mocker, repository)
+    mock_cursor.execute.side_effect = [None, None, Exception("deadlock")]
+
+    # 実行
+    copied = repository.copy_sensor_data("source_table", "target_table", ["s1", "s2", "s3"], "2024-12-01")
+
+    # 検証
+    assert copied == 0
+    assert len(mock_cursor.executemany.call_args.args[1]) == 3
+    assert "IN (SELECT [tag] FROM #copy_tags)" in mock_cursor.execute.call_args_list[1].args[0]
+    mock_connection.rollback.assert_called_once()
+    mock_connection.commit.assert_not_called()
+
+
 def test_production_repository_fetch_as_dto_with_anomalous_data(production_repository, mocker):
     """fetch_as_dto が異常値を含むデータで正しく動作するかを検証"""
     table_name = "sensor_data_table"
@@ -277,6 +508,40 @@ def test_production_repository_fetch_as_dto_with_anomalous_data(production_repos
     assert len(dtos) > 0, "DTO リストが空です"
     assert dtos[-1].value == 400, "異常値が正しく処理されていません"
 
+def test_to_long_format_matches_row_loop():
+    """縦持ち形式への変換が 行 → 時間 → チャネル の順で値・タイムスタンプを並べるかを検証"""
+    from common.repository.sensor_data_repository import to_long_format
+    rows = [
+        ["A", tag, "2024-12-31"] + [float(100 * i + j + k) for i in range(4) for j in range(30)]
+        for k, tag in enumerate(["sensor_1", "sensor_2"])
+    ]
+    df = pd.DataFrame(rows, columns=["factory", "tag", "date"] + [f"d{i}_{j}" for i in range(4) for j in range(30)])
+
+    long_df = to_long_format(df)
+
+    expected = [
+        (row["tag"], f"{row['date']} {hour:02d}:00:00", f"d{i}", row[f"d{i}_{hour}"])
+        for _, row in df.iterrows() for hour in range(30) for i in range(4)
+    ]
+    assert list(zip(long_df["tag"], long_df["timestamp"], long_df["channel"], long_df["value"])) == expected
+
+
+def test_dto_view_materializes_lazily():
+    """SensorDataDTOView がインデックス・スライス・イテレーションで SensorDataDTO を返すかを検証"""
+    from common.repository.sensor_data_repository import SensorDataDTOView
+    view = SensorDataDTOView(pd.DataFrame({
+        "factory": ["A", "A"], "tag": ["sensor_1", "sensor_1"], "timestamp": ["2024-12-31 00:00:00"] * 2,
+        "channel": ["d0", "d1"], "value": [1.0, 150.0],
+    }))
+
+    assert len(view) == 2
+    assert view[-1] == SensorDataDTO("A", "sensor_1", "2024-12-31 00:00:00", 150.0, channel="d1")
+    assert [dto.channel for dto in view] == ["d0", "d1"]
+    assert len(view[:5]) == 2
+    with pytest.raises(IndexError):
+        view[2]
+
+
 def test_production_repository_delete_no_match(production_repository, mocker):
     """delete_sensor_data が削除対象なしの場合に失敗するかを検証"""
     table_name = "sensor_data_table"
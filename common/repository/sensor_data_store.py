@@ -0,0 +1,405 @@
+import datetime
+import decimal
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from common.repository.sensor_cube import normalize_dates
+from common.repository.sensor_data_cache import same_last_update
+from common.repository.sensor_data_decoder import VALUE_COLUMNS, build_sensor_frame
+from common.repository.sensor_data_repository import AbstractSensorDataRepository
+
+_META_FILE = "meta.json"
+
+
+def _partition_date(date) -> str:
+    return pd.Timestamp(date).strftime("%Y-%m-%d")
+
+
+def _encode_value(value):
+    """JSON に変換できない値カラム以外の値（日時・Decimal・NumPy の数値）を変換します。"""
+    if isinstance(value, (pd.Timestamp, datetime.datetime)):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Unsupported value in sensor data partition: {type(value).__name__}")
+
+
+def _concat(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    if not frames:
+        return pd.DataFrame()
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+def _decode_value(obj: dict):
+    if "__datetime__" in obj:
+        return datetime.datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return datetime.date.fromisoformat(obj["__date__"])
+    if "__decimal__" in obj:
+        return decimal.Decimal(obj["__decimal__"])
+    return obj
+
+
+class SensorDataDiskStore:
+    """
+    確定済みの日（翌日分の 24～29 時の取り込みが終わり、以降更新されない日）のセンサーデータを
+    ローカルディスクに保持するストア。
+
+    {path}/{table}/{factory}/{date}/ を 1 パーティションとし、
+    - values-{id}.npy: 値カラム (タグ数, 120) の float64 配列（読み込み時はメモリマップ、pickle は使用しない）
+    - meta.json: カラムの並び・values のファイル名・値カラム以外の列（tag / last_update など）
+    を保存します。パーティションは一時ディレクトリに書き出してから置き換えるため、
+    書き込み途中のパーティションが読まれることはありません。values のファイル名は書き込み毎に異なるため、
+    読み込み中に置き換えられた場合も別の書き込みの meta と values を組み合わせることはありません。
+    複数のプロセスが同じパーティションを同時に置き換えた場合は、一方の書き込みのみ残ります（キャッシュのため許容）。
+    """
+
+    def __init__(self, path: str, settle_days: int = 2):
+        """
+        :param path: str, 保存先のディレクトリ
+        :param settle_days: int, 今日からこの日数以上前の日を確定済みとみなす
+        """
+        if settle_days < 1:
+            raise ValueError("settle_days must be at least 1")
+        self.path = path
+        self.settle_days = settle_days
+        self._lock = threading.Lock()
+
+    def is_settled(self, date) -> bool:
+        """指定日が確定済み（today - settle_days 以前）かを返します。"""
+        return pd.Timestamp(date).date() <= datetime.date.today() - datetime.timedelta(days=self.settle_days)
+
+    def _partition_path(self, table_name: str, factory: str, date) -> str:
+        return os.path.join(self.path, table_name, str(factory), _partition_date(date))
+
+    def read(self, table_name: str, factory: str, date, tags: Sequence[str]) -> Optional[pd.DataFrame]:
+        """
+        パーティションから指定タグの行を読み込みます。
+
+        :return: Optional[pd.DataFrame], パーティションにあるタグの行（パーティションが無い場合は None）
+        """
+        loaded = self._load(self._partition_path(table_name, factory, date))
+        if loaded is None:
+            return None
+        return self._select(*loaded, tags)
+
+    @staticmethod
+    def _load(path: str):
+        try:
+            with open(os.path.join(path, _META_FILE), encoding="utf-8") as f:
+                stored = json.load(f, object_hook=_decode_value)
+            values = np.load(os.path.join(path, stored["values_file"]), mmap_mode="r", allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        meta = pd.DataFrame(stored["meta"], columns=stored["meta_columns"])
+        if len(meta) != len(values):
+            raise ValueError(f"Corrupted sensor data partition: {path}")
+        return {"columns": stored["columns"], "meta": meta}, values
+
+    @staticmethod
+    def _select(partition: dict, values: np.ndarray, tags: Sequence[str]) -> pd.DataFrame:
+        meta: pd.DataFrame = partition["meta"]
+        positions = np.flatnonzero(meta["tag"].isin(list(tags)).to_numpy())
+        selected = meta.iloc[positions]
+        return build_sensor_frame(
+            partition["columns"],
+            {column: selected[column].tolist() for column in selected.columns},
+            np.asarray(values[positions], dtype=np.float64),
+        )
+
+    def write(self, table_name: str, df: pd.DataFrame):
+        """
+        取得したワイド形式の DataFrame を (factory, date) 毎のパーティションに反映します。
+        既存のパーティションの行は (tag 単位で) 置き換え、他のタグの行は残します。
+
+        :param table_name: str, テーブル名
+        :param df: pd.DataFrame, factory / tag / date と d0_0～d3_29 を含むデータ
+        """
+        if df.empty or any(column not in df.columns for column in VALUE_COLUMNS):
+            return
+        dates = normalize_dates(df["date"])
+        for (factory, date), group in df.groupby([df["factory"].to_numpy(), dates.to_numpy()], sort=False):
+            self._write_partition(table_name, factory, date, group)
+
+    def _write_partition(self, table_name: str, factory: str, date: str, df: pd.DataFrame):
+        columns = list(df.columns)
+        meta_columns = [column for column in columns if column not in VALUE_COLUMNS]
+        meta = df[meta_columns].reset_index(drop=True)
+        values = df[VALUE_COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        path = self._partition_path(table_name, factory, date)
+        with self._lock:
+            try:
+                existing = self._load(path)
+            except Exception:
+                existing = None  # 壊れたパーティションは今回の行で作り直す
+            if existing is not None:
+                # 既存のパーティションから今回のタグ以外の行を引き継ぐ
+                partition, old_values = existing
+                keep = ~partition["meta"]["tag"].isin(meta["tag"]).to_numpy()
+                if list(partition["meta"].columns) == meta_columns and keep.any():
+                    meta = pd.concat([partition["meta"][keep], meta], ignore_index=True)
+                    values = np.concatenate([np.asarray(old_values[keep]), values])
+
+            write_id = uuid.uuid4().hex
+            staging = f"{path}.tmp-{write_id}"
+            values_file = f"values-{write_id}.npy"
+            os.makedirs(staging)
+            try:
+                np.save(os.path.join(staging, values_file), values, allow_pickle=False)
+                stored = {
+                    "columns": columns,
+                    "values_file": values_file,
+                    "meta_columns": meta_columns,
+                    "meta": meta.astype(object).where(meta.notna(), None).to_numpy().tolist(),
+                }
+                with open(os.path.join(staging, _META_FILE), "w", encoding="utf-8") as f:
+                    json.dump(stored, f, default=_encode_value)
+                self._replace(staging, path)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    @staticmethod
+    def _replace(staging: str, path: str):
+        """
+        staging を path に置き換えます。_lock はスレッド間の排他のみのため、
+        他のプロセスと競合した場合（退避・置き換えの途中で path が変わった場合）は置き換えを諦めます。
+        """
+        retired = f"{path}.old-{uuid.uuid4().hex}"
+        try:
+            os.replace(path, retired)
+        except FileNotFoundError:
+            retired = None
+        try:
+            os.replace(staging, path)
+        except OSError:
+            # 他のプロセスが先にパーティションを置き換えた（空でないディレクトリには置き換えられない）
+            pass
+        if retired:
+            shutil.rmtree(retired, ignore_errors=True)
+
+    def invalidate(self, table_name: str, date, factories: Optional[Sequence[str]] = None):
+        """
+        パーティションを削除します。
+
+        :param table_name: str, テーブル名
+        :param date: 対象日
+        :param factories: Optional[Sequence[str]], 対象工場（None の場合は全工場）
+        """
+        table_path = os.path.join(self.path, table_name)
+        if factories is None:
+            factories = os.listdir(table_path) if os.path.isdir(table_path) else []
+        with self._lock:
+            for factory in factories:
+                shutil.rmtree(self._partition_path(table_name, factory, date), ignore_errors=True)
+
+
+class SettledSensorDataRepository(AbstractSensorDataRepository):
+    """
+    確定済みの日のセンサーデータを SensorDataDiskStore から返すリポジトリ（AbstractSensorDataRepository のラッパー）。
+    fetch_sensor_data / fetch_sensor_data_range / iter_sensor_data が対象です。
+
+    - 確定済みの日: ディスクにあるタグは fetch_last_updates（期間の場合は fetch_last_updates_range、値カラムなし）で
+      last_update を確認し、変わっていなければディスクから返します。
+      無いタグ・更新されたタグのみデータベースから取得し、ディスクに反映します
+    - 未確定の日・その他の操作: 元のリポジトリをそのまま呼び出します
+    - 保存・削除・コピーの対象日のパーティションは削除します
+    """
+
+    def __init__(self, repository, store: SensorDataDiskStore, revalidate: bool = True, logger=None):
+        """
+        :param repository: AbstractSensorDataRepository, 元のリポジトリ
+        :param store: SensorDataDiskStore, ディスクストア
+        :param revalidate: bool, ディスクの行の last_update をデータベースと照合するか
+        :param logger: ロガー（省略可能）
+        """
+        self.repository = repository
+        self.store = store
+        self.revalidate = revalidate
+        self.logger = logger
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def __getattr__(self, name):
+        # fetch_last_updates などは元のリポジトリに委譲する
+        if name == "repository":
+            raise AttributeError(name)
+        return getattr(self.repository, name)
+
+    def fetch_sensor_data(self, table_name: str, tag_factory_map: dict, date: str) -> pd.DataFrame:
+        if not self.store.is_settled(date):
+            return self.repository.fetch_sensor_data(table_name, tag_factory_map, date)
+        return self._fetch_settled(table_name, tag_factory_map, [_partition_date(date)])
+
+    def fetch_sensor_data_range(self, table_name: str, tag_factory_map: dict, start_date: str,
+                                end_date: str) -> pd.DataFrame:
+        """
+        期間のうち確定済みの日はディスクから返し（fetch_sensor_data と同様）、未確定の日のみ範囲クエリで取得します。
+        """
+        settled, unsettled = self._split_dates(start_date, end_date)
+        frames = []
+        if settled:
+            frames.append(self._fetch_settled(table_name, tag_factory_map, settled))
+        if unsettled:
+            frames.append(self.repository.fetch_sensor_data_range(table_name, tag_factory_map,
+                                                                  unsettled[0], unsettled[-1]))
+        return _concat(frames)
+
+    def iter_sensor_data(self, table_name: str, tag_factory_map: dict, start_date: str,
+                         end_date: Optional[str] = None, batch_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        確定済みの日は 1 日ずつディスクから batch_rows 行ずつ返し、未確定の日は元のリポジトリの iter_sensor_data で返します。
+        """
+        settled, unsettled = self._split_dates(start_date, end_date or start_date)
+        batch_rows = batch_rows or getattr(self.repository, "stream_batch_rows", None)
+        for date in settled:
+            frame = self._fetch_settled(table_name, tag_factory_map, [date])
+            step = batch_rows or max(len(frame), 1)
+            for start in range(0, len(frame), step):
+                yield frame.iloc[start:start + step].reset_index(drop=True)
+        if unsettled:
+            yield from self.repository.iter_sensor_data(table_name, tag_factory_map, unsettled[0], unsettled[-1],
+                                                        batch_rows)
+
+    def _split_dates(self, start_date: str, end_date: str) -> Tuple[List[str], List[str]]:
+        """期間の日付を (確定済みの日, 未確定の日) に分けます（確定済みの日は常に期間の前半になります）。"""
+        dates = [_partition_date(date) for date in pd.date_range(start_date, end_date)]
+        settled = [date for date in dates if self.store.is_settled(date)]
+        return settled, dates[len(settled):]
+
+    def _fetch_settled(self, table_name: str, tag_factory_map: dict, dates: List[str]) -> pd.DataFrame:
+        """
+        確定済みの日のデータを返します。ディスクにあるタグは last_update を確認し、
+        無いタグ・更新されたタグのみデータベースから取得してディスクに反映します。
+        """
+        stored: Dict[Tuple[str, str], pd.DataFrame] = {}
+        for date in dates:
+            for factory in dict.fromkeys(tag_factory_map.values()):
+                tags = [tag for tag, tag_factory in tag_factory_map.items() if tag_factory == factory]
+                try:
+                    rows = self.store.read(table_name, factory, date, tags)
+                except Exception as e:
+                    # ディスクストアは任意のキャッシュのため、読めない場合はデータベースから取得する
+                    self._warn(f"Failed to read sensor data disk store for {table_name} {factory} {date}: {e}")
+                    rows = None
+                if rows is not None and not rows.empty:
+                    stored[(factory, date)] = rows
+
+        stale = self._stale_rows(table_name, stored, dates) if self.revalidate and stored else set()
+        frames = []
+        on_disk = set()
+        for (factory, date), rows in stored.items():
+            fresh = rows[[(factory, date, tag) not in stale for tag in rows["tag"]]]
+            on_disk.update((factory, date, tag) for tag in fresh["tag"])
+            frames.append(fresh)
+
+        missing = {
+            date: {tag: factory for tag, factory in tag_factory_map.items() if (factory, date, tag) not in on_disk}
+            for date in dates
+        }
+        missing = {date: tag_map for date, tag_map in missing.items() if tag_map}
+        if missing:
+            frames.append(self._fetch_missing(table_name, missing))
+
+        missing_rows = sum(len(tag_map) for tag_map in missing.values())
+        self.disk_hits += len(on_disk)
+        self.misses += missing_rows
+        self.stale += len(stale)
+        if self.logger:
+            self.logger.debug(
+                f"Sensor data disk store for {table_name} {dates[0]}～{dates[-1]}: {len(on_disk)} rows from disk, "
+                f"{missing_rows} fetched ({len(stale)} stale)."
+            )
+        return _concat(frames)
+
+    def _fetch_missing(self, table_name: str, missing: Dict[str, dict]) -> pd.DataFrame:
+        """
+        ディスクに無い (日付, タグ) をデータベースから取得し、ディスクに反映します。
+        複数日の場合は、対象のタグ・期間を 1 回の範囲クエリで取得し、要求された行のみ返します。
+        """
+        dates = sorted(missing)
+        if len(dates) == 1:
+            fetched = self.repository.fetch_sensor_data(table_name, missing[dates[0]], dates[0])
+        else:
+            tag_factory_map = {tag: factory for tag_map in missing.values() for tag, factory in tag_map.items()}
+            fetched = self.repository.fetch_sensor_data_range(table_name, tag_factory_map, dates[0], dates[-1])
+        try:
+            # 範囲クエリで余分に取得した行も確定済みの日のため、そのままディスクに反映する
+            self.store.write(table_name, fetched)
+        except Exception as e:
+            self._warn(f"Failed to write sensor data disk store for {table_name} {dates[0]}～{dates[-1]}: {e}")
+        if len(dates) == 1 or fetched.empty:
+            return fetched
+        requested = {(factory, date, tag) for date, tag_map in missing.items() for tag, factory in tag_map.items()}
+        keys = zip(fetched["factory"], normalize_dates(fetched["date"]), fetched["tag"])
+        return fetched[[key in requested for key in keys]].reset_index(drop=True)
+
+    def _warn(self, message: str):
+        if self.logger:
+            self.logger.warning(message)
+
+    def _stale_rows(self, table_name: str, stored: Dict[Tuple[str, str], pd.DataFrame], dates: List[str]) -> set:
+        """
+        ディスクの行のうち、データベースの last_update と異なる（または削除された）(factory, date, tag) を返します。
+        複数日の場合は fetch_last_updates_range の 1 回のクエリで確認します。
+        """
+        targets = {tag: factory for (factory, _), rows in stored.items() for tag in rows["tag"]}
+        if len(dates) == 1:
+            updates = self.repository.fetch_last_updates(table_name, targets, dates[0])
+        else:
+            updates = self.repository.fetch_last_updates_range(table_name, targets, dates[0], dates[-1])
+        current = {
+            (factory, date, tag): last_update
+            for factory, date, tag, last_update in zip(
+                updates["factory"], normalize_dates(updates["date"]), updates["tag"], updates["last_update"]
+            )
+        }
+        stale = set()
+        for (factory, date), rows in stored.items():
+            last_updates = rows["last_update"] if "last_update" in rows.columns else [None] * len(rows)
+            for tag, last_update in zip(rows["tag"], last_updates):
+                key = (factory, date, tag)
+                if key not in current or not same_last_update(current[key], last_update):
+                    stale.add(key)
+        return stale
+
+    def stats(self) -> dict:
+        """
+        :return: dict, {"disk_hits", "misses", "stale"}
+        """
+        return {"disk_hits": self.disk_hits, "misses": self.misses, "stale": self.stale}
+
+    def save_sensor_data(self, df: pd.DataFrame, table_name: str) -> bool:
+        try:
+            return self.repository.save_sensor_data(df, table_name)
+        finally:
+            if not df.empty and {"factory", "date"}.issubset(df.columns):
+                for date, factories in df.groupby(normalize_dates(df["date"]).to_numpy())["factory"]:
+                    self.store.invalidate(table_name, date, list(dict.fromkeys(factories)))
+
+    def delete_sensor_data(self, table_name: str, tags: List[str], date: str) -> bool:
+        try:
+            return self.repository.delete_sensor_data(table_name, tags, date)
+        finally:
+            self.store.invalidate(table_name, date)
+
+    def copy_sensor_data(self, source_table: str, target_table: str, tags: Optional[List[str]], date: str,
+                         end_date: Optional[str] = None, factories: Optional[List[str]] = None) -> int:
+        try:
+            return self.repository.copy_sensor_data(source_table, target_table, tags, date, end_date, factories)
+        finally:
+            for target_date in pd.date_range(date, end_date or date):
+                self.store.invalidate(target_table, target_date, factories)
@@ -0,0 +1,183 @@
+import datetime
+
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock
+from common.repository.sensor_data_decoder import VALUE_COLUMNS
+from common.repository.sensor_data_store import SensorDataDiskStore, SettledSensorDataRepository
+
+TABLE = "sensor_data_table"
+SETTLED_DATE = "2024-12-01"
+UPDATED = pd.Timestamp("2024-12-03 01:00")
+
+
+def _frame(tags, date=SETTLED_DATE, value=1.0):
+    rows = [["A", tag, date, f"local_{tag}"] + [value] * 120 + [UPDATED] for tag in tags]
+    return pd.DataFrame(rows, columns=["factory", "tag", "date", "local_tag"] + VALUE_COLUMNS + ["last_update"])
+
+
+@pytest.fixture
+def repository():
+    """要求されたタグのみ返すリポジトリのモック"""
+    repository = MagicMock()
+    repository.last_update = UPDATED
+    repository.fetch_sensor_data.side_effect = lambda table, tag_map, date: _frame(list(tag_map), date)
+    repository.fetch_sensor_data_range.side_effect = lambda table, tag_map, start, end: pd.concat(
+        [_frame(list(tag_map), date.strftime("%Y-%m-%d")) for date in pd.date_range(start, end)], ignore_index=True
+    )
+    repository.fetch_last_updates.side_effect = lambda table, tag_map, date: pd.DataFrame(
+        {"factory": list(tag_map.values()), "tag": list(tag_map), "date": date,
+         "last_update": repository.last_update}
+    )
+    repository.fetch_last_updates_range.side_effect = lambda table, tag_map, start, end: pd.concat(
+        [repository.fetch_last_updates(table, tag_map, date.strftime("%Y-%m-%d")) for date in pd.date_range(start, end)],
+        ignore_index=True,
+    )
+    repository.stream_batch_rows = None
+    return repository
+
+
+def test_store_round_trip_and_merge(tmp_path):
+    """パーティションへの書き込み・タグ単位の置き換え・読み込みを検証"""
+    store = SensorDataDiskStore(str(tmp_path))
+    store.write(TABLE, _frame(["sensor_1", "sensor_2"]))
+    store.write(TABLE, _frame(["sensor_2", "sensor_3"], value=2.0))
+
+    rows = store.read(TABLE, "A", SETTLED_DATE, ["sensor_1", "sensor_2", "sensor_3"])
+
+    assert sorted(rows["tag"]) == ["sensor_1", "sensor_2", "sensor_3"]
+    assert rows.set_index("tag")["d3_29"].to_dict() == {"sensor_1": 1.0, "sensor_2": 2.0, "sensor_3": 2.0}
+    assert rows["d0_0"].dtype == "Int16"
+    assert rows.columns.tolist() == _frame([]).columns.tolist()
+    assert store.read(TABLE, "B", SETTLED_DATE, ["sensor_1"]) is None
+
+
+def test_is_settled(tmp_path):
+    store = SensorDataDiskStore(str(tmp_path), settle_days=2)
+    today = datetime.date.today()
+
+    assert store.is_settled(today - datetime.timedelta(days=2))
+    assert not store.is_settled(today - datetime.timedelta(days=1))
+
+
+def test_settled_day_served_from_disk(tmp_path, repository):
+    """確定済みの日はディスクから返し、無いタグ・更新されたタグのみ取得するかを検証"""
+    settled = SettledSensorDataRepository(repository, SensorDataDiskStore(str(tmp_path)))
+    settled.fetch_sensor_data(TABLE, {"sensor_1": "A", "sensor_2": "A"}, SETTLED_DATE)
+
+    result = settled.fetch_sensor_data(TABLE, {"sensor_1": "A", "sensor_2": "A", "sensor_3": "A"}, SETTLED_DATE)
+
+    assert repository.fetch_sensor_data.call_args.args[1] == {"sensor_3": "A"}
+    assert sorted(result["tag"]) == ["sensor_1", "sensor_2", "sensor_3"]
+    assert settled.stats() == {"disk_hits": 2, "misses": 3, "stale": 0}
+
+    repository.last_update = UPDATED + pd.Timedelta(hours=1)
+    settled.fetch_sensor_data(TABLE, {"sensor_1": "A"}, SETTLED_DATE)
+    assert repository.fetch_sensor_data.call_args.args[1] == {"sensor_1": "A"}
+    assert settled.stats()["stale"] == 1
+
+
+def test_unsettled_day_and_invalidation(tmp_path, repository):
+    """未確定の日はディスクを使わず、保存したパーティションは削除されるかを検証"""
+    store = SensorDataDiskStore(str(tmp_path))
+    settled = SettledSensorDataRepository(repository, store)
+    today = datetime.date.today().strftime("%Y-%m-%d")
+
+    settled.fetch_sensor_data(TABLE, {"sensor_1": "A"}, today)
+    assert store.read(TABLE, "A", today, ["sensor_1"]) is None
+
+    settled.fetch_sensor_data(TABLE, {"sensor_1": "A"}, SETTLED_DATE)
+    settled.save_sensor_data(_frame(["sensor_1"]), TABLE)
+    assert store.read(TABLE, "A", SETTLED_DATE, ["sensor_1"]) is None
+    settled.fetch_last_updates(TABLE, {"sensor_1": "A"}, SETTLED_DATE)  # 元のリポジトリに委譲
+    assert repository.fetch_last_updates.called
+
+
+def test_store_failures_fall_back_to_database(tmp_path, repository):
+    """ディスクストアの読み込み・書き込みに失敗しても、データベースの結果を返すかを検証"""
+    store = SensorDataDiskStore(str(tmp_path))
+    logger = MagicMock()
+    settled = SettledSensorDataRepository(repository, store, logger=logger)
+    store.write(TABLE, _frame(["sensor_1"]))
+    partition = tmp_path / TABLE / "A" / SETTLED_DATE
+    (partition / "meta.json").write_text("not json", encoding="utf-8")
+
+    result = settled.fetch_sensor_data(TABLE, {"sensor_1": "A"}, SETTLED_DATE)
+
+    assert list(result["tag"]) == ["sensor_1"]
+    assert repository.fetch_sensor_data.call_args.args[1] == {"sensor_1": "A"}
+    assert store.read(TABLE, "A", SETTLED_DATE, ["sensor_1"]) is not None, "壊れたパーティションが作り直されていません"
+
+    store.write = MagicMock(side_effect=FileNotFoundError("partition replaced by another process"))
+    result = settled.fetch_sensor_data(TABLE, {"sensor_2": "A"}, SETTLED_DATE)
+
+    assert list(result["tag"]) == ["sensor_2"]
+    assert logger.warning.call_count == 2
+
+
+def test_store_partition_is_not_pickled(tmp_path):
+    """パーティションは JSON と pickle を使わない npy で保存されるかを検証"""
+    import json
+    import numpy as np
+    store = SensorDataDiskStore(str(tmp_path))
+    store.write(TABLE, _frame(["sensor_1"]))
+
+    partition = tmp_path / TABLE / "A" / SETTLED_DATE
+    stored = json.loads((partition / "meta.json").read_text(encoding="utf-8"))
+    np.load(partition / stored["values_file"], allow_pickle=False)
+    assert stored["meta_columns"] == ["factory", "tag", "date", "local_tag", "last_update"]
+    assert store.read(TABLE, "A", SETTLED_DATE, ["sensor_1"])["last_update"].iloc[0] == UPDATED
+
+
+def test_replace_tolerates_concurrent_writer(tmp_path, mocker):
+    """他のプロセスが同時にパーティションを置き換えた場合も例外にならず、一時ディレクトリが残らないかを検証"""
+    from common.repository import sensor_data_store
+    store = SensorDataDiskStore(str(tmp_path))
+    mocker.patch.object(sensor_data_store.os, "replace",
+                        side_effect=[FileNotFoundError("moved"), OSError("Directory not empty")])
+
+    store.write(TABLE, _frame(["sensor_1"]))
+
+    assert list((tmp_path / TABLE / "A").iterdir()) == []
+
+
+def test_settled_range_served_from_disk(tmp_path, repository):
+    """確定済みの期間の範囲取得・ストリーミングが、2 回目以降はデータベースに問い合わせずディスクから返されるかを検証"""
+    settled = SettledSensorDataRepository(repository, SensorDataDiskStore(str(tmp_path)), revalidate=False)
+    tag_map = {"sensor_1": "A", "sensor_2": "A"}
+    settled.fetch_sensor_data(TABLE, {"sensor_1": "A"}, "2024-12-02")
+
+    first = settled.fetch_sensor_data_range(TABLE, tag_map, "2024-12-01", "2024-12-03")
+
+    # ディスクに無い (日付, タグ) のみ 1 回の範囲クエリで取得する
+    repository.fetch_sensor_data_range.assert_called_once_with(TABLE, tag_map, "2024-12-01", "2024-12-03")
+    assert sorted(zip(first["date"], first["tag"])) == [
+        (date, tag) for date in ("2024-12-01", "2024-12-02", "2024-12-03") for tag in ("sensor_1", "sensor_2")
+    ]
+
+    repository.reset_mock()
+    result = settled.fetch_sensor_data_range(TABLE, tag_map, "2024-12-01", "2024-12-03")
+    batches = list(settled.iter_sensor_data(TABLE, tag_map, "2024-12-01", "2024-12-03", batch_rows=4))
+
+    assert repository.method_calls == [], "確定済みの期間でデータベースに問い合わせています"
+    assert len(result) == 6
+    assert [len(batch) for batch in batches] == [2, 2, 2]
+    assert settled.stats()["disk_hits"] == 1 + 6 + 6
+
+
+def test_settled_range_revalidates_with_one_query(tmp_path, repository):
+    """期間の last_update の確認は 1 回のクエリで行い、未確定の日のみ範囲クエリで取得するかを検証"""
+    settled = SettledSensorDataRepository(repository, SensorDataDiskStore(str(tmp_path)))
+    tag_map = {"sensor_1": "A"}
+    settled.fetch_sensor_data_range(TABLE, tag_map, "2024-12-01", "2024-12-03")
+    repository.reset_mock()
+    today = datetime.date.today()
+    end_date = today.strftime("%Y-%m-%d")
+
+    result = settled.fetch_sensor_data_range(TABLE, tag_map, "2024-12-01", end_date)
+
+    repository.fetch_last_updates_range.assert_called_once()
+    unsettled_start = (today - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    assert repository.fetch_sensor_data_range.call_args_list[-1].args[2:] == (unsettled_start, end_date)
+    repository.fetch_sensor_data.assert_not_called()
+    assert len(result) == len(pd.date_range("2024-12-01", end_date))
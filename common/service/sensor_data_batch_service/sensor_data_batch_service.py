@@ -5,26 +5,29 @@ class SensorDataBatchService:
         self.repository = repository
         self.logger = logger
 
-    def process_sensor_data_batch(self, bcp_command, factory_code, process_date):
+    def process_sensor_data_batch(self, data_file, factory_code, process_date):
         """
         センサーデータを一時テーブルにロードし、メインテーブルにマージする。
 
-        :param bcp_command: 一時テーブルにロードするためのBCPコマンド
+        :param data_file: 一時テーブルにロードするデータファイル（CSV）、または bcp コマンド
         :param process_date: 処理対象日
         :param factory_code: 工場コード
-        :return: 処理結果
+        :return: 処理結果（成功時は "load" にロードの処理件数・rows/sec などを含む）
         """
         try:
             self.logger.info("センサーデータのバッチ処理を開始します。")
             
-            # データを一時テーブルにロード
-            self.repository.load_data_to_temp_table(bcp_command)
+            # データを一時テーブルにロード（プロセス内のバルクローダー）
+            load_report = self.repository.load_data_to_temp_table(data_file)
             
             # 一時テーブルからメインテーブルにマージ
             self.repository.merge_temp_to_main(process_date, factory_code)
 
             self.logger.info("センサーデータのバッチ処理が正常に完了しました。")
-            return {"status": "success", "message": "センサーデータのバッチ処理が完了しました。"}
+            result = {"status": "success", "message": "センサーデータのバッチ処理が完了しました。"}
+            if isinstance(load_report, dict):
+                result["load"] = load_report
+            return result
         
         except Exception as e:
             self.logger.error(f"バッチ処理中にエラーが発生しました: {e}")
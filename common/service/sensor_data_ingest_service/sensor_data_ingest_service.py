@@ -0,0 +1,351 @@
+import queue
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from common.repository.batch_repository import BatchRepository
+from common.repository.sensor_cube import normalize_dates
+from common.repository.sensor_data_bulk_loader import default_load_columns
+from common.repository.sensor_data_repository import CHANNELS, HOURS, LONG_FORMAT_COLUMNS, from_long_format
+from common.settings import SENSOR_DATA_INGEST_SETTINGS
+
+STAGES = ("read", "clean", "convert", "load", "merge")
+
+# キューの終了を表す値
+_STOP = object()
+
+
+class IngestTask:
+    """1 工場・1 日分の取り込み（パイプラインの各段で共有する状態）"""
+
+    def __init__(self, factory: str, date: str, source: Union[str, pd.DataFrame]):
+        self.factory = factory
+        self.date = pd.Timestamp(date).strftime("%Y-%m-%d")
+        self.source = source
+        self.rows = 0
+        self.rejected = 0
+        self.chunks = None  # convert 段で確定するチャンク数
+        self.loaded_chunks = 0
+        self.error: Optional[str] = None
+        self.handed_to_merge = False
+        self.started = time.perf_counter()
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def fail(self, stage: str, error: Exception):
+        with self.lock:
+            if self.error is None:
+                self.error = f"{stage}: {error}"
+
+    def to_dict(self) -> dict:
+        return {
+            "factory": self.factory,
+            "date": self.date,
+            "status": "error" if self.error else "success",
+            "rows": self.rows,
+            "rejected": self.rejected,
+            "error": self.error,
+            "seconds": (self.finished or time.perf_counter()) - self.started,
+        }
+
+
+class StageCounter:
+    """段毎の処理件数・行数・処理時間・下流のキューが空くのを待った時間（バックプレッシャー）"""
+
+    def __init__(self):
+        self.items = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, rows: int, seconds: float):
+        with self.lock:
+            self.items += 1
+            self.rows += rows
+            self.busy_seconds += seconds
+
+    def blocked(self, seconds: float):
+        with self.lock:
+            self.blocked_seconds += seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "rows": self.rows,
+            "busy_seconds": self.busy_seconds,
+            "blocked_seconds": self.blocked_seconds,
+            "rows_per_second": self.rows / self.busy_seconds if self.busy_seconds else 0.0,
+        }
+
+
+class SensorDataIngestService:
+    """
+    データファイルを 読み込み → 検証・クレンジング → ワイド形式への変換 → 取り込みテーブルへの投入 → マージ
+    の各段をスレッドで並行に実行する取り込みパイプライン。
+
+    段の間は上限付きのキュー（queue_size）でつなぎ、下流が詰まると上流が待ちます（バックプレッシャー）。
+    工場・日付単位で順に流すため、ある工場・日付のマージ中に次の工場・日付の投入が進みます。
+    """
+
+    def __init__(self, repository: BatchRepository, logger, queue_size: Optional[int] = None,
+                 load_workers: Optional[int] = None):
+        """
+        :param repository: BatchRepository, 投入（repository.loader）とマージ（merge_temp_to_main）に使用
+        :param logger: ロガー
+        :param queue_size: Optional[int], 段の間のキューに溜めるチャンク数の上限（省略時は設定値）
+        :param load_workers: Optional[int], 並列に投入する接続数（省略時は設定値）
+        """
+        self.repository = repository
+        self.logger = logger
+        self.queue_size = queue_size or SENSOR_DATA_INGEST_SETTINGS["queue_size"]
+        self.load_workers = load_workers or SENSOR_DATA_INGEST_SETTINGS["load_workers"]
+        self.counters = {stage: StageCounter() for stage in STAGES}
+
+    def ingest(self, sources: Iterable[Tuple[str, str, Union[str, pd.DataFrame]]]) -> dict:
+        """
+        工場・日付毎のデータを取り込み、マージします。
+
+        :param sources: Iterable[Tuple[str, str, Union[str, pd.DataFrame]]], [(工場コード, 対象日, データファイルまたは DataFrame)]
+                        データはワイド形式（generate_bcp_format_file.py の並び、カラム名の行は任意）
+                        または縦持ち形式（factory / tag / timestamp / channel / value）
+        :return: dict, {"tasks": [{"factory", "date", "status", "rows", "rejected", "error", "seconds"}],
+                        "stages": {段: {"items", "rows", "busy_seconds", "blocked_seconds", "rows_per_second"}},
+                        "seconds": 経過時間}
+        """
+        self.counters = {stage: StageCounter() for stage in STAGES}
+        tasks = [IngestTask(factory, date, source) for factory, date, source in sources]
+        clean_queue, convert_queue, load_queue, merge_queue = (queue.Queue(self.queue_size) for _ in range(4))
+        started = time.perf_counter()
+
+        threads = [
+            threading.Thread(target=self._read_stage, args=(tasks, clean_queue), name="ingest-read"),
+            threading.Thread(target=self._clean_stage, args=(clean_queue, convert_queue), name="ingest-clean"),
+            threading.Thread(target=self._convert_stage, args=(convert_queue, load_queue), name="ingest-convert"),
+        ]
+        loaders = [
+            threading.Thread(target=self._load_stage, args=(load_queue, merge_queue), name=f"ingest-load-{i}")
+            for i in range(self.load_workers)
+        ]
+        merger = threading.Thread(target=self._merge_stage, args=(merge_queue,), name="ingest-merge")
+        for thread in threads + loaders + [merger]:
+            thread.daemon = True
+            thread.start()
+        for thread in threads + loaders:
+            thread.join()
+        # 全ての投入が終わってからマージ段を止める
+        merge_queue.put(_STOP)
+        merger.join()
+
+        report = {
+            "tasks": [task.to_dict() for task in tasks],
+            "stages": {stage: counter.to_dict() for stage, counter in self.counters.items()},
+            "seconds": time.perf_counter() - started,
+        }
+        failed = [task for task in tasks if task.error]
+        self.logger.info(
+            f"Ingested {len(tasks) - len(failed)}/{len(tasks)} factory-days in {report['seconds']:.2f}s "
+            f"({self.counters['load'].rows} rows loaded, {sum(task.rejected for task in tasks)} rejected)."
+        )
+        for task in failed:
+            self.logger.error(f"Ingest failed for {task.factory} {task.date}: {task.error}")
+        return report
+
+    def _put(self, target: queue.Queue, item, stage: str):
+        started = time.perf_counter()
+        target.put(item)
+        self.counters[stage].blocked(time.perf_counter() - started)
+
+    # 1. 読み込み
+    def _read_stage(self, tasks: List[IngestTask], output: queue.Queue):
+        for task in tasks:
+            try:
+                for chunk in self._read_chunks(task.source):
+                    self.counters["read"].add(len(chunk), 0.0)
+                    self._put(output, (task, chunk), "read")
+            except Exception as e:
+                task.fail("read", e)
+            self._put(output, (task, None), "read")
+        output.put(_STOP)
+
+    def _read_chunks(self, source: Union[str, pd.DataFrame]):
+        chunk_rows = self.repository.loader.chunk_rows
+        if isinstance(source, pd.DataFrame):
+            # ファイルから読み込んだ場合と同じく文字列（欠損値は None）として後段に渡す
+            for start in range(0, len(source), chunk_rows):
+                chunk = source.iloc[start:start + chunk_rows]
+                if "date" in chunk.columns:
+                    chunk = chunk.assign(date=normalize_dates(chunk["date"]).to_numpy())
+                yield chunk.astype(str).mask(chunk.isna().to_numpy(), None)
+            return
+        names = default_load_columns()
+        with open(source, encoding="utf-8") as f:
+            first = f.readline().strip().split(",")
+        has_header = first[:1] == names[:1] or set(LONG_FORMAT_COLUMNS).issubset(first)
+        reader = pd.read_csv(
+            source, header=0 if has_header else None, names=None if has_header else names, dtype=str,
+            na_values=["", "NULL"], keep_default_na=False, chunksize=chunk_rows,
+        )
+        with reader:
+            yield from reader
+
+    # 2. 検証・クレンジング
+    def _clean_stage(self, input: queue.Queue, output: queue.Queue):
+        self._run_stage("clean", input, output, self.clean)
+
+    def clean(self, task: IngestTask, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        前後の空白を除き、工場・タグ・日付が無い行や、対象の工場・日付以外の行を除外します。
+        縦持ち形式は channel が d0～d3 以外、時が 0～29 以外、value が数値でない行も除外します。
+
+        :return: pd.DataFrame, 残った行（除外した件数は task.rejected に加算）
+        """
+        chunk = chunk.apply(lambda column: column.str.strip() if pd.api.types.is_string_dtype(column) else column)
+        long_format = set(LONG_FORMAT_COLUMNS).issubset(chunk.columns)
+        dates = chunk["timestamp"].str.slice(0, 10) if long_format else chunk["date"]
+        keep = (
+            chunk["factory"].eq(task.factory)
+            & chunk["tag"].notna()
+            & pd.to_datetime(dates, format="%Y-%m-%d", errors="coerce").eq(pd.Timestamp(task.date))
+        )
+        if long_format:
+            # from_long_format は 1 行でも範囲外があると全体が失敗するため、ここで行単位に除外する
+            hours = pd.to_numeric(chunk["timestamp"].str.slice(11, 13), errors="coerce")
+            keep &= (
+                chunk["channel"].isin(CHANNELS)
+                & hours.between(0, HOURS - 1)
+                & (chunk["value"].isna() | pd.to_numeric(chunk["value"], errors="coerce").notna())
+            )
+        task.rejected += int((~keep).sum())
+        return chunk[keep.to_numpy()]
+
+    # 3. ワイド形式への変換
+    def _convert_stage(self, input: queue.Queue, output: queue.Queue):
+        chunk_counts = {}
+        # 縦持ち形式の行（工場・日付の全ての行が揃ってから変換する）
+        long_chunks = {}
+
+        def convert(task: IngestTask, chunk: pd.DataFrame) -> pd.DataFrame:
+            if set(LONG_FORMAT_COLUMNS).issubset(chunk.columns):
+                # 時刻順に並んだ入力では同じタグが全てのチャンクにまたがるため、
+                # チャンク毎に変換すると同じ (工場, タグ, 日付) が複数の行に分かれて投入される
+                long_chunks.setdefault(task, []).append(chunk)
+                return chunk.iloc[:0]
+            return self._count(chunk_counts, task, self.convert(task, chunk))
+
+        def finish(task: IngestTask):
+            chunks = long_chunks.pop(task, None)
+            if chunks and not task.error:
+                started = time.perf_counter()
+                try:
+                    frame = self.convert(task, pd.concat(chunks, ignore_index=True))
+                except Exception as e:
+                    task.fail("convert", e)
+                else:
+                    self.counters["convert"].add(len(frame), time.perf_counter() - started)
+                    chunk_rows = self.repository.loader.chunk_rows
+                    for start in range(0, len(frame), chunk_rows):
+                        part = self._count(chunk_counts, task, frame.iloc[start:start + chunk_rows])
+                        self._put(output, (task, part), "convert")
+            # 投入段にこの工場・日付のチャンク数を知らせる
+            return chunk_counts.pop(task, 0)
+
+        self._run_stage("convert", input, output, convert, finish)
+
+    @staticmethod
+    def _count(chunk_counts: dict, task: IngestTask, frame: pd.DataFrame) -> pd.DataFrame:
+        if not frame.empty:
+            chunk_counts[task] = chunk_counts.get(task, 0) + 1
+        return frame
+
+    def convert(self, task: IngestTask, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        ワイド形式に変換し（縦持ち形式の場合）、列単位で型を変換します。変換できない行は除外します。
+        """
+        if chunk.empty:
+            return chunk
+        if set(LONG_FORMAT_COLUMNS).issubset(chunk.columns):
+            chunk = from_long_format(chunk)
+        frame, rejected = self.repository.loader.convert(chunk)
+        task.rejected += int(rejected.sum())
+        return frame[~rejected.to_numpy()]
+
+    def _run_stage(self, stage: str, input: queue.Queue, output: queue.Queue, process, finish=None):
+        """
+        input から (task, chunk) を受け取り、process の結果を output に渡します。
+        chunk が None の場合はその工場・日付の終わり（finish の結果を添えて下流に渡す）。
+        """
+        while True:
+            item = input.get()
+            if item is _STOP:
+                output.put(_STOP)
+                return
+            task, chunk = item
+            if chunk is None:
+                self._put(output, (task, finish(task) if finish else None), stage)
+                continue
+            if task.error:
+                continue
+            started = time.perf_counter()
+            try:
+                result = process(task, chunk)
+            except Exception as e:
+                task.fail(stage, e)
+                continue
+            self.counters[stage].add(len(result), time.perf_counter() - started)
+            if not result.empty:
+                self._put(output, (task, result), stage)
+
+    # 4. 投入（load_workers 本で並列）
+    def _load_stage(self, input: queue.Queue, output: queue.Queue):
+        while True:
+            item = input.get()
+            if item is _STOP:
+                input.put(_STOP)  # 他の投入スレッドも止める
+                return
+            task, chunk = item
+            if isinstance(chunk, int):
+                with task.lock:
+                    task.chunks = chunk
+                self._complete_if_loaded(task, output)
+                continue
+            if not task.error:
+                try:
+                    seconds = self.repository.loader.insert_frame(chunk)
+                    self.counters["load"].add(len(chunk), seconds)
+                    with task.lock:
+                        task.rows += len(chunk)
+                except Exception as e:
+                    task.fail("load", e)
+            with task.lock:
+                task.loaded_chunks += 1
+            self._complete_if_loaded(task, output)
+
+    def _complete_if_loaded(self, task: IngestTask, output: queue.Queue):
+        with task.lock:
+            ready = task.chunks is not None and task.loaded_chunks == task.chunks and not task.handed_to_merge
+            if ready:
+                task.handed_to_merge = True  # 1 回だけマージ段に渡す
+        if ready:
+            self._put(output, task, "load")
+
+    # 5. マージ
+    def _merge_stage(self, input: queue.Queue):
+        while True:
+            task = input.get()
+            if task is _STOP:
+                return
+            if not task.error:
+                started = time.perf_counter()
+                try:
+                    self.repository.merge_temp_to_main(task.date, task.factory)
+                    self.counters["merge"].add(task.rows, time.perf_counter() - started)
+                except Exception as e:
+                    task.fail("merge", e)
+            task.finished = time.perf_counter()
+            self.logger.info(
+                f"Factory {task.factory} {task.date}: {task.rows} rows loaded, {task.rejected} rejected"
+                f"{', failed' if task.error else ', merged'}."
+            )
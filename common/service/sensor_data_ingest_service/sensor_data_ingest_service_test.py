@@ -0,0 +1,141 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock, Mock
+
+from common.repository.sensor_data_bulk_loader import SensorDataBulkLoader, default_load_columns
+from common.repository.sensor_data_repository import VALUE_COLUMNS, to_long_format
+from common.service.sensor_data_ingest_service.sensor_data_ingest_service import STAGES, SensorDataIngestService
+
+
+def wide_frame(factory, date, tags):
+    frame = pd.DataFrame({name: [None] * len(tags) for name in default_load_columns()})
+    frame["factory"] = factory
+    frame["tag"] = tags
+    frame["date"] = date
+    frame["data_division"] = 1
+    for i, name in enumerate(VALUE_COLUMNS):
+        frame[name] = [float(i + n) for n in range(len(tags))]
+    return frame
+
+
+@pytest.fixture
+def repository():
+    repository = Mock()
+    repository.loader = SensorDataBulkLoader(MagicMock(), Mock(), chunk_rows=2)
+    inserted = []
+    lock = threading.Lock()
+
+    def insert_frame(frame, table_name=None):
+        with lock:
+            inserted.append(frame)
+        return 0.001
+
+    repository.loader.insert_frame = Mock(side_effect=insert_frame)
+    repository.inserted = inserted
+    return repository
+
+
+@pytest.fixture
+def service(repository):
+    return SensorDataIngestService(repository, Mock(), queue_size=1, load_workers=2)
+
+
+def test_ingest_wide_files_and_merge_per_factory_day(service, repository, tmp_path):
+    """ファイル毎に全てのチャンクが投入された後、工場・日付毎に 1 回ずつマージされるかを検証"""
+    sources = []
+    for factory in ("H", "T"):
+        path = tmp_path / f"{factory}.csv"
+        wide_frame(factory, "2024-12-01", ["A", "B", "C"]).to_csv(path, index=False)
+        sources.append((factory, "2024-12-01", str(path)))
+
+    report = service.ingest(sources)
+
+    assert [(task["factory"], task["status"], task["rows"]) for task in report["tasks"]] == [
+        ("H", "success", 3), ("T", "success", 3),
+    ]
+    assert repository.merge_temp_to_main.call_args_list == [(("2024-12-01", "H"),), (("2024-12-01", "T"),)]
+    loaded = pd.concat(repository.inserted)
+    assert sorted(loaded["tag"] + loaded["factory"]) == ["AH", "AT", "BH", "BT", "CH", "CT"]
+    assert loaded["d0_0"].dtype == "Int32"
+    assert set(report["stages"]) == set(STAGES)
+    assert report["stages"]["load"]["rows"] == 6
+    assert report["stages"]["merge"]["items"] == 2
+
+
+def test_ingest_rejects_invalid_rows(service, repository):
+    """対象外の工場・日付や数値に変換できない行が除外され、件数が記録されるかを検証"""
+    frame = wide_frame("H", "2024-12-01", ["A", "B", "C", "D"])
+    frame = frame.astype({"tag": object, "d1_3": object})
+    frame.loc[1, "factory"] = "T"
+    frame.loc[2, "d1_3"] = "x"
+    frame.loc[3, "tag"] = None
+
+    report = service.ingest([("H", "2024-12-01", frame)])
+
+    task = report["tasks"][0]
+    assert (task["status"], task["rows"], task["rejected"]) == ("success", 1, 3)
+    assert list(pd.concat(repository.inserted)["tag"]) == ["A"]
+
+
+def test_ingest_long_format_keeps_tag_in_one_row(service, repository):
+    """時刻順に並んだ縦持ち形式でも、タグ毎に 1 行にまとめて投入されるかを検証"""
+    wide = wide_frame("H", "2024-12-01", ["A", "B"])
+    long_df = to_long_format(wide[["factory", "tag", "date"] + VALUE_COLUMNS])
+    long_df = long_df.sort_values(["timestamp", "channel", "tag"], kind="stable").reset_index(drop=True)
+    assert list(long_df["tag"][:4]) == ["A", "B", "A", "B"]
+
+    report = service.ingest([("H", "2024-12-01", long_df)])
+
+    loaded = pd.concat(repository.inserted).sort_values("tag").reset_index(drop=True)
+    assert report["tasks"][0]["rows"] == 2
+    assert list(loaded["tag"]) == ["A", "B"]
+    np.testing.assert_array_equal(loaded[VALUE_COLUMNS].to_numpy(dtype=np.float64),
+                                  wide[VALUE_COLUMNS].to_numpy(dtype=np.float64))
+    repository.merge_temp_to_main.assert_called_once_with("2024-12-01", "H")
+
+
+def test_ingest_rejects_invalid_long_format_rows(service, repository):
+    """縦持ち形式の channel・時が範囲外の行は除外され、工場・日付全体は失敗しないかを検証"""
+    long_df = pd.DataFrame({
+        "factory": ["H"] * 4,
+        "tag": ["A"] * 4,
+        "timestamp": ["2024-12-01 00:00:00", "2024-12-01 01:00:00", "2024-12-01 05:00:00", "2024-12-01 02:00:00"],
+        "channel": ["d1", "d1", "d9", "d2"],
+        "value": [1.0, 2.0, 3.0, 4.0],
+    })
+    long_df.loc[1, "timestamp"] = "2024-12-01 3x:00:00"
+
+    report = service.ingest([("H", "2024-12-01", long_df)])
+
+    task = report["tasks"][0]
+    assert (task["status"], task["rows"], task["rejected"]) == ("success", 1, 2)
+    loaded = pd.concat(repository.inserted)
+    assert (loaded.loc[:, "d1_0"].tolist(), loaded.loc[:, "d2_2"].tolist()) == ([1.0], [4.0])
+    repository.merge_temp_to_main.assert_called_once_with("2024-12-01", "H")
+
+
+def test_ingest_isolates_failures(service, repository):
+    """1 つの工場・日付の失敗が他の工場・日付の取り込みとマージに影響しないかを検証"""
+    original = repository.loader.insert_frame.side_effect
+
+    def insert_frame(frame, table_name=None):
+        if (frame["factory"] == "T").any():
+            raise RuntimeError("insert failed")
+        return original(frame, table_name)
+
+    repository.loader.insert_frame.side_effect = insert_frame
+
+    report = service.ingest([
+        ("T", "2024-12-01", wide_frame("T", "2024-12-01", ["A", "B", "C"])),
+        ("H", "2024-12-01", "missing.csv"),
+        ("K", "2024-12-01", wide_frame("K", "2024-12-01", ["A"])),
+    ])
+
+    statuses = {task["factory"]: (task["status"], task["error"]) for task in report["tasks"]}
+    assert statuses["T"] == ("error", "load: insert failed")
+    assert statuses["H"][0] == "error" and statuses["H"][1].startswith("read:")
+    assert statuses["K"] == ("success", None)
+    repository.merge_temp_to_main.assert_called_once_with("2024-12-01", "K")
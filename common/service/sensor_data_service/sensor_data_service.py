@@ -1,4 +1,4 @@
-from typing import List
+from typing import Iterator, List, Optional
 import pandas as pd
 from common.repository.sensor_data_repository import SensorDataRepository,SensorDataDTO
 from common.settings import get_table_name
@@ -36,7 +36,71 @@ class SensorDataService:
 
         return self.repository.fetch_sensor_data(sensor_table, tag_factory_map, date)
 
+    def get_sensor_data_range(self, tag_factory_map: dict, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        指定されたタグと期間に基づいてセンサーデータを取得し、DataFrame 形式で返す。
+
+        :param tag_factory_map: dict, タグと工場コードの辞書 {tag: factory}
+        :param start_date: str, 開始日（YYYY-MM-DD形式、当日を含む）
+        :param end_date: str, 終了日（YYYY-MM-DD形式、当日を含む）
+        :return: pd.DataFrame, センサーデータフレーム
+        """
+        if not tag_factory_map:
+            raise ValueError("Tags and factory codes cannot be empty")
 
+        try:
+            sensor_table = get_table_name("sensor_data_table")
+        except KeyError as e:
+            raise KeyError("Table name for sensor_data_table is not configured") from e
+
+        return self.repository.fetch_sensor_data_range(sensor_table, tag_factory_map, start_date, end_date)
+
+    def iter_sensor_data(self, tag_factory_map: dict, start_date: str, end_date: Optional[str] = None,
+                         batch_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        指定されたタグと期間のセンサーデータを、一定行数ずつの DataFrame で順に返す。
+        工場全体・月単位などの大量データを、全件をメモリに載せずに処理する場合に使用する。
+
+        :param tag_factory_map: dict, タグと工場コードの辞書 {tag: factory}
+        :param start_date: str, 開始日（YYYY-MM-DD形式、当日を含む）
+        :param end_date: Optional[str], 終了日（YYYY-MM-DD形式、当日を含む。省略時は開始日のみ）
+        :param batch_rows: Optional[int], 1 バッチの行数（省略時は設定のメモリ量から決定）
+        :return: Iterator[pd.DataFrame], センサーデータフレームのバッチ
+        """
+        if not tag_factory_map:
+            raise ValueError("Tags and factory codes cannot be empty")
+
+        try:
+            sensor_table = get_table_name("sensor_data_table")
+        except KeyError as e:
+            raise KeyError("Table name for sensor_data_table is not configured") from e
+
+        return self.repository.iter_sensor_data(sensor_table, tag_factory_map, start_date, end_date, batch_rows)
+
+
+    def get_sensor_last_updates(self, tag_factory_map: dict, date: str) -> pd.DataFrame:
+        """
+        センサーデータの最終更新日時を取得する（値は取得しない）。
+
+        :param tag_factory_map: dict, タグと工場コードの辞書 {tag: factory}
+        :param date: str, 対象日（YYYY-MM-DD形式）
+        :return: pd.DataFrame, factory / tag / date / last_update
+        """
+        if not tag_factory_map:
+            raise ValueError("Tags and factory codes cannot be empty")
+        return self.repository.fetch_last_updates(get_table_name("sensor_data_table"), tag_factory_map, date)
+
+    def get_calculation_last_updates(self, tag_factory_map: dict, date: str) -> pd.DataFrame:
+        """
+        計算結果の最終更新日時（前回計算した日時）を取得する。
+
+        :param tag_factory_map: dict, 演算式ID（計算結果のタグ）と工場コードの辞書 {tag: factory}
+        :param date: str, 対象日（YYYY-MM-DD形式）
+        :return: pd.DataFrame, factory / tag / date / last_update
+        """
+        if not tag_factory_map:
+            raise ValueError("Tags and factory codes cannot be empty")
+        return self.repository.fetch_last_updates(get_table_name("calculation_result_table"), tag_factory_map, date)
 
     def save_sensor_data(self, df: pd.DataFrame) -> bool:
         """
@@ -49,11 +113,15 @@ class SensorDataService:
         if df.empty:
             raise ValueError("DataFrame is empty")
         sensor_table = get_table_name("sensor_data_table")
+        # センサーデータの last_update は保存日時（取得したデータの last_update は引き継がない）
+        if "last_update" in df.columns:
+            df = df.drop(columns="last_update")
         return self.repository.save_sensor_data(df, sensor_table)
 
     def save_calculation_result(self, df: pd.DataFrame) -> bool:
         """
         計算結果を保存する。
+        last_update がある場合はその値（入力の最終更新日時）、無い場合は保存日時で保存します。
 
         :param df: pd.DataFrame, 保存する計算結果データ
         :return: bool, 成功した場合 True
@@ -61,6 +129,23 @@ class SensorDataService:
         calc_table = get_table_name("calculation_result_table")
         return self.repository.save_sensor_data(df, calc_table)
 
+    def copy_sensor_data_to_calculation_result(self, tags: Optional[List[str]], start_date: str,
+                                               end_date: Optional[str] = None,
+                                               factories: Optional[List[str]] = None) -> int:
+        """
+        sensor_data テーブルのデータを calculation_result テーブルにコピーする（サーバー側で実行）。
+
+        :param tags: Optional[List[str]], コピー対象のタグリスト（None の場合は全タグ）
+        :param start_date: str, 開始日（YYYY-MM-DD形式、当日を含む）
+        :param end_date: Optional[str], 終了日（YYYY-MM-DD形式、当日を含む。省略時は開始日のみ）
+        :param factories: Optional[List[str]], コピー対象の工場コードのリスト（None の場合は全工場）
+        :return: int, コピーした行数
+        """
+        return self.repository.copy_sensor_data(
+            get_table_name("sensor_data_table"), get_table_name("calculation_result_table"),
+            tags, start_date, end_date, factories
+        )
+
     def delete_sensor_data(self, tags: List[str], date: str) -> bool:
         """
         sensor_data テーブルから指定されたタグと日付に基づいてデータを削除する。
@@ -83,6 +168,18 @@ class SensorDataService:
         calc_table = get_table_name("calculation_result_table")
         return self.repository.delete_sensor_data(calc_table, tags, date)
 
+    def get_sensor_data_long(self, tag_factory_map: dict, date: str) -> pd.DataFrame:
+        """
+        指定されたタグと日付のセンサーデータを縦持ち形式（1 値 1 行）で取得する。
+
+        :param tag_factory_map: dict, タグと工場コードの辞書 {tag: factory}
+        :param date: str, データを取得する対象の日付（YYYY-MM-DD形式）
+        :return: pd.DataFrame, factory / tag / timestamp / channel / value
+        """
+        if not tag_factory_map:
+            raise ValueError("Tags and factory codes cannot be empty")
+        return self.repository.fetch_as_long(get_table_name("sensor_data_table"), tag_factory_map, date)
+
     def get_sensor_data_as_dto(self, tags: List[str], date: str) -> List[SensorDataDTO]:
         """
         指定されたタグと日付に基づいて正規化されたDTO形式でセンサーデータを取得する。
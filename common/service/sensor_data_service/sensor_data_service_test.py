@@ -40,6 +40,66 @@ def test_get_sensor_data(sensor_service, mock_repository):
     pd.testing.assert_frame_equal(result, expected_df)
 
 
+def test_get_sensor_data_range(sensor_service, mock_repository):
+    """get_sensor_data_range の正常系テスト"""
+    tag_factory_map = {'tag1': 'H', 'tag2': 'H'}
+    expected_df = pd.DataFrame({'tag': ['tag1', 'tag2'], 'date': ['2024-12-01', '2024-12-31']})
+    mock_repository.fetch_sensor_data_range.return_value = expected_df
+
+    # メソッドの呼び出し
+    result = sensor_service.get_sensor_data_range(tag_factory_map, '2024-12-01', '2024-12-31')
+
+    # 検証
+    mock_repository.fetch_sensor_data_range.assert_called_once_with(
+        "batch.data_loader_data_load_temp", tag_factory_map, '2024-12-01', '2024-12-31'
+    )
+    pd.testing.assert_frame_equal(result, expected_df)
+
+
+def test_iter_sensor_data(sensor_service, mock_repository):
+    """iter_sensor_data がリポジトリのバッチをそのまま返すかを検証"""
+    tag_factory_map = {'tag1': 'H'}
+    batches = [pd.DataFrame({'tag': ['tag1']}), pd.DataFrame({'tag': ['tag1']})]
+    mock_repository.iter_sensor_data.return_value = iter(batches)
+
+    result = list(sensor_service.iter_sensor_data(tag_factory_map, '2024-12-01', '2024-12-31', batch_rows=1))
+
+    mock_repository.iter_sensor_data.assert_called_once_with(
+        "batch.data_loader_data_load_temp", tag_factory_map, '2024-12-01', '2024-12-31', 1
+    )
+    assert result == batches
+    with pytest.raises(ValueError):
+        sensor_service.iter_sensor_data({}, '2024-12-01')
+
+
+def test_copy_sensor_data_to_calculation_result(sensor_service, mock_repository):
+    """センサーデータテーブルから計算結果テーブルへのコピーが期間・工場付きで委譲されるかを検証"""
+    mock_repository.copy_sensor_data.return_value = 120
+
+    copied = sensor_service.copy_sensor_data_to_calculation_result(None, '2024-12-01', '2024-12-31', ['H'])
+
+    assert copied == 120
+    mock_repository.copy_sensor_data.assert_called_once_with(
+        "batch.data_loader_data_load_temp", "batch.data_processing_calculation_temp",
+        None, '2024-12-01', '2024-12-31', ['H']
+    )
+
+
+def test_get_last_updates(sensor_service, mock_repository):
+    """最終更新日時の取得がセンサーデータ / 計算結果それぞれのテーブルを参照するかを検証"""
+    tag_factory_map = {'tag1': 'H'}
+
+    sensor_service.get_sensor_last_updates(tag_factory_map, '2024-12-06')
+    sensor_service.get_calculation_last_updates(tag_factory_map, '2024-12-06')
+
+    assert [c.args for c in mock_repository.fetch_last_updates.call_args_list] == [
+        ("batch.data_loader_data_load_temp", tag_factory_map, '2024-12-06'),
+        ("batch.data_processing_calculation_temp", tag_factory_map, '2024-12-06'),
+    ]
+    with pytest.raises(ValueError):
+        sensor_service.get_calculation_last_updates({}, '2024-12-06')
+
+
 def test_save_sensor_data(sensor_service, mock_repository):
     """save_sensor_data の正常系テスト"""
     df_to_save = pd.DataFrame({
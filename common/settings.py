@@ -4,7 +4,108 @@ TABLE_NAME_SETTINGS = {
     "sensor_data_table": "batch.data_loader_data_load_temp",
     "calculation_result_table": "batch.data_processing_calculation_temp"
 }
-    
+
+# コンパイル済み演算式キャッシュ（プロセス毎のメモリ上の LRU）
+FORMULA_CACHE_SETTINGS = {
+    "max_size": 4096,
+}
+
+# 演算処理（期間指定の再計算は range_window_days 日ごとに範囲クエリで取得）
+# workers / max_tasks_per_child は formula_runner の既定値（None: CPU 数 / ワーカーを再作成しない）
+FORMULA_PROCESSING_SETTINGS = {
+    "range_window_days": 31,
+    "workers": None,
+    "max_tasks_per_child": None,
+}
+
+# センサーデータ・計算結果の保存方式
+# mode: "bulk"（一時テーブルに fast_executemany で chunk_size 行ずつ投入し、一括で DELETE + INSERT）/ "row"（1 行ずつ保存）
+SENSOR_DATA_SAVE_SETTINGS = {
+    "mode": "bulk",
+    "chunk_size": 5000,
+}
+
+# センサーデータの取得方式（SQL Server の 1 クエリのパラメータ数上限は 2,100）
+# param_chunk_size: 1 回のクエリでパラメータとして渡す (tag, factory) の数（上限 1040）
+# key_table_threshold: (tag, factory) の数がこれを超える場合は一時テーブルとの結合で取得（None: 使わない）
+# fetch_batch_rows: 1 回の fetchmany で取得して型付き配列に変換する行数
+# stream_memory_budget_mb: iter_sensor_data の 1 バッチに使うメモリの目安（バッチの行数はここから決定）
+SENSOR_DATA_FETCH_SETTINGS = {
+    "param_chunk_size": 512,
+    "key_table_threshold": 1000,
+    "fetch_batch_rows": 2000,
+    "stream_memory_budget_mb": 64,
+}
+
+# センサーデータの読み込みキャッシュ（(table, factory, tag, date) 毎の行を LRU で保持）
+# max_bytes: 保持する行の合計バイト数の上限（プロセス毎。formula_runner は CPU 数のプロセスを起動するため、最大でその倍数を使用）
+# revalidate_after_seconds: 前回の確認からこの秒数が経過した行のみ last_update を確認する（0: 毎回確認）
+# 既定は無効。revalidate_after_seconds=0 ではヒットしても毎回 last_update を確認するクエリが発生するため、
+# 同じ工場・日付を繰り返し読み込む場合（対話的な利用・同じ日の再計算）に有効にし、
+# 値の鮮度が数秒～数分遅れてもよい場合は revalidate_after_seconds を大きくすると確認のクエリが減ります。
+SENSOR_DATA_CACHE_SETTINGS = {
+    "enabled": False,
+    "max_bytes": 64 * 1024 * 1024,
+    "revalidate_after_seconds": 0.0,
+}
+
+# 確定済みの日（settle_days 日以上前）のセンサーデータのディスクストア（path が None の場合は無効）
+# revalidate: ディスクの行の last_update をデータベースと照合するか（値カラムは取得しない）
+SENSOR_DATA_DISK_STORE_SETTINGS = {
+    "path": None,
+    "settle_days": 2,
+    "revalidate": True,
+}
+
+# データベース接続プール（enabled が False の場合は操作毎に接続）
+# min_size: 起動時（warm_up）に作成し、idle_timeout でも破棄しない接続数 / max_size: 最大接続数
+# checkout_timeout: 空きを待つ最大秒数 / idle_timeout: 未使用の接続を破棄するまでの秒数
+# max_lifetime: 接続を作成してから破棄するまでの秒数 / health_check_after_seconds: 借りる際に死活確認する未使用秒数
+CONNECTION_POOL_SETTINGS = {
+    "enabled": True,
+    "min_size": 2,
+    "max_size": 10,
+    "checkout_timeout": 30.0,
+    "idle_timeout": 300.0,
+    "max_lifetime": 1800.0,
+    "health_check_after_seconds": 30.0,
+}
+
+# SQLClient のクエリ計測（enabled が False の場合はフックを登録しない）
+# slow_query_seconds: この秒数以上かかったクエリを WARNING で出力 / max_shapes: 集計するクエリの形の上限
+QUERY_INSTRUMENTATION_SETTINGS = {
+    "enabled": True,
+    "slow_query_seconds": 5.0,
+    "max_shapes": 500,
+}
+
+# トランザクション分離レベル（read_uncommitted / read_committed / repeatable_read / snapshot / serializable、None: 既定）
+# snapshot はデータベースの ALLOW_SNAPSHOT_ISOLATION を有効にしてから指定する（SQL/1-スナップショット、トランザクション分離レベル.sql）
+# sensor_data_read: センサーデータの読み込み（BCP の取り込み中も待たずに読めるよう snapshot を想定）
+# formula_data_read: 演算式マスタなどの読み込み
+# track_lock_waits: クエリ計測でロック待ち時間（sys.dm_exec_session_wait_stats の LCK 待ち）を計測するか
+SQL_ISOLATION_SETTINGS = {
+    "sensor_data_read": None,
+    "formula_data_read": None,
+    "track_lock_waits": False,
+}
+
+# データファイルの取り込みテーブルへの投入（SensorDataBulkLoader、bcp の代わり）
+# chunk_rows: 1 チャンクの行数（チャンク毎に commit） / workers: 並列に投入する接続数（CONNECTION_POOL_SETTINGS の max_size 以下）
+# max_pending_chunks: 読み込み済みで投入待ちのチャンク数の上限（None: workers の 2 倍）
+SENSOR_DATA_LOAD_SETTINGS = {
+    "chunk_rows": 5000,
+    "workers": 4,
+    "max_pending_chunks": None,
+}
+
+# 取り込みパイプライン（SensorDataIngestService: 読み込み → クレンジング → 変換 → 投入 → マージ）
+# queue_size: 段の間のキューに溜めるチャンク数の上限（超えると上流の段が待つ） / load_workers: 並列に投入する接続数
+SENSOR_DATA_INGEST_SETTINGS = {
+    "queue_size": 8,
+    "load_workers": 4,
+}
+
 @staticmethod
 def get_table_name(key: str) -> str:
     """
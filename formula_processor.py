@@ -1,17 +1,44 @@
 import pandas as pd
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
-from sympy import sympify, symbols, lambdify
 import numpy as np
+import time
 from common.common import CommonFacade
+from common.formula.formula_cache import FormulaCache
+from common.formula.formula_compiler import get_compiler
+from common.formula.formula_dependency import (
+    affected_formulas, build_reverse_index, find_formula_references, topological_order
+)
+from common.formula.formula_planner import FormulaPlan
+from common.repository.sensor_cube import SensorCube, VALUE_COLUMNS, normalize_dates
+from common.settings import FORMULA_PROCESSING_SETTINGS
+from common.formula.formula_evaluator import EVALUATION_MODES, evaluate_per_hour, evaluate_vectorized
 import re
 
 class DataPocessing:
     """
     SQL出力形式のデータを直接処理する DataPocessingクラス
     """
-    def __init__(self, com: CommonFacade):
+    def __init__(self, com: CommonFacade, evaluation_mode: str = "vectorized", formula_cache: Optional[FormulaCache] = None,
+                 engine: str = "ast", plan_formulas: bool = True):
+        """
+        :param com: CommonFacade, 共通処理
+        :param evaluation_mode: str, 評価方式（"vectorized": 配列一括評価、"per_hour": 従来の時間毎評価）
+        :param formula_cache: Optional[FormulaCache], コンパイル済み演算式キャッシュ（省略時は CommonFacade のもの）
+        :param engine: str, 演算式のコンパイルエンジン（"ast": 組み込みコンパイラ（未対応の式のみ sympy）、"sympy"）
+        :param plan_formulas: bool, 複数演算式の処理で共通部分式・重複した演算式を 1 回だけ計算するか
+                              （engine="ast" かつ evaluation_mode="vectorized" の場合のみ有効）
+        """
+        if evaluation_mode not in EVALUATION_MODES:
+            raise ValueError(f"Unknown evaluation mode: {evaluation_mode}")
+        get_compiler(engine)  # 未知のエンジン名はここで ValueError
         self.com = com
+        self.evaluation_mode = evaluation_mode
+        self.engine = engine
+        self.formula_cache = formula_cache if formula_cache is not None else com.formula_cache
+        self.plan_formulas = plan_formulas and engine == "ast" and evaluation_mode == "vectorized"
+        self._plan_key = None
+        self._plan: Optional[FormulaPlan] = None
 
     def extract_tags_from_formula2(self, formula: str) -> List[str]:
         """
@@ -72,86 +99,12 @@ class DataPocessing:
             # 対象タグのデータフィルタリング
             relevant_data = sql_data[sql_data["tag"].isin(tags)]
 
-            # タグをプレースホルダーに変換
-            converted_formula = formula
-            tag_map = {}
-
-            for i, tag in enumerate(tags):
-                symbol_name = f"VAR_{i}"  # 変換用シンボル
-                tag_map[symbol_name] = tag
-                converted_formula = converted_formula.replace(tag, symbol_name)
-
-            # sympyで式を解釈
-            formula_expr = sympify(converted_formula, locals={k: symbols(k) for k in tag_map.keys()})
+            # コンパイル済み演算式を取得（キャッシュに無ければコンパイル）
+            formula_func = self.formula_cache.get(formula, tags, engine=self.engine).func
 
-            tag_symbols = [symbols(f"VAR_{i}") for i in range(len(tags))]  # プレースホルダーで順序を明示
-            formula_func = lambdify(tag_symbols, formula_expr, modules="numpy")
-
-            # コンテキストデータを NumPy 配列として構築
-            context = {
-                tag: {
-                    f"d{i}": relevant_data.loc[relevant_data["tag"] == tag, [f"d{i}_{j}" for j in range(30)]].to_numpy().flatten()
-                    for i in range(4)
-                }
-                for tag in tags
-            }
-
-            # 計算結果のリスト
-            results = []
-
-            # グループ単位で計算を実行
-            for (factory, date), group in relevant_data.groupby(["factory", "date"]):
-                try:
-                    d1_data = np.vstack([context[tag]["d1"] for tag in tags]).T
-                    d2_data = np.vstack([context[tag]["d2"] for tag in tags]).T
-                    d3_data = np.vstack([context[tag]["d3"] for tag in tags]).T
-                    d0_data = np.vstack([context[tag]["d0"] for tag in tags]).T
-
-                    d1_results, d2_results, d3_results, assurances = [], [], [], []
-                    for i in range(30):
-                        try:
-                            with np.errstate(divide='raise', invalid='raise'):
-                                d1_result = round(formula_func(*d1_data[i]), 1)
-                                d2_result = round(formula_func(*d2_data[i]), 1)
-                                d3_result = round(formula_func(*d3_data[i]), 1)
-                                assurance = int(np.all(d0_data[i] == 1))
-                                d1_results.append(d1_result)
-                                d2_results.append(d2_result)
-                                d3_results.append(d3_result)
-                                assurances.append(assurance)
-                        except (FloatingPointError, ZeroDivisionError, ValueError):
-                            d1_results.append(None)
-                            d2_results.append(None)
-                            d3_results.append(None)
-                            assurances.append(2)
-                        except Exception as e:
-                            self.com.logger.error(f"Unexpected error at index {i}: {e}")
-                            d1_results.append(None)
-                            d2_results.append(None)
-                            d3_results.append(None)
-                            assurances.append(2)
-
-                    # 結果をリストに保存
-                    results.append(
-                        [factory, date, formula_id, formula_id, formula_id, sensor_name, group.iloc[0]["unit"], group.iloc[0]["data_division"]] +
-                        d1_results + d2_results + d3_results + assurances
-                    )
-                except Exception as e:
-                    self.com.logger.error(f"Error for group {factory}, {date}: {e}")
-                    continue
-
-            # プレースホルダーを元のタグに戻す
-            for result in results:
-                for key, original_tag in tag_map.items():
-                    result[2] = result[2].replace(key, original_tag)  # tag列
-                    result[3] = result[3].replace(key, original_tag)  # local_tag列
-                    result[4] = result[4].replace(key, original_tag)  # local_id列
-
-            # DataFrameに変換
-            columns = ["factory", "date", "tag", "local_tag", "local_id", "name", "unit", "data_division"] + \
-                    [f"d1_{i}" for i in range(30)] + [f"d2_{i}" for i in range(30)] + \
-                    [f"d3_{i}" for i in range(30)] + [f"d0_{i}" for i in range(30)]
-            result_df = pd.DataFrame(results, columns=columns)
+            # 対象データをキューブ化し、全 (工場, 日付) をまとめて評価
+            cube = SensorCube.from_frame(relevant_data)
+            result_df = self.calculate_on_cube(cube, formula_func, tags, formula_id, sensor_name)
 
             self.com.logger.info("Calculation with data assurance codes completed successfully.")
             return result_df
@@ -160,6 +113,78 @@ class DataPocessing:
             self.com.logger.error(f"Error in calculation with data assurance codes: {e}")
             raise
 
+    def calculate_on_cube(self, cube: SensorCube, formula_func, tags: List[str], formula_id: str, sensor_name: str,
+                          keep_in_cube: bool = False) -> pd.DataFrame:
+        """
+        キューブ上の全 (工場, 日付) に対して演算式を評価し、計算結果テーブル形式の DataFrame を返します。
+
+        :param cube: SensorCube, 入力センサーデータ
+        :param formula_func: Callable, タグ順に配列を受け取る演算関数
+        :param tags: List[str], 演算式の入力タグ（formula_func の引数順）
+        :param formula_id: str, 演算式ID（結果の tag / local_tag / local_id）
+        :param sensor_name: str, 仮想センサー名
+        :param keep_in_cube: bool, 計算結果を formula_id のタグとしてキューブに追加するか（他の演算式から参照する場合）
+        :return: pd.DataFrame, 計算結果
+        """
+        missing_tags = [tag for tag in tags if not cube.has_tag(tag)]
+        if missing_tags:
+            raise ValueError(f"Data missing for variables: {missing_tags}")
+
+        available = cube.has_tags(tags)
+        for f, d in zip(*np.nonzero(~available)):
+            self.com.logger.error(f"Error for group {cube.factories[f]}, {cube.dates[d]}: missing input tags.")
+        factory_idx, date_idx = np.nonzero(available)
+
+        # タグ毎の (factory, date, hour, channel) ビュー
+        blocks = [cube.tag_block(tag) for tag in tags]
+        if self.evaluation_mode == "vectorized":
+            result_values, assurance_codes = evaluate_vectorized(
+                formula_func, [b[..., 1:] for b in blocks], [b[..., 0] for b in blocks]
+            )
+            result_values = result_values[factory_idx, date_idx]
+            assurance_codes = assurance_codes[factory_idx, date_idx]
+        else:
+            group_blocks = [b[factory_idx, date_idx] for b in blocks]
+            result_values, assurance_codes = evaluate_per_hour(
+                formula_func, [b[..., 1:] for b in group_blocks], [b[..., 0] for b in group_blocks], logger=self.com.logger
+            )
+
+        result_df = self._build_result_frame(cube, factory_idx, date_idx, tags, result_values, assurance_codes,
+                                             formula_id, sensor_name)
+        if keep_in_cube:
+            cube.add_tag(formula_id, factory_idx, date_idx, result_values, assurance_codes,
+                         meta=result_df[["factory", "date", "tag", "unit", "data_division"]])
+        return result_df
+
+    def _build_result_frame(self, cube: SensorCube, factory_idx: np.ndarray, date_idx: np.ndarray, tags: List[str],
+                            result_values: np.ndarray, assurance_codes: np.ndarray, formula_id: str, sensor_name: str) -> pd.DataFrame:
+        """
+        評価結果の配列を計算結果テーブルのカラム構成に並べます。
+        unit / data_division は各グループ先頭の入力行から引き継ぎます。
+        """
+        factories = np.asarray(cube.factories, dtype=object)[factory_idx]
+        dates = np.asarray(cube.dates, dtype=object)[date_idx]
+
+        meta = cube.meta[cube.meta["tag"].isin(tags)].drop_duplicates(["factory", "date"]).set_index(["factory", "date"])
+        group_meta = meta.reindex(pd.MultiIndex.from_arrays([factories, dates]))
+
+        header = pd.DataFrame({
+            "factory": factories,
+            "date": dates,
+            "tag": formula_id,
+            "local_tag": formula_id,
+            "local_id": formula_id,
+            "name": sensor_name,
+            "unit": group_meta["unit"].to_numpy(),
+            "data_division": group_meta["data_division"].to_numpy(),
+        })
+        values = pd.DataFrame(
+            result_values.transpose(0, 2, 1).reshape(len(factory_idx), -1),
+            columns=[f"d{c}_{i}" for c in (1, 2, 3) for i in range(30)],
+        )
+        assurances = pd.DataFrame(assurance_codes, columns=[f"d0_{i}" for i in range(30)])
+        return pd.concat([header, values, assurances], axis=1)
+
     def process_formula(self, factory_cd: str, formula_id: str, target_date: str):
         try:
             formula_data = self.com.formula_data_service.get_formula_by_id(formula_id)
@@ -201,13 +226,430 @@ class DataPocessing:
         except Exception as e:
             self.com.logger.error(f"Error in process_formula: {e}")
 
+    def load_formula_set(self, formula_ids: Optional[List[str]] = None) -> Tuple[Dict[str, dict], Dict[str, str]]:
+        """
+        演算式マスタをまとめて取得し、入力タグと演算式間の依存関係を抽出します。
+
+        演算式中に他の演算式ID（計算済みタグ）がある場合はその演算式に依存するものとし、
+        指定外の依存先も含めて依存先が先になる順（トポロジカル順）に並べます。
+        指定外の依存先は "requested": False となり、計算結果はメモリ上でのみ参照されます（保存しません）。
+        循環依存・依存先の不備がある演算式は failed に記録します。
+
+        :param formula_ids: Optional[List[str]], 対象の演算式ID（None の場合は全件）
+        :return: Tuple[dict, dict], ({formula_id: {"formula", "sensor_name", "tags", "dependencies", "requested"}},
+                                     {formula_id: エラー内容})
+        """
+        all_formulas = self.com.formula_data_service.list_all_formulas()
+        target_ids = list(all_formulas) if formula_ids is None else list(dict.fromkeys(formula_ids))
+        requested = set(target_ids)
+
+        loaded, failed = {}, {}
+        pending = list(target_ids)
+        while pending:
+            formula_id = pending.pop(0)
+            if formula_id in loaded or formula_id in failed:
+                continue
+            formula_data = all_formulas.get(formula_id)
+            if not formula_data or not isinstance(formula_data, dict):
+                failed[formula_id] = f"Formula ID {formula_id} not found or invalid format."
+                continue
+            formula = formula_data.get("formula")
+            sensor_name = formula_data.get("sensor_name")
+            if not formula or not sensor_name:
+                failed[formula_id] = f"Formula or sensor name is missing for ID {formula_id}."
+                continue
+            dependencies = find_formula_references(formula, all_formulas)
+            loaded[formula_id] = {
+                "formula": formula,
+                "sensor_name": sensor_name,
+                "tags": list(dict.fromkeys(self.extract_tags_from_formula(formula) + dependencies)),
+                "dependencies": dependencies,
+                "requested": formula_id in requested,
+            }
+            pending.extend(dependencies)
+
+        order, cyclic = topological_order({formula_id: item["dependencies"] for formula_id, item in loaded.items()})
+        failed.update(cyclic)
+        formula_set = {}
+        for formula_id in order:
+            item = loaded[formula_id]
+            failed_dependencies = [dep for dep in item["dependencies"] if dep in failed]
+            if failed_dependencies:
+                failed[formula_id] = f"Dependency failed: {failed_dependencies}"
+                continue
+            formula_set[formula_id] = item
+
+        # 指定外の依存先のエラーは、それを参照する演算式のエラーとして記録する
+        failed = {formula_id: message for formula_id, message in failed.items() if formula_id in requested}
+        for formula_id, message in failed.items():
+            self.com.logger.error(message)
+        return formula_set, failed
+
+    @staticmethod
+    def sensor_tags(formula_set: Dict[str, dict]) -> List[str]:
+        """演算式の集合の入力タグのうち、センサーデータとして取得するもの（計算済みタグ以外）を返します。"""
+        return list(dict.fromkeys(
+            tag for item in formula_set.values() for tag in item["tags"] if tag not in item["dependencies"]
+        ))
+
+    def _evaluate_formula_set(self, sql_data: pd.DataFrame, formula_set: Dict[str, dict], summary: dict,
+                              fetched_at: Optional[pd.Timestamp] = None) -> List[pd.DataFrame]:
+        """
+        取得済みのセンサーデータに対して演算式をまとめて評価します（formula_set は依存先が先になる順）。
+        他の演算式から参照される計算結果はキューブに追加し、以降の演算式の入力にします。
+        計算結果の last_update は入力の最終更新日時です（_stamp_last_update、fetched_at は入力に無い場合の値）。
+        1 つの演算式のエラーはその演算式（と依存する演算式）のみ失敗として summary に記録し、他の演算式の処理は継続します。
+        """
+        timings = summary["timings"]
+        cube = SensorCube.from_frame(sql_data)
+        # 欠損値を含むタグ（そのタグを使う演算式のみエラーにする）
+        null_tags = set(sql_data.loc[sql_data[VALUE_COLUMNS].isnull().any(axis=1), "tag"])
+        referenced = {dep for item in formula_set.values() for dep in item["dependencies"]}
+        input_tags = self._input_tags(formula_set)
+        fetched_at = fetched_at if fetched_at is not None else pd.Timestamp.now()
+
+        evaluation = None
+        if self.plan_formulas:
+            started = time.perf_counter()
+            plan = self.get_formula_plan(formula_set)
+            timings["compile"] += time.perf_counter() - started
+            evaluation = plan.evaluate({tag: cube.tag_block(tag)[..., 1:] for tag in cube.tags})
+
+        results = []
+        dependency_errors = {}
+        for formula_id, item in formula_set.items():
+            try:
+                tags = item["tags"]
+                failed_dependencies = [dep for dep in item["dependencies"] if dep in dependency_errors]
+                if failed_dependencies:
+                    raise ValueError(f"Dependency failed: {failed_dependencies}")
+                missing_value_tags = [tag for tag in tags if tag in null_tags]
+                if missing_value_tags:
+                    raise ValueError(f"Data contains missing values for variables: {missing_value_tags}")
+
+                started = time.perf_counter()
+                if evaluation is not None and formula_id in evaluation.plan.outputs:
+                    # 共通部分式・重複した演算式の計算結果を再利用する
+                    formula_func = lambda *_, formula_id=formula_id: evaluation.result(formula_id)
+                else:
+                    formula_func = self.formula_cache.get(item["formula"], tags, engine=self.engine).func
+                compiled = time.perf_counter()
+                result = self.calculate_on_cube(cube, formula_func, tags, formula_id, item["sensor_name"],
+                                                keep_in_cube=formula_id in referenced)
+                timings["compile"] += compiled - started
+                timings["evaluate"] += time.perf_counter() - compiled
+                if evaluation is not None and formula_id in referenced:
+                    evaluation.add_values(formula_id, cube.tag_block(formula_id)[..., 1:])
+
+                if result.empty:
+                    raise ValueError(f"No data processed for formula ID {formula_id}.")
+                if item["requested"]:
+                    results.append(self._stamp_last_update(result, sql_data, input_tags[formula_id], fetched_at))
+                    summary["succeeded"].append(formula_id)
+            except Exception as e:
+                self.com.logger.error(f"Error in formula {formula_id}: {e}")
+                dependency_errors[formula_id] = str(e)
+                if item["requested"]:
+                    summary["failed"][formula_id] = str(e)
+        return results
+
+    def get_formula_plan(self, formula_set: Dict[str, dict]) -> FormulaPlan:
+        """
+        演算式の集合の計算計画を返します（同じ演算式の集合では前回の計画を再利用します）。
+        """
+        plan_key = tuple((formula_id, item["formula"], tuple(item["tags"])) for formula_id, item in formula_set.items())
+        if plan_key != self._plan_key:
+            self._plan = FormulaPlan.build(formula_set)
+            self._plan_key = plan_key
+            self.com.logger.info(f"Formula plan built: {self._plan.stats()}")
+        return self._plan
+
+    @staticmethod
+    def _input_tags(formula_set: Dict[str, dict]) -> Dict[str, set]:
+        """演算式毎の入力タグ（依存先の演算式の入力タグを含む、計算済みタグ以外）を返します。"""
+        input_tags = {}
+        for formula_id, item in formula_set.items():
+            tags = {tag for tag in item["tags"] if tag not in item["dependencies"]}
+            for dependency in item["dependencies"]:
+                tags |= input_tags.get(dependency, set())
+            input_tags[formula_id] = tags
+        return input_tags
+
+    @staticmethod
+    def _stamp_last_update(result: pd.DataFrame, sql_data: pd.DataFrame, tags: set, fetched_at: pd.Timestamp) -> pd.DataFrame:
+        """
+        計算結果の last_update に、日付毎の入力の最終更新日時（サーバーの日時）の最大値を設定します。
+
+        保存日時にすると、取得後・保存前に更新された入力が差分計算（select_dirty_formulas）で検出されないためです。
+        入力に last_update が無い場合は取得を開始した日時を設定します。
+        """
+        stamps = pd.Series(pd.NaT, index=result.index, dtype="datetime64[ns]")
+        if "last_update" in sql_data.columns and not sql_data.empty:
+            inputs = sql_data[sql_data["tag"].isin(tags)]
+            latest = pd.to_datetime(inputs["last_update"]).groupby(normalize_dates(inputs["date"]).to_numpy()).max()
+            stamps = pd.Series(normalize_dates(result["date"]).map(latest).to_numpy(), index=result.index)
+        result["last_update"] = pd.to_datetime(stamps).fillna(fetched_at)
+        return result
+
+    @staticmethod
+    def _latest_updates(df: pd.DataFrame) -> Dict[str, pd.Timestamp]:
+        """fetch_last_updates の結果から、タグ毎の最終更新日時を返します。"""
+        if df.empty:
+            return {}
+        last_updates = pd.to_datetime(df["last_update"])
+        return last_updates.groupby(df["tag"]).max().dropna().to_dict()
+
+    def select_dirty_formulas(self, factory_cd: str, target_date: str,
+                              formula_set: Dict[str, dict]) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        前回の計算以降に入力が更新された演算式のみを残します（差分計算）。
+
+        入力タグ → 演算式の逆引きインデックスで更新されたタグの影響を受ける演算式を絞り込み、
+        入力（依存先の入力を含む）の last_update が計算結果の last_update より新しいものを再計算対象とします。
+        計算結果がない演算式は常に再計算対象です。
+        演算式の内容の変更は検出できないため、演算式を修正した場合は差分計算を使わずに処理してください。
+
+        :param factory_cd: str, 工場コード
+        :param target_date: str, 対象日（YYYY-MM-DD形式）
+        :param formula_set: Dict[str, dict], load_formula_set の結果
+        :return: Tuple[dict, list], (再計算に必要な formula_set（依存先を含む）, スキップする演算式ID)
+        """
+        requested_ids = [formula_id for formula_id, item in formula_set.items() if item["requested"]]
+        sensor_tags = self.sensor_tags(formula_set)
+        input_updates = self._latest_updates(
+            self.com.sensor_data_service.get_sensor_last_updates({tag: factory_cd for tag in sensor_tags}, target_date)
+        ) if sensor_tags else {}
+        computed_at = self._latest_updates(
+            self.com.sensor_data_service.get_calculation_last_updates(
+                {formula_id: factory_cd for formula_id in requested_ids}, target_date
+            )
+        ) if requested_ids else {}
+
+        # 依存先の入力を含めた、演算式の入力の最終更新日時（formula_set は依存先が先になる順）
+        effective_updates = {}
+        for formula_id, item in formula_set.items():
+            updates = [input_updates[tag] for tag in item["tags"] if tag in input_updates]
+            updates += [effective_updates[dep] for dep in item["dependencies"] if effective_updates.get(dep) is not None]
+            effective_updates[formula_id] = max(updates) if updates else None
+
+        dirty = {formula_id for formula_id in requested_ids if formula_id not in computed_at}
+        if computed_at:
+            oldest = min(computed_at.values())
+            changed_tags = [tag for tag, updated in input_updates.items() if updated > oldest]
+            for formula_id in affected_formulas(build_reverse_index(formula_set), changed_tags):
+                updated = effective_updates.get(formula_id)
+                if formula_id in computed_at and updated is not None and updated > computed_at[formula_id]:
+                    dirty.add(formula_id)
+
+        # 再計算する演算式の依存先（逆順にたどる）
+        needed = set(dirty)
+        for formula_id in reversed(list(formula_set)):
+            if formula_id in needed:
+                needed.update(formula_set[formula_id]["dependencies"])
+        dirty_set = {
+            formula_id: dict(item, requested=item["requested"] and formula_id in dirty)
+            for formula_id, item in formula_set.items() if formula_id in needed
+        }
+        skipped = [formula_id for formula_id in requested_ids if formula_id not in dirty]
+        return dirty_set, skipped
+
+    def process_formulas(self, factory_cd: str, target_date: str, formula_ids: Optional[List[str]] = None,
+                         incremental: bool = False) -> dict:
+        """
+        工場・日付単位で複数の演算式をまとめて処理します。
+
+        演算式マスタを一括取得して入力タグの和集合を 1 回で取得し、全演算式を評価した後、
+        計算結果を 1 回の保存処理で書き込みます。
+        incremental=True の場合は、前回の計算以降に入力が更新された演算式のみ処理します（select_dirty_formulas）。
+
+        :param factory_cd: str, 工場コード
+        :param target_date: str, 対象日（YYYY-MM-DD形式）
+        :param formula_ids: Optional[List[str]], 対象の演算式ID（None の場合は全件）
+        :param incremental: bool, 差分計算を行うか
+        :return: dict, {"succeeded": [formula_id], "failed": {formula_id: エラー内容}, "skipped": [formula_id],
+                        "rows": 保存行数, "timings": 処理時間}
+        """
+        summary = {
+            "succeeded": [],
+            "failed": {},
+            "skipped": [],
+            "rows": 0,
+            "timings": {"fetch": 0.0, "compile": 0.0, "evaluate": 0.0, "save": 0.0},
+        }
+        timings = summary["timings"]
+        formula_set = {}
+        try:
+            formula_set, summary["failed"] = self.load_formula_set(formula_ids)
+            if not formula_set:
+                self.com.logger.warning(f"No formulas to process for {factory_cd} on {target_date}.")
+                return summary
+
+            if incremental:
+                started = time.perf_counter()
+                formula_set, summary["skipped"] = self.select_dirty_formulas(factory_cd, target_date, formula_set)
+                timings["fetch"] += time.perf_counter() - started
+                self.com.logger.info(
+                    f"Incremental run for {factory_cd} on {target_date}: "
+                    f"{len(summary['skipped'])} formulas up to date."
+                )
+                if not formula_set:
+                    return summary
+
+            all_tags = self.sensor_tags(formula_set)
+            started = time.perf_counter()
+            fetched_at = pd.Timestamp.now()
+            sql_data = self.com.sensor_data_service.get_sensor_data({tag: factory_cd for tag in all_tags}, target_date)
+            timings["fetch"] += time.perf_counter() - started
+            self.com.logger.info(f"Sensor data retrieved for {len(all_tags)} tags.")
+
+            results = self._evaluate_formula_set(sql_data, formula_set, summary, fetched_at)
+            if results:
+                result_data = pd.concat(results, ignore_index=True)
+                started = time.perf_counter()
+                success = self.com.formula_data_service.save_calculation_results(result_data)
+                timings["save"] += time.perf_counter() - started
+                if not success:
+                    raise RuntimeError(f"Failed to save results for {factory_cd} on {target_date}.")
+                summary["rows"] = len(result_data)
+
+        except Exception as e:
+            # 取得・保存の失敗は未完了の全演算式に影響する
+            self.com.logger.error(f"Error in process_formulas: {e}")
+            requested_ids = [formula_id for formula_id, item in formula_set.items() if item["requested"]]
+            for formula_id in requested_ids or formula_ids or []:
+                summary["failed"].setdefault(formula_id, str(e))
+            summary["succeeded"] = []
+            summary["rows"] = 0
+
+        self.com.logger.info(
+            f"Processed formulas for {factory_cd} on {target_date}: "
+            f"{len(summary['succeeded'])} succeeded, {len(summary['failed'])} failed, {len(summary['skipped'])} skipped."
+        )
+        return summary
+
+    @staticmethod
+    def _date_windows(start_date: str, end_date: str, window_days: int) -> List[Tuple[str, str]]:
+        """
+        期間を window_days 日ごとの (開始日, 終了日) に分割します（両端を含む）。
+        """
+        if window_days <= 0:
+            raise ValueError("window_days must be a positive integer")
+        dates = pd.date_range(start_date, end_date, freq="D")
+        if dates.empty:
+            raise ValueError(f"start_date {start_date} must be on or before end_date {end_date}.")
+        return [
+            (dates[i].strftime("%Y-%m-%d"), dates[min(i + window_days, len(dates)) - 1].strftime("%Y-%m-%d"))
+            for i in range(0, len(dates), window_days)
+        ]
+
+    def process_formula_range(self, factory_cd: str, formula_id: str, start_date: str, end_date: str,
+                              window_days: Optional[int] = None) -> dict:
+        """
+        期間内の全日付に対して 1 つの演算式をまとめて処理します（再計算・バックフィル用）。
+
+        期間を window_days 日ごとの範囲クエリで取得し、日付軸を含むキューブ上で一括評価した後、
+        全期間の計算結果を 1 回の保存処理で書き込みます。
+        他の演算式を参照している場合は、依存先もメモリ上で計算します（依存先の結果は保存しません）。
+        入力データが欠けている・欠損値を含む日付は failed に記録し、他の日付の処理は継続します。
+
+        :param factory_cd: str, 工場コード
+        :param formula_id: str, 演算式ID
+        :param start_date: str, 開始日（YYYY-MM-DD形式、当日を含む）
+        :param end_date: str, 終了日（YYYY-MM-DD形式、当日を含む）
+        :param window_days: Optional[int], 1 回のクエリで取得する日数（省略時は設定値）
+        :return: dict, {"succeeded": [date], "failed": {date: エラー内容}, "rows": 保存行数, "timings": 処理時間}
+        """
+        summary = {
+            "succeeded": [],
+            "failed": {},
+            "rows": 0,
+            "timings": {"fetch": 0.0, "compile": 0.0, "evaluate": 0.0, "save": 0.0},
+        }
+        timings = summary["timings"]
+        window_days = window_days or FORMULA_PROCESSING_SETTINGS["range_window_days"]
+        try:
+            windows = self._date_windows(start_date, end_date, window_days)
+            formula_set, failed = self.load_formula_set([formula_id])
+            if failed:
+                raise ValueError(failed[formula_id])
+            tag_factory_map = {tag: factory_cd for tag in self.sensor_tags(formula_set)}
+            input_tags = self._input_tags(formula_set)[formula_id]
+
+            # 依存先を含めて評価順にコンパイル（対象の演算式は最後）
+            started = time.perf_counter()
+            formula_funcs = {
+                fid: self.formula_cache.get(item["formula"], item["tags"], engine=self.engine).func
+                for fid, item in formula_set.items()
+            }
+            timings["compile"] += time.perf_counter() - started
+
+            results = []
+            for window_start, window_end in windows:
+                window_dates = pd.date_range(window_start, window_end, freq="D").strftime("%Y-%m-%d").tolist()
+                try:
+                    started = time.perf_counter()
+                    fetched_at = pd.Timestamp.now()
+                    sql_data = self.com.sensor_data_service.get_sensor_data_range(tag_factory_map, window_start, window_end)
+                    timings["fetch"] += time.perf_counter() - started
+                    if sql_data.empty:
+                        raise ValueError(f"No sensor data between {window_start} and {window_end}.")
+
+                    # 欠損値を含む日付のみ除外する
+                    null_rows = sql_data[VALUE_COLUMNS].isnull().any(axis=1)
+                    null_dates = set(normalize_dates(sql_data.loc[null_rows, "date"]))
+                    for date in sorted(null_dates):
+                        summary["failed"][date] = f"Data contains missing values on {date}."
+
+                    started = time.perf_counter()
+                    cube = SensorCube.from_frame(sql_data)
+                    for fid, item in formula_set.items():
+                        result = self.calculate_on_cube(cube, formula_funcs[fid], item["tags"], fid, item["sensor_name"],
+                                                        keep_in_cube=fid != formula_id)
+                    timings["evaluate"] += time.perf_counter() - started
+                    result = result[~result["date"].isin(null_dates)]
+                    result = self._stamp_last_update(result.copy(), sql_data, input_tags, fetched_at)
+
+                    processed = set(result["date"])
+                    for date in window_dates:
+                        if date in processed:
+                            summary["succeeded"].append(date)
+                        else:
+                            summary["failed"].setdefault(date, f"Input data missing on {date}.")
+                    results.append(result)
+                except Exception as e:
+                    self.com.logger.error(f"Error in formula {formula_id} between {window_start} and {window_end}: {e}")
+                    for date in window_dates:
+                        summary["failed"].setdefault(date, str(e))
+
+            if summary["succeeded"]:
+                result_data = pd.concat(results, ignore_index=True)
+                started = time.perf_counter()
+                success = self.com.formula_data_service.save_calculation_results(result_data)
+                timings["save"] += time.perf_counter() - started
+                if not success:
+                    raise RuntimeError(f"Failed to save results for formula ID {formula_id}.")
+                summary["rows"] = len(result_data)
+
+        except Exception as e:
+            # 演算式の取得・保存の失敗は期間内の全日付に影響する
+            self.com.logger.error(f"Error in process_formula_range: {e}")
+            try:
+                all_dates = pd.date_range(start_date, end_date, freq="D").strftime("%Y-%m-%d").tolist()
+            except Exception:
+                all_dates = []
+            for date in all_dates or [start_date]:
+                summary["failed"].setdefault(date, str(e))
+            summary["succeeded"] = []
+            summary["rows"] = 0
+
+        self.com.logger.info(
+            f"Processed formula {formula_id} for {factory_cd} from {start_date} to {end_date}: "
+            f"{len(summary['succeeded'])} dates succeeded, {len(summary['failed'])} failed."
+        )
+        return summary
+
 if __name__ == "__main__":
     # 実行例
     com = CommonFacade()
     processor = DataPocessing(com)
-    processor.process_formula("H","H1","2024-12-20")
-    processor.process_formula("H","H2","2024-12-20")
-    processor.process_formula("H","H3","2024-12-20")
-    processor.process_formula("H","H4","2024-12-20")
-    processor.process_formula("H","H5","2024-12-20")
-    processor.process_formula("H","H6","2024-12-20")
+    processor.process_formulas("H", "2024-12-20", ["H1", "H2", "H3", "H4", "H5", "H6"])
@@ -0,0 +1,249 @@
+import pandas as pd
+import pytest
+
+from common.formula.formula_cache import FormulaCache
+from formula_processor import DataPocessing
+
+FORMULAS = {
+    "H1": {"formula": "1D1 + 1D2", "sensor_name": "Sum"},
+    "H2": {"formula": "H1 * 2", "sensor_name": "Double"},
+    "H3": {"formula": "1D3 / 1D1", "sensor_name": "Ratio"},
+    "H4": {"formula": "1D9 + 1D1", "sensor_name": "Missing"},
+    "H5": {"formula": "1D4 - 1D1", "sensor_name": "Null"},
+}
+
+
+def sensor_rows(values: dict, date: str = "2024-12-01", factory: str = "H", last_update=None) -> pd.DataFrame:
+    """タグ毎に全ての時間・チャネルが同じ値のセンサーデータ（保証コードは 1）"""
+    rows = []
+    for tag, value in values.items():
+        row = {"factory": factory, "tag": tag, "date": date, "local_tag": tag, "local_id": tag, "name": tag,
+               "unit": "kW", "data_division": 1}
+        row.update({f"d0_{i}": 1 for i in range(30)})
+        row.update({f"d{c}_{i}": value for c in (1, 2, 3) for i in range(30)})
+        row["last_update"] = pd.Timestamp(last_update[tag]) if last_update else pd.Timestamp("2024-12-01 10:00")
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def facade(mocker):
+    com = mocker.Mock()
+    com.formula_cache = FormulaCache()
+    com.formula_data_service.list_all_formulas.return_value = FORMULAS
+    com.formula_data_service.save_calculation_results.return_value = True
+    return com
+
+
+@pytest.fixture
+def processor(facade):
+    return DataPocessing(facade)
+
+
+def saved_frame(facade) -> pd.DataFrame:
+    return facade.formula_data_service.save_calculation_results.call_args.args[0]
+
+
+def test_results_are_stamped_with_input_last_update(facade, processor):
+    """計算結果の last_update が保存日時ではなく、入力（依存先の入力を含む）の最終更新日時の最大値になるかを検証"""
+    facade.sensor_data_service.get_sensor_data.return_value = sensor_rows(
+        {"1D1": 1.0, "1D2": 2.0, "1D3": 3.0},
+        last_update={"1D1": "2024-12-01 10:00", "1D2": "2024-12-01 11:00", "1D3": "2024-12-01 09:00"},
+    )
+
+    processor.process_formulas("H", "2024-12-01", ["H2", "H3"])
+
+    stamps = saved_frame(facade).set_index("tag")["last_update"]
+    assert stamps["H2"] == pd.Timestamp("2024-12-01 11:00")
+    assert stamps["H3"] == pd.Timestamp("2024-12-01 10:00")
+
+
+def test_input_updated_after_fetch_is_dirty(facade, processor):
+    """取得後・保存前に更新された入力は、次の差分計算で再計算対象になるかを検証"""
+    facade.sensor_data_service.get_sensor_data.return_value = sensor_rows(
+        {"1D1": 1.0, "1D2": 2.0}, last_update={"1D1": "2024-12-01 10:00", "1D2": "2024-12-01 10:00"},
+    )
+    processor.process_formulas("H", "2024-12-01", ["H1"])
+    computed_at = saved_frame(facade)["last_update"].iloc[0]
+
+    # 保存より前の時刻（保存日時で記録していた場合は検出できない更新）
+    facade.sensor_data_service.get_sensor_last_updates.return_value = pd.DataFrame({
+        "factory": ["H", "H"], "tag": ["1D1", "1D2"], "date": ["2024-12-01"] * 2,
+        "last_update": [pd.Timestamp("2024-12-01 10:00:01"), pd.Timestamp("2024-12-01 10:00")],
+    })
+    facade.sensor_data_service.get_calculation_last_updates.return_value = pd.DataFrame({
+        "factory": ["H"], "tag": ["H1"], "date": ["2024-12-01"], "last_update": [computed_at],
+    })
+    formula_set, _ = processor.load_formula_set(["H1"])
+
+    dirty_set, skipped = processor.select_dirty_formulas("H", "2024-12-01", formula_set)
+
+    assert computed_at < pd.Timestamp.now()
+    assert list(dirty_set) == ["H1"] and skipped == []
+
+
+def test_process_formulas_fetches_once_and_saves_once(facade, processor):
+    """入力タグの和集合を 1 回で取得し、全演算式の計算結果を 1 回で保存するかを検証"""
+    facade.sensor_data_service.get_sensor_data.return_value = sensor_rows({"1D1": 1.0, "1D2": 2.0, "1D3": 3.0})
+
+    summary = processor.process_formulas("H", "2024-12-01", ["H1", "H3"])
+
+    facade.sensor_data_service.get_sensor_data.assert_called_once_with(
+        {"1D1": "H", "1D2": "H", "1D3": "H"}, "2024-12-01"
+    )
+    facade.formula_data_service.save_calculation_results.assert_called_once()
+    saved = saved_frame(facade).set_index("tag")
+    assert saved.loc["H1", "d1_0"] == 3.0 and saved.loc["H1", "d3_29"] == 3.0
+    assert saved.loc["H3", "d2_5"] == 3.0
+    assert (saved.loc["H1", "factory"], saved.loc["H1", "date"], saved.loc["H1", "name"]) == ("H", "2024-12-01", "Sum")
+    assert summary["succeeded"] == ["H1", "H3"] and summary["failed"] == {} and summary["rows"] == 2
+
+
+def test_process_formulas_isolates_formula_failures(facade, processor):
+    """入力が無い・欠損値を含む演算式のみ失敗し、他の演算式の計算結果は保存されるかを検証"""
+    sql_data = sensor_rows({"1D1": 1.0, "1D2": 2.0, "1D4": 4.0})
+    sql_data.loc[sql_data["tag"] == "1D4", "d1_3"] = None
+    facade.sensor_data_service.get_sensor_data.return_value = sql_data
+
+    summary = processor.process_formulas("H", "2024-12-01", ["H1", "H4", "H5", "H9"])
+
+    assert summary["succeeded"] == ["H1"]
+    assert set(summary["failed"]) == {"H4", "H5", "H9"}
+    assert "1D9" in summary["failed"]["H4"]
+    assert "missing values" in summary["failed"]["H5"]
+    assert list(saved_frame(facade)["tag"]) == ["H1"]
+    assert summary["rows"] == 1
+
+
+def test_process_formulas_save_failure_fails_all(facade, processor):
+    """保存に失敗した場合は全演算式が失敗として記録されるかを検証"""
+    facade.sensor_data_service.get_sensor_data.return_value = sensor_rows({"1D1": 1.0, "1D2": 2.0, "1D3": 3.0})
+    facade.formula_data_service.save_calculation_results.return_value = False
+
+    summary = processor.process_formulas("H", "2024-12-01", ["H1", "H3"])
+
+    assert summary["succeeded"] == [] and summary["rows"] == 0
+    assert set(summary["failed"]) == {"H1", "H3"}
+
+
+def test_date_windows_split_and_boundaries():
+    """期間が window_days 日ごとに両端を含めて分割されるかを検証"""
+    assert DataPocessing._date_windows("2024-12-30", "2025-01-03", 2) == [
+        ("2024-12-30", "2024-12-31"), ("2025-01-01", "2025-01-02"), ("2025-01-03", "2025-01-03"),
+    ]
+    assert DataPocessing._date_windows("2024-12-01", "2024-12-01", 31) == [("2024-12-01", "2024-12-01")]
+    with pytest.raises(ValueError):
+        DataPocessing._date_windows("2024-12-02", "2024-12-01", 1)
+    with pytest.raises(ValueError):
+        DataPocessing._date_windows("2024-12-01", "2024-12-02", 0)
+
+
+def test_process_formula_range_records_per_date(facade, processor):
+    """ウィンドウ毎に範囲取得し、入力の無い日・欠損値を含む日・取得に失敗した日のみ失敗として、残りを 1 回で保存するかを検証"""
+    def range_data(tag_factory_map, start, end):
+        if start == "2024-12-05":
+            raise RuntimeError("timeout")
+        frames = [sensor_rows({"1D1": 1.0, "1D2": 2.0}, date=date)
+                  for date in pd.date_range(start, end).strftime("%Y-%m-%d") if date != "2024-12-03"]
+        data = pd.concat(frames, ignore_index=True)
+        data.loc[data["date"] == "2024-12-04", "d2_7"] = None
+        return data
+
+    facade.sensor_data_service.get_sensor_data_range.side_effect = range_data
+
+    summary = processor.process_formula_range("H", "H1", "2024-12-01", "2024-12-05", window_days=2)
+
+    assert [call.args[1:] for call in facade.sensor_data_service.get_sensor_data_range.call_args_list] == [
+        ("2024-12-01", "2024-12-02"), ("2024-12-03", "2024-12-04"), ("2024-12-05", "2024-12-05"),
+    ]
+    assert summary["succeeded"] == ["2024-12-01", "2024-12-02"]
+    assert summary["failed"]["2024-12-03"] == "Input data missing on 2024-12-03."
+    assert "missing values" in summary["failed"]["2024-12-04"]
+    assert summary["failed"]["2024-12-05"] == "timeout"
+    facade.formula_data_service.save_calculation_results.assert_called_once()
+    saved = saved_frame(facade)
+    assert list(saved["date"]) == ["2024-12-01", "2024-12-02"]
+    assert (saved["d1_0"] == 3.0).all()
+    assert summary["rows"] == 2
+
+
+def test_load_formula_set_orders_dependencies(facade, processor):
+    """指定外の依存先を含めて依存先が先になる順に並べ、循環・依存先の不備を失敗として記録するかを検証"""
+    facade.formula_data_service.list_all_formulas.return_value = dict(FORMULAS, **{
+        "H6": {"formula": "H7 + 1D1", "sensor_name": "Cycle"},
+        "H7": {"formula": "H6 + 1D2", "sensor_name": "Cycle"},
+        "H8": {"formula": "H9 + 1D1", "sensor_name": "Broken"},
+        "H9": {"formula": "1D1", "sensor_name": None},
+    })
+
+    formula_set, failed = processor.load_formula_set(["H2", "H6", "H8"])
+
+    assert list(formula_set) == ["H1", "H2"]
+    assert formula_set["H1"]["requested"] is False and formula_set["H2"]["requested"] is True
+    assert formula_set["H2"]["dependencies"] == ["H1"]
+    assert set(failed) == {"H6", "H8"}
+    assert "Dependency failed" in failed["H8"]
+
+
+def test_process_formulas_evaluates_dependencies_in_order(facade, processor):
+    """他の演算式を参照する演算式が依存先の計算結果で評価され、指定外の依存先は保存されないかを検証"""
+    facade.sensor_data_service.get_sensor_data.return_value = sensor_rows({"1D1": 1.0, "1D2": 2.0})
+
+    summary = processor.process_formulas("H", "2024-12-01", ["H2"])
+
+    facade.sensor_data_service.get_sensor_data.assert_called_once_with({"1D1": "H", "1D2": "H"}, "2024-12-01")
+    saved = saved_frame(facade)
+    assert list(saved["tag"]) == ["H2"]
+    assert (saved[[f"d{c}_{i}" for c in (1, 2, 3) for i in range(30)]] == 6.0).all().all()
+    assert summary["succeeded"] == ["H2"]
+
+
+def test_process_formulas_dependency_failure_propagates(facade, processor):
+    """依存先の演算式が失敗した場合は、それを参照する演算式も失敗するかを検証"""
+    facade.sensor_data_service.get_sensor_data.return_value = sensor_rows({"1D1": 1.0, "1D3": 3.0})
+
+    summary = processor.process_formulas("H", "2024-12-01", ["H1", "H2", "H3"])
+
+    assert summary["succeeded"] == ["H3"]
+    assert "1D2" in summary["failed"]["H1"]
+    assert "Dependency failed" in summary["failed"]["H2"]
+    assert list(saved_frame(facade)["tag"]) == ["H3"]
+
+
+def last_updates(updates: dict) -> pd.DataFrame:
+    return pd.DataFrame({
+        "factory": ["H"] * len(updates), "tag": list(updates), "date": ["2024-12-01"] * len(updates),
+        "last_update": [pd.Timestamp(value) for value in updates.values()],
+    })
+
+
+def test_select_dirty_formulas(facade, processor):
+    """未計算・入力（依存先の入力を含む）が計算結果より新しい演算式のみ残り、依存先は保存対象外で残るかを検証"""
+    facade.sensor_data_service.get_sensor_last_updates.return_value = last_updates(
+        {"1D1": "2024-12-01 10:00", "1D2": "2024-12-01 12:00", "1D3": "2024-12-01 08:00"}
+    )
+    facade.sensor_data_service.get_calculation_last_updates.return_value = last_updates(
+        {"H2": "2024-12-01 11:00", "H3": "2024-12-01 11:00"}
+    )
+    formula_set, _ = processor.load_formula_set(["H2", "H3", "H4"])
+
+    dirty_set, skipped = processor.select_dirty_formulas("H", "2024-12-01", formula_set)
+
+    # H2 は依存先 H1 の入力 1D2 が更新された、H4 は未計算、H3 は最新
+    assert set(dirty_set) == {"H1", "H2", "H4"}
+    assert list(dirty_set).index("H1") < list(dirty_set).index("H2")
+    assert {formula_id for formula_id, item in dirty_set.items() if item["requested"]} == {"H2", "H4"}
+    assert skipped == ["H3"]
+
+
+def test_process_formulas_incremental_skips_up_to_date(facade, processor):
+    """差分計算で全ての演算式が最新の場合は、センサーデータを取得・保存せずにスキップするかを検証"""
+    facade.sensor_data_service.get_sensor_last_updates.return_value = last_updates({"1D1": "2024-12-01 10:00"})
+    facade.sensor_data_service.get_calculation_last_updates.return_value = last_updates({"H4": "2024-12-01 10:00"})
+    facade.formula_data_service.list_all_formulas.return_value = {"H4": {"formula": "1D1 * 2", "sensor_name": "x"}}
+
+    summary = processor.process_formulas("H", "2024-12-01", ["H4"], incremental=True)
+
+    assert summary["skipped"] == ["H4"] and summary["succeeded"] == []
+    facade.sensor_data_service.get_sensor_data.assert_not_called()
+    facade.formula_data_service.save_calculation_results.assert_not_called()
@@ -0,0 +1,191 @@
+"""
+演算処理の並列実行ランナー。
+
+工場 × 日付を 1 タスクとして ProcessPoolExecutor で並列に process_formulas を実行します。
+各ワーカーは互いに重ならない (工場, 日付) を担当するため、結果の保存が競合しません。
+
+実行例:
+    python formula_runner.py --factories H J --dates 2024-12-01:2024-12-31 --workers 8
+    python formula_runner.py --factories H --dates 2024-12-20 --formulas H1 H2 H3
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from common.common import CommonFacade
+from common.formula.formula_compiler import COMPILERS
+from common.formula.formula_evaluator import EVALUATION_MODES
+from common.logger import Logger
+from common.settings import FORMULA_PROCESSING_SETTINGS
+from formula_processor import DataPocessing
+
+TIMING_STAGES = ("fetch", "compile", "evaluate", "save")
+DATE_RANGE_SEPARATOR = ":"
+
+# ワーカープロセス毎の DataPocessing（_init_worker で初期化）
+_processor: Optional[DataPocessing] = None
+
+
+def parse_dates(values: Sequence[str]) -> List[str]:
+    """
+    日付指定を展開します。"YYYY-MM-DD" または "開始日:終了日"（両端を含む）を指定できます。
+
+    :param values: Sequence[str], 日付指定のリスト
+    :return: List[str], 重複を除いた 'YYYY-MM-DD' 形式の日付リスト（指定順）
+    """
+    dates = []
+    for value in values:
+        start, _, end = value.partition(DATE_RANGE_SEPARATOR)
+        date_range = pd.date_range(start, end or start, freq="D")
+        if date_range.empty:
+            raise ValueError(f"Invalid date range: {value}")
+        dates.extend(date_range.strftime("%Y-%m-%d"))
+    return list(dict.fromkeys(dates))
+
+
+def build_tasks(factories: Sequence[str], dates: Sequence[str]) -> List[Tuple[str, str]]:
+    """
+    工場 × 日付のタスクを作成します。
+
+    :param factories: Sequence[str], 工場コード
+    :param dates: Sequence[str], 対象日
+    :return: List[Tuple[str, str]], [(工場コード, 対象日)]
+    """
+    return [(factory, date) for factory in dict.fromkeys(factories) for date in dates]
+
+
+def _init_worker(engine: str, evaluation_mode: str):
+    """ワーカープロセスの初期化（CommonFacade と DataPocessing をプロセス毎に 1 つ作成）"""
+    global _processor
+    facade = CommonFacade()
+    # 接続プールの事前接続はプロセス毎に行う（失敗しても最初の操作で接続を試みる）
+    try:
+        facade.connection_factory.warm_up()
+    except Exception as e:
+        facade.logger.warning(f"Failed to warm up the connection pool: {e}")
+    _processor = DataPocessing(facade, evaluation_mode=evaluation_mode, engine=engine)
+
+
+def _run_task(factory_cd: str, target_date: str, formula_ids: Optional[List[str]], incremental: bool = False) -> dict:
+    """ワーカープロセスで 1 タスク（工場・日付）を処理します。"""
+    return _processor.process_formulas(factory_cd, target_date, formula_ids, incremental=incremental)
+
+
+def _new_report(task_count: int) -> dict:
+    return {
+        "tasks": task_count,
+        "completed": 0,
+        "succeeded": 0,
+        "skipped": 0,
+        "failed": {},
+        "rows": 0,
+        "timings": {stage: 0.0 for stage in TIMING_STAGES},
+        "elapsed": 0.0,
+    }
+
+
+def _merge_summary(report: dict, task: Tuple[str, str], summary: dict):
+    """タスクの処理結果を集計に加えます。"""
+    report["completed"] += 1
+    report["succeeded"] += len(summary["succeeded"])
+    report["skipped"] += len(summary.get("skipped", []))
+    report["rows"] += summary["rows"]
+    if summary["failed"]:
+        report["failed"][task] = summary["failed"]
+    for stage in TIMING_STAGES:
+        report["timings"][stage] += summary["timings"].get(stage, 0.0)
+
+
+def run(tasks: Sequence[Tuple[str, str]], formula_ids: Optional[List[str]] = None, workers: Optional[int] = None,
+        max_tasks_per_child: Optional[int] = None, engine: str = "ast", evaluation_mode: str = "vectorized",
+        incremental: bool = False, logger=None) -> dict:
+    """
+    タスクを並列に処理し、集計結果を返します。
+
+    :param tasks: Sequence[Tuple[str, str]], [(工場コード, 対象日)]
+    :param formula_ids: Optional[List[str]], 対象の演算式ID（None の場合は全件）
+    :param workers: Optional[int], ワーカープロセス数（1 の場合はプロセスを作らずに逐次処理、None の場合は CPU 数）
+    :param max_tasks_per_child: Optional[int], ワーカープロセスを再作成するまでのタスク数（None の場合は再作成しない）
+    :param engine: str, 演算式のコンパイルエンジン
+    :param evaluation_mode: str, 評価方式
+    :param incremental: bool, 前回の計算以降に入力が更新された演算式のみ処理するか
+    :param logger: ロガー（省略可能）
+    :return: dict, {"tasks", "completed", "succeeded", "skipped", "failed": {(工場, 日付): {formula_id: エラー内容}},
+                    "rows", "timings": 工程毎の処理時間の合計, "elapsed": 経過時間}
+    """
+    report = _new_report(len(tasks))
+    started = time.perf_counter()
+
+    def on_done(task: Tuple[str, str], summary: dict):
+        _merge_summary(report, task, summary)
+        if logger:
+            logger.info(
+                f"[{report['completed']}/{report['tasks']}] {task[0]} {task[1]}: "
+                f"{len(summary['succeeded'])} succeeded, {len(summary['failed'])} failed, {summary['rows']} rows."
+            )
+
+    if workers == 1:
+        _init_worker(engine, evaluation_mode)
+        for task in tasks:
+            on_done(task, _run_task(*task, formula_ids, incremental))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(engine, evaluation_mode),
+                                 max_tasks_per_child=max_tasks_per_child) as executor:
+            futures = {executor.submit(_run_task, *task, formula_ids, incremental): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    # ワーカープロセスの異常終了などは、そのタスクの全演算式を失敗として扱う
+                    if logger:
+                        logger.error(f"Task {task[0]} {task[1]} failed: {e}")
+                    summary = {"succeeded": [], "failed": {"*": str(e)}, "rows": 0, "timings": {}}
+                on_done(task, summary)
+
+    report["elapsed"] = time.perf_counter() - started
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="工場 × 日付単位で演算式を並列に処理します。")
+    parser.add_argument("--factories", nargs="+", required=True, help="工場コード")
+    parser.add_argument("--dates", nargs="+", required=True,
+                        help=f"対象日（YYYY-MM-DD、または 開始日{DATE_RANGE_SEPARATOR}終了日）")
+    parser.add_argument("--formulas", nargs="+", default=None, help="演算式ID（省略時は全件）")
+    parser.add_argument("--workers", type=int, default=FORMULA_PROCESSING_SETTINGS["workers"],
+                        help="ワーカープロセス数（省略時は CPU 数、1 で逐次処理）")
+    parser.add_argument("--max-tasks-per-child", type=int, default=FORMULA_PROCESSING_SETTINGS["max_tasks_per_child"],
+                        help="ワーカープロセスを再作成するまでのタスク数")
+    parser.add_argument("--engine", default="ast", choices=list(COMPILERS), help="演算式のコンパイルエンジン")
+    parser.add_argument("--incremental", action="store_true",
+                        help="前回の計算以降に入力が更新された演算式のみ処理する")
+    parser.add_argument("--evaluation-mode", default="vectorized", choices=list(EVALUATION_MODES), help="評価方式")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # 親プロセスでは CommonFacade を作成しない（接続を開いたままワーカープロセスを fork しないため）
+    logger = Logger()
+
+    tasks = build_tasks(args.factories, parse_dates(args.dates))
+    logger.info(f"Starting formula runner: {len(tasks)} tasks, workers={args.workers or 'auto'}.")
+    report = run(tasks, args.formulas, workers=args.workers, max_tasks_per_child=args.max_tasks_per_child,
+                 engine=args.engine, evaluation_mode=args.evaluation_mode, incremental=args.incremental, logger=logger)
+
+    timings = ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in report["timings"].items())
+    logger.info(
+        f"Formula runner finished in {report['elapsed']:.2f}s: {report['succeeded']} formulas succeeded, "
+        f"{report['skipped']} skipped, {len(report['failed'])} tasks with failures, {report['rows']} rows. Stage totals: {timings}."
+    )
+    for (factory_cd, target_date), failed in report["failed"].items():
+        logger.error(f"Failed formulas for {factory_cd} {target_date}: {failed}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,56 @@
+import pytest
+import formula_runner
+from formula_runner import build_parser, build_tasks, parse_dates, run
+
+
+def test_parse_dates_with_ranges():
+    """単日と範囲指定が展開され、重複が除かれるかを検証"""
+    dates = parse_dates(["2024-12-30:2025-01-02", "2024-12-31", "2025-01-05"])
+
+    assert dates == ["2024-12-30", "2024-12-31", "2025-01-01", "2025-01-02", "2025-01-05"]
+
+
+def test_parse_dates_invalid_range():
+    with pytest.raises(ValueError, match="Invalid date range"):
+        parse_dates(["2024-12-31:2024-12-01"])
+
+
+def test_build_tasks():
+    """工場 × 日付のタスクが重複なく作成されるかを検証"""
+    tasks = build_tasks(["H", "J", "H"], ["2024-12-01", "2024-12-02"])
+
+    assert tasks == [("H", "2024-12-01"), ("H", "2024-12-02"), ("J", "2024-12-01"), ("J", "2024-12-02")]
+
+
+def test_run_aggregates_summaries(mocker):
+    """各タスクの処理結果が件数・失敗・処理時間ごとに集計されるかを検証"""
+    mocker.patch.object(formula_runner, "_init_worker")
+    summaries = {
+        ("H", "2024-12-01"): {"succeeded": ["H1", "H2"], "failed": {}, "rows": 2,
+                              "timings": {"fetch": 1.0, "compile": 0.5, "evaluate": 2.0, "save": 1.0}},
+        ("J", "2024-12-01"): {"succeeded": ["H1"], "failed": {"H2": "Data missing"}, "rows": 1,
+                              "timings": {"fetch": 0.5, "compile": 0.0, "evaluate": 1.0, "save": 0.5}},
+    }
+    run_task = mocker.patch.object(formula_runner, "_run_task",
+                                   side_effect=lambda factory, date, formula_ids, incremental: summaries[(factory, date)])
+
+    report = run(list(summaries), formula_ids=["H1", "H2"], workers=1)
+
+    assert run_task.call_count == 2
+    assert report["completed"] == 2
+    assert report["succeeded"] == 3
+    assert report["rows"] == 3
+    assert report["failed"] == {("J", "2024-12-01"): {"H2": "Data missing"}}
+    assert report["timings"] == {"fetch": 1.5, "compile": 0.5, "evaluate": 3.0, "save": 1.5}
+
+
+def test_parser_rejects_unknown_engine_and_mode(capsys):
+    """未知のエンジン・評価方式はワーカー起動前に引数エラーになるかを検証"""
+    parser = build_parser()
+    base = ["--factories", "H", "--dates", "2024-12-01"]
+
+    assert parser.parse_args(base + ["--engine", "sympy", "--evaluation-mode", "per_hour"]).engine == "sympy"
+    for option in (["--engine", "astt"], ["--evaluation-mode", "vectorised"]):
+        with pytest.raises(SystemExit):
+            parser.parse_args(base + option)
+    assert "invalid choice" in capsys.readouterr().err